@@ -0,0 +1,47 @@
+from fastapi import APIRouter, HTTPException
+
+from model.dto.response import ApiResponse
+from websocket.connection_manager import manager
+from service.RoomStatusBroadcaster import room_status_broadcaster
+from service.RoomStatusVersionStore import room_status_version_store
+from service.RoomActor import room_actor_registry
+from service.AIResponsePipeline import ai_response_pipeline
+from service.ScriptGenerationQueue import script_generation_queue
+from service.ScriptPool import script_pool
+from service.ScriptContentCache import script_content_cache
+from service.SearchRevealStore import search_reveal_store
+from service.VoteTallyStore import vote_tally_store
+from utils.game_log_writer import game_log_writer
+from utils.recent_message_buffer import recent_message_buffer
+from utils.http_client import http_client
+from utils.response_cache import response_cache
+
+router = APIRouter(prefix="/api/metrics", tags=["运行监控"])
+
+
+@router.get("", response_model=ApiResponse[dict])
+async def get_metrics():
+    """获取运行时统计信息"""
+    try:
+        return ApiResponse(
+            code=200,
+            msg="获取统计信息成功",
+            data={
+                "websocket": manager.get_stats(),
+                "room_status": room_status_broadcaster.get_stats(),
+                "room_status_versions": room_status_version_store.get_stats(),
+                "rooms": room_actor_registry.get_stats(),
+                "game_logs": game_log_writer.get_stats(),
+                "recent_messages": recent_message_buffer.get_stats(),
+                "ai_responses": ai_response_pipeline.get_stats(),
+                "script_jobs": script_generation_queue.get_stats(),
+                "script_pool": script_pool.get_stats(),
+                "script_content": script_content_cache.get_stats(),
+                "search_reveals": search_reveal_store.get_stats(),
+                "votes": vote_tally_store.get_stats(),
+                "http_client": http_client.get_stats(),
+                "model_cache": response_cache.get_stats()
+            }
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"获取统计信息失败: {str(e)}")
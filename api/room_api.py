@@ -20,6 +20,7 @@ from model.dto.RoomDto import (
 )
 from .auth_api import get_current_user
 from websocket.connection_manager import manager
+from service.RoomActor import room_actor_registry
 from model.ws.notification_types import MessageType, create_message, create_formatted_data
 
 router = APIRouter(prefix="/api/room", tags=["房间管理"])
@@ -153,6 +154,7 @@ async def join_room(request: JoinRoomRequest, current_user: Annotated[Users, Dep
             user=current_user,
             character=None  # 角色选择阶段再分配
         )
+        room_actor_registry.invalidate(room.room_code)
         
         # 通过WebSocket通知房间内其他用户
         await manager.broadcast_to_room(request.room_code, create_message(MessageType.PLAYER_JOINED,
@@ -203,6 +205,7 @@ async def leave_room(room_code: str, current_user: Annotated[Users, Depends(get_
         
         # 删除玩家记录
         await player.delete()
+        room_actor_registry.invalidate(room_code)
         
         # 如果是房主离开且房间还有其他玩家，转移房主
         if room.host_user_id == current_user.id:
@@ -211,7 +214,10 @@ async def leave_room(room_code: str, current_user: Annotated[Users, Depends(get_
                 # 转移给第一个剩余玩家
                 new_host = remaining_players[0].user
                 room.host_user = new_host
-                await room.save()
+                # 只更新房主，避免覆盖房间处理器登记的其他写入
+                await room.save(update_fields=["host_user_id"])
+                # 处理器可能在删除玩家后已重新加载了旧的房主，再次失效
+                room_actor_registry.invalidate(room_code)
                 
                 # 通知房间内用户房主转移
                 await manager.broadcast_to_room(room_code, create_message(MessageType.PLAYER_LEFT,
@@ -309,6 +315,7 @@ async def delete_room(room_code: str,current_user: Annotated[Users, Depends(get_
         
         # 删除房间
         await room.delete()
+        room_actor_registry.invalidate(room_code)
         
         return ApiResponse(
             code=200,
@@ -392,6 +399,7 @@ async def cleanup_expired_rooms():
         for room in expired_rooms:
             await GamePlayers.filter(room=room).delete()
             await room.delete()
+            room_actor_registry.invalidate(room.room_code)
             deleted_count += 1
         
         return ApiResponse(
@@ -436,6 +444,7 @@ async def update_room_settings(
         
         room.game_setting = current_settings
         await room.save()
+        room_actor_registry.invalidate(room_code)
         
         # 广播房间状态更新
         from websocket.websocket_routes import broadcast_room_status
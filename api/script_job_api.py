@@ -0,0 +1,71 @@
+from fastapi import APIRouter, HTTPException, Depends
+from typing import Annotated, Optional
+
+from model.entity.Scripts import Users, GamePlayers, ScriptGenerationJobs
+from model.dto.ScriptJobDto import ScriptJobData, ScriptJobResponse, ScriptJobListResponse
+from service.ScriptGenerationQueue import script_generation_queue
+from utils.script_importer import SCRIPT_SECTIONS
+from .auth_api import get_current_user
+
+router = APIRouter(prefix="/api/script-jobs", tags=["剧本生成任务"])
+
+
+def to_job_data(job: ScriptGenerationJobs) -> ScriptJobData:
+    """任务记录转换为接口数据（需预加载 room）"""
+    return ScriptJobData(
+        id=job.id,
+        room_code=job.room.room_code,
+        status=job.status,
+        progress=job.progress,
+        total=len(SCRIPT_SECTIONS),
+        attempts=job.attempts,
+        queue_position=script_generation_queue.queue_position(job),
+        script_id=job.script_id,
+        error=job.error,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at
+    )
+
+
+@router.get("", response_model=ScriptJobListResponse)
+async def list_script_jobs(current_user: Annotated[Users, Depends(get_current_user)],
+                           room_code: Optional[str] = None, limit: int = 20):
+    """获取当前用户发起的剧本生成任务（最新的在前）"""
+    try:
+        query = ScriptGenerationJobs.filter(host_user_id=current_user.id)
+        if room_code:
+            query = query.filter(room__room_code=room_code)
+        jobs = await query.order_by("-id").limit(min(max(limit, 1), 100)).prefetch_related("room")
+        return ScriptJobListResponse(
+            code=200,
+            msg="获取剧本生成任务成功",
+            data={"jobs": [to_job_data(job) for job in jobs]}
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"获取剧本生成任务失败: {str(e)}")
+
+
+@router.get("/{job_id}", response_model=ScriptJobResponse)
+async def get_script_job(job_id: int, current_user: Annotated[Users, Depends(get_current_user)]):
+    """获取剧本生成任务的状态和进度（房主和房间内玩家可查看）"""
+    job = await ScriptGenerationJobs.get_or_none(id=job_id).prefetch_related("room")
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    if job.host_user_id != current_user.id and not await GamePlayers.exists(room_id=job.room_id, user_id=current_user.id):
+        raise HTTPException(status_code=403, detail="无权查看该任务")
+    return ScriptJobResponse(code=200, msg="获取剧本生成任务成功", data=to_job_data(job))
+
+
+@router.post("/{job_id}/cancel", response_model=ScriptJobResponse)
+async def cancel_script_job(job_id: int, current_user: Annotated[Users, Depends(get_current_user)]):
+    """取消排队中或生成中的任务（仅发起任务的房主）"""
+    job = await ScriptGenerationJobs.get_or_none(id=job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    if job.host_user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="只有房主可以取消剧本生成")
+    if not await script_generation_queue.cancel(job):
+        raise HTTPException(status_code=400, detail=f"任务已结束，无法取消（{job.status}）")
+    job = await ScriptGenerationJobs.get(id=job_id).prefetch_related("room")
+    return ScriptJobResponse(code=200, msg="剧本生成任务已取消", data=to_job_data(job))
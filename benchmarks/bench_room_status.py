@@ -0,0 +1,82 @@
+"""房间状态广播基准：每次广播的 SQL 语句数随房间人数的变化
+
+运行方式：python -m benchmarks.bench_room_status [--sizes 2,4,6,8,10] [--phases 进行中,搜证中]
+
+对比两种方式：
+- 逐个发送：对每个在线玩家调用一次 send_room_status（每次都重新加载房间）
+- 共享广播：broadcast_room_status 只加载一次房间对象图，再为每个玩家叠加私有数据
+"""
+import argparse
+import asyncio
+import time
+
+from tortoise import Tortoise
+
+from benchmarks.fixtures import init_memory_db, seed_room
+from benchmarks.query_counter import QueryCounter
+from service.RoomStatusHandler import room_status_handler
+from websocket.connection_manager import manager
+
+
+def attach_fake_connections(room_code: str, user_ids):
+    """登记在线玩家（不创建真实连接，消息不会被发送）"""
+    manager.room_connections[room_code] = {user_id: None for user_id in user_ids}
+    for user_id in user_ids:
+        manager.user_rooms[user_id] = room_code
+
+
+async def measure(coro_factory, repeat: int):
+    """返回 (平均语句数, 平均耗时毫秒)"""
+    with QueryCounter() as counter:
+        started = time.perf_counter()
+        for _ in range(repeat):
+            await coro_factory()
+        elapsed = time.perf_counter() - started
+    return counter.count / repeat, elapsed * 1000 / repeat
+
+
+async def run(sizes, phases, stages: int, repeat: int):
+    await init_memory_db()
+    try:
+        print(f"{'阶段':<6}{'人数':>6}{'逐个发送(语句)':>16}{'共享广播(语句)':>16}{'逐个发送(ms)':>14}{'共享广播(ms)':>14}")
+        for phase in phases:
+            for size in sizes:
+                room = await seed_room(players=size, stages=stages, status=phase,
+                                       room_code=f"R{phase_index(phase)}{size}")
+                players = await room.players.all()
+                user_ids = [player.user_id for player in players]
+                attach_fake_connections(room.room_code, user_ids)
+
+                async def per_viewer():
+                    for user_id in user_ids:
+                        await room_status_handler.send_room_status(room.room_code, user_id)
+
+                async def shared():
+                    await room_status_handler.broadcast_room_status(room.room_code)
+
+                legacy_queries, legacy_ms = await measure(per_viewer, repeat)
+                shared_queries, shared_ms = await measure(shared, repeat)
+                print(f"{phase:<6}{size:>8}{legacy_queries:>18.0f}{shared_queries:>18.0f}{legacy_ms:>16.1f}{shared_ms:>16.1f}")
+    finally:
+        await Tortoise.close_connections()
+
+
+def phase_index(phase: str) -> int:
+    return ["进行中", "搜证中", "投票中", "已结束"].index(phase)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="房间状态广播查询次数基准")
+    parser.add_argument("--sizes", default="2,4,6,8,10", help="房间人数列表，逗号分隔")
+    parser.add_argument("--phases", default="进行中,搜证中,投票中", help="房间状态列表，逗号分隔")
+    parser.add_argument("--stages", type=int, default=3, help="剧本阶段数")
+    parser.add_argument("--repeat", type=int, default=3, help="每组重复次数")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    phases = args.phases.split(",")
+    asyncio.run(run(sizes, phases, args.stages, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
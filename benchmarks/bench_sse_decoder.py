@@ -0,0 +1,125 @@
+"""流式响应解析基准：回放一段数 MB 的 chat/completions SSE 流
+
+运行方式：python -m benchmarks.bench_sse_decoder [--size-mb 4] [--chunk 1024] [--file 录制的流.txt]
+
+对比两种方式：
+- 按块拆行：原 call_ai_api 的做法，每个文本块单独按换行拆分，跨块的 data 行被丢弃，
+  结果用字符串 += 拼接
+- 增量解码：SSEDecoder 跨块缓存不完整的行，结果按段收集后一次性拼接
+"""
+import argparse
+import json
+import random
+import time
+from typing import List, Tuple
+
+from utils.sse_decoder import iter_decoded_events, extract_completion_delta
+
+
+def record_stream(size_mb: float, seed: int = 7) -> Tuple[str, str]:
+    """生成一段与模型输出格式一致的 SSE 流，返回 (流文本, 期望的生成内容)"""
+    rng = random.Random(seed)
+    vocabulary = ["线索", "凶手", "书房", "昨晚", "子时", "玉如意", "古井", "管家", "密信", "，", "。", "\n"]
+    target = int(size_mb * 1024 * 1024)
+
+    events: List[str] = []
+    tokens: List[str] = []
+    length = 0
+    while length < target:
+        token = "".join(rng.choice(vocabulary) for _ in range(rng.randint(1, 3)))
+        tokens.append(token)
+        chunk = {"id": "chatcmpl-bench", "object": "chat.completion.chunk",
+                 "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]}
+        event = f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+        if rng.random() < 0.01:
+            event = ": keep-alive\n\n" + event
+        events.append(event)
+        length += len(event.encode("utf-8"))
+    events.append("data: [DONE]\n\n")
+    return "".join(events), "".join(tokens)
+
+
+def split_chunks(stream: str, chunk_size: int, seed: int = 11) -> List[str]:
+    """按网络读取的粒度把流切成随机大小的文本块"""
+    rng = random.Random(seed)
+    chunks = []
+    position = 0
+    while position < len(stream):
+        size = rng.randint(max(1, chunk_size // 2), chunk_size * 2)
+        chunks.append(stream[position:position + size])
+        position += size
+    return chunks
+
+
+def legacy_parse(chunks: List[str]) -> str:
+    """原 call_ai_api 中的解析逻辑"""
+    full_content = ""
+    for chunk in chunks:
+        if chunk.strip():
+            for line in chunk.strip().split('\n'):
+                if line.startswith('data: '):
+                    data_content = line[6:].strip()
+                    if data_content == '[DONE]':
+                        continue
+                    try:
+                        chunk_data = json.loads(data_content)
+                        if 'choices' in chunk_data and len(chunk_data['choices']) > 0:
+                            content = chunk_data['choices'][0].get('delta', {}).get('content', '')
+                            if content:
+                                full_content += content
+                    except json.JSONDecodeError:
+                        continue
+    return full_content
+
+
+def decoder_parse(chunks: List[str]) -> str:
+    """SSEDecoder 解析"""
+    parts: List[str] = []
+    for event in iter_decoded_events(chunks):
+        if event.data == "[DONE]":
+            break
+        content = extract_completion_delta(event)
+        if content:
+            parts.append(content)
+    return "".join(parts)
+
+
+def measure(parse, chunks: List[str], repeat: int) -> Tuple[str, float]:
+    """返回 (解析结果, 平均耗时毫秒)"""
+    result = ""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = parse(chunks)
+    return result, (time.perf_counter() - started) * 1000 / repeat
+
+
+def run(stream: str, expected: str, chunk_size: int, repeat: int):
+    chunks = split_chunks(stream, chunk_size)
+    size_mb = len(stream.encode("utf-8")) / 1024 / 1024
+    print(f"流大小 {size_mb:.1f} MB，{len(chunks)} 个文本块，期望内容 {len(expected)} 字符")
+    print(f"{'方式':<10}{'耗时(ms)':>12}{'MB/s':>10}{'内容字符':>12}{'丢失字符':>12}")
+    for name, parse in (("按块拆行", legacy_parse), ("增量解码", decoder_parse)):
+        result, elapsed_ms = measure(parse, chunks, repeat)
+        lost = len(expected) - len(result) if expected else 0
+        print(f"{name:<10}{elapsed_ms:>14.1f}{size_mb / (elapsed_ms / 1000):>10.1f}{len(result):>14}{lost:>14}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="流式响应解析基准")
+    parser.add_argument("--size-mb", type=float, default=4.0, help="生成的流大小（MB）")
+    parser.add_argument("--chunk", type=int, default=1024, help="平均文本块大小（字符）")
+    parser.add_argument("--repeat", type=int, default=3, help="重复次数")
+    parser.add_argument("--file", help="回放录制的原始 SSE 流文件（替代生成的流）")
+    args = parser.parse_args()
+
+    if args.file:
+        with open(args.file, encoding="utf-8") as f:
+            stream = f.read()
+        expected = decoder_parse([stream])
+    else:
+        stream, expected = record_stream(args.size_mb)
+    run(stream, expected, args.chunk, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""房间状态构建方法的微基准：各构建方法的耗时和每次调用的 SQL 语句数
+
+运行方式：python -m benchmarks.bench_status_builders [--cases 4x3x1x1,6x3x2x2,10x5x2x3] [--rounds 20]
+          python -m benchmarks.bench_status_builders --check          # 语句数超过基线时以非零状态退出
+          python -m benchmarks.bench_status_builders --save-baseline  # 以本次结果更新基线
+
+每组参数（角色数x阶段数x每角色每阶段私有线索数x每个玩家的搜查记录数）创建一个房间，
+在最后一个阶段分别以两种方式调用构建方法：
+- 单独调用：不传入共享数据（send_room_status 之外的调用方式，构建方法自行查询）
+- 广播调用：传入 build_shared_status_data 的结果（广播时的调用方式）
+
+语句数分别在两种缓存状态下统计：
+- cold：清空剧本内容、搜查记录和投票计数缓存后的首次调用（缓存未命中时的加载查询）
+- cold_script_content：只清空剧本内容缓存（剧本内容被淘汰或修改后，ScriptContent.load 的查询）
+- cold_search_reveals：只清空房间的搜查记录缓存（SearchRevealStore._load 的查询）
+- warm：缓存已加载后的调用（广播时的常态）
+耗时按轮次统计最小值、平均值和标准差（缓存已加载后计时）。语句数是确定的，
+记录在 benchmarks/baselines/status_builders.json 中；--check 在任一构建方法任一状态的语句数
+超过基线时失败，用于发现引入额外查询的改动（tests/test_status_builders.py 以 pytest 运行该检查）。
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+from tortoise import Tortoise
+
+from benchmarks.fixtures import init_memory_db, seed_room
+from benchmarks.query_counter import QueryCounter
+from model.entity.Scripts import GameRooms, GameVotes
+from service.ScriptContentCache import script_content_cache
+from service.SearchRevealStore import search_reveal_store
+from service.VoteTallyStore import vote_tally_store
+from service.room_status_handler.characters_builder import build_detailed_characters_info
+from service.room_status_handler.clues_builder import build_clues_info
+from service.room_status_handler.search_builder import build_searchable_info
+from service.room_status_handler.shared_builder import build_shared_status_data
+from service.room_status_handler.stage_builder import build_stage_info
+from service.room_status_handler.timeline_builder import build_story_timeline_info
+from service.room_status_handler.voting_builder import build_voting_info
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baselines", "status_builders.json")
+
+Case = Tuple[int, int, int, int]
+
+# 缓存已加载时的状态名（在各冷缓存状态之后测量）
+WARM = "warm"
+
+
+def parse_case(text: str) -> Case:
+    characters, stages, clues, searches = (int(value) for value in text.split("x"))
+    return characters, stages, clues, searches
+
+
+def case_name(case: Case) -> str:
+    return "x".join(str(value) for value in case)
+
+
+def builder_calls(room: GameRooms, user_id: int, shared: Dict[str, Any]) -> Dict[str, Callable[[], Awaitable]]:
+    """各构建方法的调用方式 {名称: 调用}，名称带 [shared] 的是广播调用"""
+    return {
+        "build_shared_status_data": lambda: build_shared_status_data(room),
+        "build_clues_info": lambda: build_clues_info(room, user_id),
+        "build_clues_info[shared]": lambda: build_clues_info(room, user_id, shared),
+        "build_searchable_info": lambda: build_searchable_info(room, user_id),
+        "build_searchable_info[shared]": lambda: build_searchable_info(room, user_id, shared),
+        "build_story_timeline_info": lambda: build_story_timeline_info(room.script, user_id, room),
+        "build_story_timeline_info[shared]": lambda: build_story_timeline_info(room.script, user_id, room, shared),
+        "build_stage_info": lambda: build_stage_info(room, user_id),
+        "build_stage_info[shared]": lambda: build_stage_info(room, user_id, shared),
+        "build_voting_info": lambda: build_voting_info(room),
+        "build_detailed_characters_info": lambda: build_detailed_characters_info(room, user_id),
+    }
+
+
+def cold_resets(room: GameRooms) -> Dict[str, Callable[[], None]]:
+    """各冷缓存状态的构造方式 {状态: 丢弃缓存}"""
+    def clear_all():
+        script_content_cache.invalidate(room.script_id)
+        search_reveal_store.invalidate(room.id)
+        vote_tally_store.invalidate(room.id)
+
+    return {
+        "cold": clear_all,
+        "cold_script_content": lambda: script_content_cache.invalidate(room.script_id),
+        "cold_search_reveals": lambda: search_reveal_store.invalidate(room.id),
+    }
+
+
+async def seed_case(index: int, case: Case) -> GameRooms:
+    """创建房间并让每个玩家投票给下一位玩家，返回按广播方式加载的房间"""
+    characters, stages, clues, searches = case
+    room = await seed_room(players=characters, stages=stages, private_clues_per_stage=clues,
+                           searches_per_player=searches, room_code=f"SB{index}")
+    players = await room.players.all().order_by("id")
+    for i, player in enumerate(players):
+        await GameVotes.create(room=room, stage_id=room.current_stage_id, voter_game_player=player,
+                               voted_game_player=players[(i + 1) % len(players)])
+    return await GameRooms.get(id=room.id).prefetch_related(
+        'script', 'host_user', 'players__user', 'players__character', 'current_stage'
+    )
+
+
+async def measure(call: Callable[[], Awaitable], resets: Dict[str, Callable[[], None]],
+                  rounds: int) -> Dict[str, Any]:
+    """统计各冷缓存状态和缓存已加载时的语句数，再计时 rounds 轮"""
+    queries: Dict[str, int] = {}
+    for state, reset in resets.items():
+        reset()
+        with QueryCounter() as counter:
+            await call()
+        queries[state] = counter.count
+    with QueryCounter() as counter:
+        await call()
+    queries[WARM] = counter.count
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        await call()
+        timings.append((time.perf_counter() - started) * 1000)
+    return {
+        "queries": queries,
+        "min_ms": round(min(timings), 3),
+        "mean_ms": round(statistics.mean(timings), 3),
+        "stddev_ms": round(statistics.stdev(timings), 3) if len(timings) > 1 else 0.0,
+        "rounds": rounds,
+    }
+
+
+async def run(cases: List[Case], rounds: int) -> Dict[str, Dict[str, Dict[str, Any]]]:
+    await init_memory_db()
+    results: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    try:
+        for index, case in enumerate(cases):
+            room = await seed_case(index, case)
+            user_id = room.players[0].user_id
+            shared = await build_shared_status_data(room)
+            resets = cold_resets(room)
+            results[case_name(case)] = {
+                name: await measure(call, resets, rounds)
+                for name, call in builder_calls(room, user_id, shared).items()
+            }
+    finally:
+        await Tortoise.close_connections()
+    return results
+
+
+def load_baseline() -> Dict[str, Dict[str, Dict[str, int]]]:
+    """基线 {参数: {构建方法: {缓存状态: 语句数}}}"""
+    if not os.path.exists(BASELINE_PATH):
+        return {}
+    with open(BASELINE_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baseline(results: Dict[str, Dict[str, Dict[str, Any]]]):
+    baseline = load_baseline()
+    for case, builders in results.items():
+        baseline[case] = {name: dict(result["queries"]) for name, result in builders.items()}
+    os.makedirs(os.path.dirname(BASELINE_PATH), exist_ok=True)
+    with open(BASELINE_PATH, "w", encoding="utf-8") as f:
+        json.dump(baseline, f, ensure_ascii=False, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def find_regressions(results: Dict[str, Dict[str, Dict[str, Any]]],
+                     baseline: Dict[str, Dict[str, Dict[str, int]]]) -> List[str]:
+    """语句数超过基线的构建方法和缓存状态（基线中没有的组合不检查）"""
+    regressions = []
+    for case, builders in results.items():
+        for name, result in builders.items():
+            for state, count in result["queries"].items():
+                expected = baseline.get(case, {}).get(name, {}).get(state)
+                if expected is not None and count > expected:
+                    regressions.append(f"{case} {name} [{state}]: {count} 条语句（基线 {expected} 条）")
+    return regressions
+
+
+def print_results(results: Dict[str, Dict[str, Dict[str, Any]]], baseline: Dict[str, Dict[str, Dict[str, int]]]):
+    print(f"{'参数':<10}{'构建方法':<38}{'缓存':<22}{'语句':>6}{'基线':>6}{'最小(ms)':>10}{'平均(ms)':>10}{'标准差':>9}")
+    for case, builders in results.items():
+        for name, result in builders.items():
+            for state, count in result["queries"].items():
+                expected = baseline.get(case, {}).get(name, {}).get(state)
+                line = f"{case:<10}{name:<40}{state:<24}{count:>6}{'-' if expected is None else expected:>8}"
+                # 耗时只在缓存已加载时统计，打印在该状态的行上
+                if state == WARM:
+                    line += f"{result['min_ms']:>12.3f}{result['mean_ms']:>12.3f}{result['stddev_ms']:>11.3f}"
+                print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="房间状态构建方法的微基准")
+    parser.add_argument("--cases", default="4x3x1x1,6x3x2x2,10x5x2x3",
+                        help="角色数x阶段数x私有线索数x搜查记录数，逗号分隔")
+    parser.add_argument("--rounds", type=int, default=20, help="每个构建方法计时的轮次")
+    parser.add_argument("--check", action="store_true", help="语句数超过基线时以非零状态退出")
+    parser.add_argument("--save-baseline", action="store_true", help="以本次的语句数更新基线")
+    parser.add_argument("--output", help="把结果以 JSON 写入该文件")
+    args = parser.parse_args()
+
+    cases = [parse_case(case) for case in args.cases.split(",")]
+    results = asyncio.run(run(cases, args.rounds))
+    baseline = load_baseline()
+    print_results(results, baseline)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    if args.save_baseline:
+        save_baseline(results)
+        print(f"基线已更新: {BASELINE_PATH}")
+    if args.check:
+        regressions = find_regressions(results, baseline)
+        if regressions:
+            print("语句数超过基线：")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("语句数均未超过基线")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""基准测试使用的剧本与房间数据生成工具"""
+import json
+from typing import Dict, Any, List, Optional
+
+from tortoise import Tortoise
+
+from model.entity.Scripts import (
+    Users, GameRooms, GamePlayers, ScriptStages, ScriptCharacters, ScriptClues, SearchActions
+)
+from utils.scripts_util import parse_and_save_script
+
+
+def make_script_data(characters: int = 6, stages: int = 3, private_clues_per_stage: int = 1,
+                     public_clues_per_stage: int = 2, text_size: int = 200) -> Dict[str, Any]:
+    """生成与 AI 输出格式一致的剧本数据"""
+    filler = "线索描述" * max(1, text_size // 4)
+    character_names = [f"角色{i + 1}" for i in range(characters)]
+
+    timeline = []
+    for i, name in enumerate(character_names):
+        timeline.append({"character": name, "is_public": True, "statement": f"{name}的公开时间线。{filler}"})
+        if i == 0:
+            timeline.append({"character": name, "is_public": False, "statement": f"{name}的真实时间线。{filler}"})
+
+    clues = []
+    for stage_number in range(1, stages + 1):
+        for n in range(public_clues_per_stage):
+            clues.append({
+                "name": f"公开线索{stage_number}-{n + 1}",
+                "description": filler,
+                "discovery_stage_id": stage_number,
+                "discovery_location": "大厅",
+                "is_public": True,
+                "owner_character_name": None
+            })
+        for name in character_names:
+            for n in range(private_clues_per_stage):
+                clues.append({
+                    "name": f"{name}的线索{stage_number}-{n + 1}",
+                    "description": filler,
+                    "discovery_stage_id": stage_number,
+                    "discovery_location": f"{name}的房间",
+                    "is_public": False,
+                    "owner_character_name": name
+                })
+
+    return {
+        "script": {
+            "title": f"基准剧本（{characters}人/{stages}幕）",
+            "description": filler,
+            "player_count": str(characters),
+            "difficulty": "进阶",
+            "tags": "基准,测试",
+            "ai_dm_personality": "严肃",
+            "duration_mins": "60"
+        },
+        "story": {
+            "overview": filler,
+            "timeline": timeline
+        },
+        "characters": [
+            {
+                "name": name,
+                "gender": "不限",
+                "is_murderer": i == 0,
+                "backstory": filler,
+                "public_info": filler,
+                "character_goals": [
+                    {"stage_number": stage_number, "goal": f"{name}第{stage_number}幕任务。{filler}"}
+                    for stage_number in range(1, stages + 1)
+                ]
+            }
+            for i, name in enumerate(character_names)
+        ],
+        "stages": [
+            {
+                "stage_number": stage_number,
+                "name": f"第{stage_number}幕",
+                "opening_narrative": filler,
+                "stage_goal": filler
+            }
+            for stage_number in range(1, stages + 1)
+        ],
+        "clues": clues,
+        "solution": {"answer": "凶手是角色1。", "reasoning": filler}
+    }
+
+
+async def init_memory_db():
+    """初始化内存 SQLite 数据库"""
+    await Tortoise.init(
+        db_url="sqlite://:memory:",
+        modules={"models": ["model.entity.Scripts"]}
+    )
+    await Tortoise.generate_schemas()
+
+
+async def seed_room(players: int = 6, stages: int = 3, private_clues_per_stage: int = 1,
+                    public_clues_per_stage: int = 2, status: str = "进行中", stage_number: Optional[int] = None,
+                    searches_per_player: int = 1, room_code: Optional[str] = None) -> GameRooms:
+    """创建一个已分配角色的房间，并按需要设置阶段和搜查记录"""
+    suffix = room_code or f"B{players}S{stages}"
+    users: List[Users] = []
+    for i in range(players):
+        users.append(await Users.create(
+            username=f"bench_{suffix}_{i}", password_hash="", nickname=f"玩家{i + 1}",
+            email=f"bench_{suffix}_{i}@bench.local"
+        ))
+
+    script_data = make_script_data(players, stages, private_clues_per_stage, public_clues_per_stage)
+    script_id = await parse_and_save_script(json.dumps(script_data, ensure_ascii=False), users[0].id, players, 60)
+
+    current_stage = await ScriptStages.get(script_id=script_id, stage_number=stage_number or stages)
+    room = await GameRooms.create(
+        room_code=suffix[:10], room_password="", host_user=users[0], max_players=players,
+        script_id=script_id, status=status, current_stage=current_stage,
+        game_setting={"theme": "基准", "difficulty": "进阶", "ai_dm_personality": "严肃", "duration_mins": 60}
+    )
+
+    characters = await ScriptCharacters.filter(script_id=script_id).order_by('id')
+    game_players = []
+    for user, character in zip(users, characters):
+        game_players.append(await GamePlayers.create(room=room, user=user, character=character, is_ready=True))
+
+    # 每个玩家搜查下一位玩家的私有线索
+    for i, player in enumerate(game_players):
+        target = game_players[(i + 1) % len(game_players)]
+        clues = await ScriptClues.filter(script_id=script_id, character_id=target.character_id).limit(searches_per_player)
+        for clue in clues:
+            await SearchActions.create(
+                game_player=player, searchable_player=target, clues_found=clue,
+                is_public=False, stage=current_stage
+            )
+
+    return room
@@ -0,0 +1,539 @@
+"""端到端 WebSocket 压测：模拟大量房间同时进行完整的游戏流程
+
+运行方式：python -m benchmarks.load_test [--base-url http://127.0.0.1:8000] [--rooms 100] [--players 4]
+          [--chat-messages 5] [--ramp-up 10] [--output load_test.json]
+          python -m benchmarks.load_test --spawn [--rooms 100]
+
+每个房间：房主和玩家通过 /auth/guest-register 注册游客，房主 /api/room/create 创建房间、
+设置游戏参数，其他玩家 /api/room/join 加入，所有人连接 /ws/{room_code}，然后按顺序执行
+generate_script → select_character → ready → start_game → chat → search_begin →
+search_script_clue → start_vote → game_vote → end_vote。
+
+统计：
+- 每种消息的往返延迟（发送到收到对应的广播或回复）的 p50/p95/p99
+- 广播扇出时间：同一条聊天消息第一个和最后一个房间成员收到的时间差
+- 服务端每条消息的 SQL 语句数和 CPU 占用（需要服务以 benchmarks.load_test_server 启动）
+
+--spawn 在临时目录中启动模型桩服务（benchmarks.stub_model_server）和压测用的应用服务，
+压测结束后关闭；结果以 JSON 写入 --output，便于对比不同版本的结果。
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+from websockets.asyncio.client import connect
+
+from utils.json_patch_util import apply_json_patch
+
+GAME_SETTING = {
+    "theme": "民国公馆谋杀案",
+    "difficulty": "进阶",
+    "ai_dm_personality": "严肃",
+    "duration_mins": 60,
+}
+
+
+def percentile(values: List[float], p: float) -> float:
+    """最近秩法计算百分位数"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(p / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def summarize(values: List[float]) -> Dict[str, Any]:
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), 2),
+        "p50": round(percentile(values, 50), 2),
+        "p95": round(percentile(values, 95), 2),
+        "p99": round(percentile(values, 99), 2),
+        "max": round(max(values), 2),
+    }
+
+
+class LoadTestError(Exception):
+    """房间流程中的某一步失败"""
+
+
+class Recorder:
+    """汇总所有房间的测量结果"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.fanouts: List[float] = []
+        # 聊天消息各成员收到的时间 {token: [perf_counter, ...]}
+        self.chat_receipts: Dict[str, List[float]] = defaultdict(list)
+        self.messages_sent = 0
+        self.messages_received = 0
+        self.acks_sent = 0
+        self.server_errors: Dict[str, int] = defaultdict(int)
+        self.failures: Dict[str, int] = defaultdict(int)
+        self.rooms_completed = 0
+        self.rooms_failed = 0
+
+    def record_latency(self, message_type: str, started: float):
+        self.latencies[message_type].append((time.perf_counter() - started) * 1000)
+
+
+class Waiter:
+    def __init__(self, predicate: Callable[[Dict[str, Any]], bool]):
+        self.predicate = predicate
+        self.future = asyncio.get_running_loop().create_future()
+
+
+class LoadClient:
+    """一个模拟玩家：HTTP 接口 + WebSocket 连接"""
+
+    def __init__(self, http: httpx.AsyncClient, ws_base_url: str, recorder: Recorder, nickname: str):
+        self.http = http
+        self.ws_base_url = ws_base_url
+        self.recorder = recorder
+        self.nickname = nickname
+        self.user_id: Optional[int] = None
+        self.token: Optional[str] = None
+        self.status: Dict[str, Any] = {}
+        self._snapshots: Dict[int, Dict[str, Any]] = {}
+        self._waiters: List[Waiter] = []
+        self._ws = None
+        self._reader: Optional[asyncio.Task] = None
+
+    async def _call(self, method: str, url: str, **kwargs) -> Dict[str, Any]:
+        headers = {"Authorization": f"Bearer {self.token}"} if self.token else {}
+        response = await self.http.request(method, url, headers=headers, **kwargs)
+        if response.status_code != 200:
+            raise LoadTestError(f"{method} {url} 返回 {response.status_code}")
+        body = response.json()
+        if body.get("code") != 200:
+            raise LoadTestError(f"{method} {url} 失败: {body.get('msg')}")
+        return body["data"]
+
+    async def register(self):
+        data = await self._call("POST", "/auth/guest-register", params={"nickname": self.nickname})
+        self.token = data["access_token"]
+        self.user_id = data["user_info"]["id"]
+
+    async def create_room(self, players: int) -> str:
+        data = await self._call("POST", "/api/room/create", json={"player_count_max": players})
+        room_code = data["room_code"]
+        await self._call("PUT", f"/api/room/settings/{room_code}", json=GAME_SETTING)
+        return room_code
+
+    async def join_room(self, room_code: str):
+        await self._call("POST", "/api/room/join", json={"room_code": room_code})
+
+    async def connect(self, room_code: str):
+        waiter = self.expect(lambda message: message["type"] == "message_history")
+        self._ws = await connect(f"{self.ws_base_url}/ws/{room_code}?token={self.token}", max_size=None)
+        self._reader = asyncio.create_task(self._read_loop())
+        await self.wait(waiter, 30)
+
+    async def close(self):
+        if self._ws is not None:
+            await self._ws.close()
+        if self._reader is not None:
+            await asyncio.gather(self._reader, return_exceptions=True)
+
+    async def send(self, message_type: str, data: Optional[Dict[str, Any]] = None):
+        await self._ws.send(json.dumps({"type": message_type, "data": data or {}}, ensure_ascii=False))
+        # 房间状态确认不进入游戏消息处理，单独计数
+        if message_type == "room_status_ack":
+            self.recorder.acks_sent += 1
+        else:
+            self.recorder.messages_sent += 1
+
+    def expect(self, predicate: Callable[[Dict[str, Any]], bool]) -> Waiter:
+        """在发送消息前登记等待条件，避免回复先于登记到达"""
+        waiter = Waiter(predicate)
+        self._waiters.append(waiter)
+        return waiter
+
+    def expect_status(self, predicate: Callable[[Dict[str, Any]], bool]) -> Waiter:
+        """等待房间状态满足条件（当前状态已满足时立即完成）"""
+        waiter = self.expect(lambda message: message["type"].startswith("room_status") and predicate(self.status))
+        if self.status and predicate(self.status):
+            self._waiters.remove(waiter)
+            waiter.future.set_result(None)
+        return waiter
+
+    async def wait(self, waiter: Waiter, timeout: float) -> Dict[str, Any]:
+        try:
+            return await asyncio.wait_for(waiter.future, timeout)
+        except asyncio.TimeoutError:
+            raise LoadTestError("等待回复超时")
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    async def request(self, message_type: str, data: Optional[Dict[str, Any]],
+                      predicate: Callable[[Dict[str, Any]], bool], timeout: float) -> Dict[str, Any]:
+        """发送一条消息并等待对应的回复，记录往返延迟"""
+        waiter = self.expect(predicate)
+        started = time.perf_counter()
+        await self.send(message_type, data)
+        message = await self.wait(waiter, timeout)
+        self.recorder.record_latency(message_type, started)
+        if message.get("type") == "error":
+            raise LoadTestError(message.get("data", {}).get("message", "服务端返回错误"))
+        return message
+
+    async def _read_loop(self):
+        try:
+            async for raw in self._ws:
+                received = time.perf_counter()
+                message = json.loads(raw)
+                self.recorder.messages_received += 1
+                await self._handle(message, received)
+        except Exception:
+            pass
+        finally:
+            for waiter in list(self._waiters):
+                if not waiter.future.done():
+                    waiter.future.set_exception(LoadTestError("连接已断开"))
+
+    async def _handle(self, message: Dict[str, Any], received: float):
+        message_type = message.get("type")
+        data = message.get("data") or {}
+        if message_type == "room_status":
+            await self._apply_status(message.get("version"), data)
+        elif message_type == "room_status_delta":
+            base = self._snapshots.get(data.get("base_version"))
+            if base is None:
+                await self.send("room_status_ack", {"resync": True})
+                return
+            await self._apply_status(data["version"], apply_json_patch(base, data["patch"]))
+        elif message_type == "chat":
+            token = str(data.get("message", "")).split(" ", 1)[0]
+            self.recorder.chat_receipts[token].append(received)
+        elif message_type == "error":
+            self.recorder.server_errors[data.get("message", "")] += 1
+
+        for waiter in list(self._waiters):
+            if not waiter.future.done() and waiter.predicate(message):
+                waiter.future.set_result(message)
+                self._waiters.remove(waiter)
+
+    async def _apply_status(self, version: Optional[int], snapshot: Dict[str, Any]):
+        self.status = snapshot
+        if version is None:
+            return
+        self._snapshots[version] = snapshot
+        # 只保留最近几个版本作为增量基准
+        for old_version in sorted(self._snapshots)[:-4]:
+            del self._snapshots[old_version]
+        await self.send("room_status_ack", {"version": version})
+
+
+def of_type(*message_types: str) -> Callable[[Dict[str, Any]], bool]:
+    return lambda message: message.get("type") in message_types
+
+
+def room_status_is(status: str) -> Callable[[Dict[str, Any]], bool]:
+    return lambda snapshot: snapshot.get("room", {}).get("status") == status
+
+
+async def run_room(index: int, args, http: httpx.AsyncClient, ws_base_url: str, recorder: Recorder):
+    """执行一个房间的完整游戏流程"""
+    clients = [LoadClient(http, ws_base_url, recorder, f"压测{index}-{n}") for n in range(args.players)]
+    host, timeout = clients[0], args.timeout
+    step = "register"
+    try:
+        await asyncio.gather(*(client.register() for client in clients))
+        step = "create_room"
+        room_code = await host.create_room(args.players)
+        step = "join_room"
+        for client in clients[1:]:
+            await client.join_room(room_code)
+        step = "connect"
+        await asyncio.gather(*(client.connect(room_code) for client in clients))
+
+        step = "generate_script"
+        waiters = [client.expect_status(room_status_is("选择角色")) for client in clients]
+        await host.request("generate_script", None, of_type("script_generation_completed", "error"), args.script_timeout)
+        for client, waiter in zip(clients, waiters):
+            await client.wait(waiter, timeout)
+
+        step = "select_character"
+        characters = host.status.get("characters") or []
+        if len(characters) < len(clients):
+            raise LoadTestError("剧本角色数少于玩家数")
+        for client, character in zip(clients, characters):
+            await client.request("select_character", {"character_id": character["id"]},
+                                 of_type("character_selected", "error"), timeout)
+
+        step = "ready"
+        all_ready = host.expect(of_type("all_ready"))
+        for client in clients:
+            await client.request("ready", {"ready": True}, of_type("player_ready", "error"), timeout)
+        await host.wait(all_ready, timeout)
+
+        step = "start_game"
+        waiters = [client.expect_status(room_status_is("进行中")) for client in clients]
+        await host.request("start_game", None, of_type("game_started", "error"), timeout)
+        for client, waiter in zip(clients, waiters):
+            await client.wait(waiter, timeout)
+
+        step = "chat"
+        for n in range(args.chat_messages):
+            for client in clients:
+                token = uuid.uuid4().hex[:12]
+                await client.request("chat", {"message": f"{token} 第{n + 1}条发言"},
+                                     lambda message, token=token: message.get("type") == "chat"
+                                     and str(message.get("data", {}).get("message", "")).startswith(token), timeout)
+                await asyncio.sleep(args.think_time)
+
+        step = "search_begin"
+        waiters = [client.expect_status(
+            lambda snapshot: room_status_is("搜证中")(snapshot) and "search_info" in snapshot
+        ) for client in clients]
+        await host.request("search_begin", None, of_type("game_started", "error"), timeout)
+        for client, waiter in zip(clients, waiters):
+            await client.wait(waiter, timeout)
+
+        step = "search_script_clue"
+        for client in clients:
+            available = client.status.get("search_info", {}).get("available_clues") or []
+            if available:
+                await client.request("search_script_clue", {"clue_id": available[0]["id"]},
+                                     of_type("clue_discovered", "error"), timeout)
+
+        step = "game_vote"
+        await host.request("start_vote", None, of_type("vote_started", "error"), timeout)
+        # 房主最后不投票，由 end_vote 结束投票
+        for position, client in enumerate(clients[1:], start=1):
+            target = clients[(position + 1) % len(clients)]
+            if target is client:
+                target = host
+            await client.request("game_vote", {"voted_user_id": target.user_id},
+                                 of_type("vote_updated", "error"), timeout)
+
+        step = "end_vote"
+        await host.request("end_vote", None, of_type("vote_ended", "error"), timeout)
+        recorder.rooms_completed += 1
+    except Exception as e:
+        recorder.rooms_failed += 1
+        recorder.failures[f"{step}: {str(e) or type(e).__name__}"] += 1
+    finally:
+        await asyncio.gather(*(client.close() for client in clients), return_exceptions=True)
+
+
+async def fetch_server_stats(http: httpx.AsyncClient) -> Optional[Dict[str, Any]]:
+    """读取压测服务的统计（普通方式启动的服务没有该接口）"""
+    try:
+        response = await http.get("/bench/server-stats")
+    except httpx.HTTPError:
+        return None
+    return response.json() if response.status_code == 200 else None
+
+
+async def fetch_metrics(http: httpx.AsyncClient) -> Optional[Dict[str, Any]]:
+    try:
+        response = await http.get("/api/metrics")
+    except httpx.HTTPError:
+        return None
+    return response.json().get("data") if response.status_code == 200 else None
+
+
+async def sample_cpu(http: httpx.AsyncClient, samples: List[float], interval: float):
+    """定期读取服务端 CPU 时间，计算各时间段的 CPU 占用率"""
+    previous = await fetch_server_stats(http)
+    while previous is not None:
+        await asyncio.sleep(interval)
+        current = await fetch_server_stats(http)
+        if current is None:
+            return
+        cpu = (current["cpu_user_seconds"] + current["cpu_system_seconds"]
+               - previous["cpu_user_seconds"] - previous["cpu_system_seconds"])
+        wall = current["wall_seconds"] - previous["wall_seconds"]
+        if wall > 0:
+            samples.append(cpu / wall * 100)
+        previous = current
+
+
+def server_summary(before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]],
+                   cpu_samples: List[float], messages_sent: int) -> Optional[Dict[str, Any]]:
+    if before is None or after is None:
+        return None
+    queries = after["db_queries"] - before["db_queries"]
+    cpu = (after["cpu_user_seconds"] + after["cpu_system_seconds"]
+           - before["cpu_user_seconds"] - before["cpu_system_seconds"])
+    wall = after["wall_seconds"] - before["wall_seconds"]
+    return {
+        "db_queries": queries,
+        "db_queries_per_message": round(queries / messages_sent, 2) if messages_sent else 0.0,
+        "cpu_seconds": round(cpu, 3),
+        "cpu_percent_avg": round(cpu / wall * 100, 1) if wall > 0 else 0.0,
+        "cpu_percent_p95": round(percentile(cpu_samples, 95), 1),
+        "cpu_percent_max": round(max(cpu_samples), 1) if cpu_samples else 0.0,
+    }
+
+
+async def run(args) -> Dict[str, Any]:
+    recorder = Recorder()
+    ws_base_url = "ws" + args.base_url[len("http"):]
+    limits = httpx.Limits(max_connections=args.http_connections, max_keepalive_connections=args.http_connections)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.timeout) as http:
+        before = await fetch_server_stats(http)
+        cpu_samples: List[float] = []
+        sampler = asyncio.create_task(sample_cpu(http, cpu_samples, args.cpu_interval))
+
+        started = time.perf_counter()
+        tasks = []
+        for index in range(args.rooms):
+            tasks.append(asyncio.create_task(run_room(index, args, http, ws_base_url, recorder)))
+            if args.ramp_up and args.rooms > 1:
+                await asyncio.sleep(args.ramp_up / (args.rooms - 1))
+        await asyncio.gather(*tasks)
+        duration = time.perf_counter() - started
+
+        sampler.cancel()
+        await asyncio.gather(sampler, return_exceptions=True)
+        after = await fetch_server_stats(http)
+        metrics = await fetch_metrics(http)
+
+    for receipts in recorder.chat_receipts.values():
+        if len(receipts) > 1:
+            recorder.fanouts.append((max(receipts) - min(receipts)) * 1000)
+
+    # 剧本生成的耗时主要取决于模型，不计入总体的往返延迟
+    all_latencies = [
+        value for message_type, values in recorder.latencies.items()
+        if message_type != "generate_script" for value in values
+    ]
+    return {
+        "config": {
+            "base_url": args.base_url,
+            "rooms": args.rooms,
+            "players": args.players,
+            "chat_messages": args.chat_messages,
+            "think_time": args.think_time,
+            "ramp_up": args.ramp_up,
+        },
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "duration_seconds": round(duration, 2),
+        "rooms": {
+            "completed": recorder.rooms_completed,
+            "failed": recorder.rooms_failed,
+            "failures": dict(recorder.failures),
+        },
+        "messages": {
+            "sent": recorder.messages_sent,
+            "received": recorder.messages_received,
+            "status_acks_sent": recorder.acks_sent,
+            "sent_per_second": round(recorder.messages_sent / duration, 1) if duration else 0.0,
+            "server_errors": dict(recorder.server_errors),
+        },
+        "latency_ms": dict(
+            {"all": summarize(all_latencies)},
+            **{message_type: summarize(values) for message_type, values in sorted(recorder.latencies.items())}
+        ),
+        "fanout_ms": summarize(recorder.fanouts),
+        "server": server_summary(before, after, cpu_samples, recorder.messages_sent),
+        "server_metrics": metrics,
+    }
+
+
+def spawn_servers(args) -> List[subprocess.Popen]:
+    """启动模型桩服务和压测用的应用服务（使用临时数据库）"""
+    workdir = tempfile.mkdtemp(prefix="load_test_")
+    host, port = "127.0.0.1", args.port
+    stub_port = port + 1
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite://{os.path.join(workdir, 'load_test.db')}",
+        API_URL=f"http://{host}:{stub_port}/v1/chat/completions",
+        API_KEY="stub",
+        MODEL_CACHE_MODE="off",
+        SCRIPT_POOL_TARGET_DEPTH="0",
+    )
+    env.setdefault("SCRIPT_GENERATION_WORKERS", str(args.script_workers))
+    stub = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.stub_model_server", "--port", str(stub_port),
+         "--tps", "0", "--ttft-ms", str(args.stub_ttft_ms)],
+        env=env
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.load_test_server", "--port", str(port)],
+        env=env, stdout=subprocess.DEVNULL
+    )
+    args.base_url = f"http://{host}:{port}"
+    return [server, stub]
+
+
+async def wait_until_ready(base_url: str, timeout: float = 30.0):
+    deadline = time.perf_counter() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as http:
+        while True:
+            try:
+                if (await http.get("/health")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            if time.perf_counter() > deadline:
+                raise RuntimeError(f"服务未在 {timeout} 秒内启动: {base_url}")
+            await asyncio.sleep(0.2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="端到端 WebSocket 压测")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000", help="应用服务地址")
+    parser.add_argument("--rooms", type=int, default=100, help="房间数")
+    parser.add_argument("--players", type=int, default=4, help="每个房间的玩家数")
+    parser.add_argument("--chat-messages", type=int, default=5, help="每个玩家发送的聊天消息数")
+    parser.add_argument("--think-time", type=float, default=0.0, help="玩家两次发言之间的间隔（秒）")
+    parser.add_argument("--ramp-up", type=float, default=10.0, help="在该时间内（秒）陆续启动所有房间")
+    parser.add_argument("--timeout", type=float, default=30.0, help="等待单条回复的超时（秒）")
+    parser.add_argument("--script-timeout", type=float, default=300.0, help="等待剧本生成完成的超时（秒）")
+    parser.add_argument("--http-connections", type=int, default=100, help="HTTP 接口的连接数上限")
+    parser.add_argument("--cpu-interval", type=float, default=1.0, help="服务端 CPU 占用的采样间隔（秒）")
+    parser.add_argument("--output", default="load_test.json", help="结果文件")
+    parser.add_argument("--spawn", action="store_true", help="启动模型桩服务和压测用的应用服务")
+    parser.add_argument("--port", type=int, default=8100, help="--spawn 时应用服务的端口（桩服务使用下一个端口）")
+    parser.add_argument("--script-workers", type=int, default=8, help="--spawn 时同时生成剧本的任务数")
+    parser.add_argument("--stub-ttft-ms", type=float, default=50.0, help="--spawn 时桩服务首个令牌前的延迟（毫秒）")
+    args = parser.parse_args()
+
+    processes = spawn_servers(args) if args.spawn else []
+    try:
+        if processes:
+            asyncio.run(wait_until_ready(args.base_url))
+        results = asyncio.run(run(args))
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+
+    latency = results["latency_ms"]["all"]
+    print(f"房间 完成 {results['rooms']['completed']} / 失败 {results['rooms']['failed']}，"
+          f"耗时 {results['duration_seconds']}s，发送消息 {results['messages']['sent']} 条")
+    if latency["count"]:
+        print(f"往返延迟 p50 {latency['p50']}ms  p95 {latency['p95']}ms  p99 {latency['p99']}ms")
+    fanout = results["fanout_ms"]
+    if fanout["count"]:
+        print(f"广播扇出 p50 {fanout['p50']}ms  p95 {fanout['p95']}ms  p99 {fanout['p99']}ms")
+    if results["server"]:
+        server = results["server"]
+        print(f"服务端 每条消息 {server['db_queries_per_message']} 条 SQL，CPU 平均 {server['cpu_percent_avg']}%")
+    for failure, count in results["rooms"]["failures"].items():
+        print(f"  失败 {count} 次: {failure}")
+    print(f"结果已写入 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
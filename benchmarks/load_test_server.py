@@ -0,0 +1,52 @@
+"""压测用的应用服务：在 main.app 的基础上统计 SQL 语句数和进程 CPU 时间
+
+运行方式：DATABASE_URL=sqlite://./load_test.db python -m benchmarks.load_test_server [--port 8000]
+
+与 python main.py 启动的服务相同，另外提供 GET /bench/server-stats，
+返回服务启动以来执行的 SQL 语句数和进程占用的 CPU 时间，
+压测工具（benchmarks.load_test）在压测前后各读取一次，计算每条消息的语句数和 CPU 占用。
+"""
+import argparse
+import logging
+import os
+import time
+
+from benchmarks.query_counter import DB_CLIENT_LOGGER, QueryCounter
+
+STARTED_AT = time.perf_counter()
+query_counter = QueryCounter()
+
+
+def server_stats():
+    times = os.times()
+    return {
+        "db_queries": query_counter.count,
+        "cpu_user_seconds": round(times.user, 3),
+        "cpu_system_seconds": round(times.system, 3),
+        "wall_seconds": round(time.perf_counter() - STARTED_AT, 3),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def create_app():
+    from main import app
+
+    app.add_api_route("/bench/server-stats", server_stats, methods=["GET"], tags=["压测"])
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="压测用的应用服务")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址")
+    parser.add_argument("--port", type=int, default=8000, help="监听端口")
+    args = parser.parse_args()
+
+    import uvicorn
+    # 语句日志只用于计数，不输出
+    logging.getLogger(DB_CLIENT_LOGGER).propagate = False
+    with query_counter:
+        uvicorn.run(create_app(), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""统计 Tortoise ORM 执行的 SQL 语句数量"""
+import logging
+from typing import List
+
+# Tortoise 每执行一条语句都会在该日志器上输出一条 DEBUG 日志
+DB_CLIENT_LOGGER = "tortoise.db_client"
+
+
+class QueryCounter(logging.Handler):
+    """以上下文管理器的方式统计期间执行的 SQL 语句
+
+    with QueryCounter() as counter:
+        await ...
+    print(counter.count)
+    """
+
+    def __init__(self, keep_statements: bool = False):
+        super().__init__(level=logging.DEBUG)
+        self.count = 0
+        self.keep_statements = keep_statements
+        self.statements: List[str] = []
+        self._logger = logging.getLogger(DB_CLIENT_LOGGER)
+        self._previous_level = self._logger.level
+
+    def emit(self, record: logging.LogRecord):
+        message = str(record.msg)
+        # 忽略连接建立/关闭等非语句日志
+        if message.startswith(("Created connection", "Closed connection")):
+            return
+        self.count += 1
+        if self.keep_statements:
+            self.statements.append(record.getMessage())
+
+    def reset(self):
+        self.count = 0
+        self.statements = []
+
+    def __enter__(self) -> "QueryCounter":
+        self._previous_level = self._logger.level
+        self._logger.setLevel(logging.DEBUG)
+        self._logger.addHandler(self)
+        return self
+
+    def __exit__(self, *exc):
+        self._logger.removeHandler(self)
+        self._logger.setLevel(self._previous_level)
@@ -0,0 +1,235 @@
+"""本地 OpenAI 兼容的模型桩服务：离线压测剧本生成和 NPC 对话
+
+运行方式：python -m benchmarks.stub_model_server [--port 8001] [--tps 200] [--ttft-ms 500]
+          [--script-file 录制的响应.json] [--error-rate 0.05] [--rate-limit-rate 0.1]
+
+启动后把应用指向桩服务：
+    API_URL=http://127.0.0.1:8001/v1/chat/completions API_KEY=stub
+
+- 剧本生成请求（系统提示词要求输出剧本 JSON）：回放 --script-file 中录制的响应
+  （原始文本，或模型响应缓存的 JSON 文件），未指定时按提示词中的玩家人数生成模板剧本
+- 其他请求（NPC 对话）：返回模板回复
+- 支持 stream=true 的 SSE 流式输出和普通 JSON 响应
+- --tps 控制每秒输出的令牌数，--ttft-ms 控制首个令牌前的延迟
+- --error-rate 按概率返回 500，--midstream-error-rate 按概率在输出中途断开连接，
+  --rate-limit-rate 按概率返回 429，--max-concurrency 超过并发数时返回 429
+- --seed 固定随机数种子，相同的请求序列得到相同的结果
+- GET /stats 返回请求统计
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from benchmarks.fixtures import make_script_data
+
+# NPC 对话的模板回复
+NPC_REPLIES = [
+    "我昨晚一直在书房整理账本，直到子时才回房休息。",
+    "这件事我不太清楚，你为什么要问我？",
+    "我看到管家在古井附近徘徊，神色有些慌张。",
+    "你手里的那封密信，能让我看看吗？",
+    "我和死者虽有过节，但绝不至于动手杀人。",
+]
+
+# 剧本生成请求的判断依据（系统提示词中的内容）
+SCRIPT_PROMPT_MARKER = "剧本"
+PLAYER_COUNT_PATTERN = re.compile(r"玩家人数\**[:：]\s*(\d+)")
+
+
+class StubOptions:
+    """桩服务配置"""
+
+    def __init__(self, tps: float = 200.0, ttft_ms: float = 500.0, token_chars: int = 2,
+                 error_rate: float = 0.0, midstream_error_rate: float = 0.0, rate_limit_rate: float = 0.0,
+                 max_concurrency: int = 0, stages: int = 3, script_response: Optional[str] = None, seed: int = 0):
+        self.tps = tps
+        self.ttft_ms = ttft_ms
+        self.token_chars = token_chars
+        self.error_rate = error_rate
+        self.midstream_error_rate = midstream_error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.max_concurrency = max_concurrency
+        self.stages = stages
+        self.script_response = script_response
+        self.seed = seed
+
+
+def load_script_response(path: str) -> str:
+    """读取录制的剧本响应（原始文本或模型响应缓存文件）"""
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        return text
+    if isinstance(data, dict) and isinstance(data.get("response"), str):
+        return data["response"]
+    return text
+
+
+def create_app(options: StubOptions) -> FastAPI:
+    """创建桩服务应用"""
+    app = FastAPI(title="Stub Model Server")
+    rng = random.Random(options.seed)
+    stats = {
+        "requests": 0,
+        "streamed": 0,
+        "completed": 0,
+        "errors": 0,
+        "midstream_errors": 0,
+        "rate_limited": 0,
+        "active": 0,
+        "max_active": 0,
+        "output_chars": 0,
+    }
+
+    def completion_text(messages: List[Dict[str, Any]]) -> str:
+        system = next((m.get("content", "") for m in messages if m.get("role") == "system"), "")
+        user = next((m.get("content", "") for m in reversed(messages) if m.get("role") == "user"), "")
+        if SCRIPT_PROMPT_MARKER in system and "JSON" in system:
+            if options.script_response:
+                return options.script_response
+            match = PLAYER_COUNT_PATTERN.search(user)
+            players = int(match.group(1)) if match else 4
+            data = make_script_data(characters=players, stages=options.stages)
+            return "```json\n" + json.dumps(data, ensure_ascii=False, indent=2) + "\n```"
+        return rng.choice(NPC_REPLIES)
+
+    def chunk_payload(completion_id: str, model: str, delta: Dict[str, Any], finish_reason: Optional[str] = None) -> str:
+        chunk = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+        return f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+
+    async def stream_completion(text: str, model: str, fail_at: Optional[int]):
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        try:
+            await asyncio.sleep(options.ttft_ms / 1000)
+            yield chunk_payload(completion_id, model, {"role": "assistant", "content": ""})
+
+            # 按令牌速率输出；速率很高时每次合并多个令牌，避免过于频繁的 sleep
+            tokens = [text[i:i + options.token_chars] for i in range(0, len(text), options.token_chars)]
+            interval = 1 / options.tps if options.tps > 0 else 0
+            batch = max(1, int(0.01 / interval)) if interval else len(tokens) or 1
+            started = time.perf_counter()
+            for index in range(0, len(tokens), batch):
+                if fail_at is not None and index >= fail_at:
+                    stats["midstream_errors"] += 1
+                    # 直接断开连接，客户端收到不完整的响应
+                    raise ConnectionResetError("injected midstream failure")
+                content = "".join(tokens[index:index + batch])
+                stats["output_chars"] += len(content)
+                yield chunk_payload(completion_id, model, {"content": content})
+                if interval:
+                    delay = started + (index + batch) * interval - time.perf_counter()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+
+            yield chunk_payload(completion_id, model, {}, "stop")
+            yield "data: [DONE]\n\n"
+            stats["completed"] += 1
+        finally:
+            stats["active"] -= 1
+
+    @app.post("/v1/chat/completions")
+    @app.post("/chat/completions")
+    async def chat_completions(request: Request):
+        stats["requests"] += 1
+        body = await request.json()
+
+        if options.max_concurrency and stats["active"] >= options.max_concurrency:
+            stats["rate_limited"] += 1
+            return JSONResponse(status_code=429, headers={"Retry-After": "1"},
+                                content={"error": {"message": "Too many concurrent requests", "type": "rate_limit_error"}})
+        if rng.random() < options.rate_limit_rate:
+            stats["rate_limited"] += 1
+            return JSONResponse(status_code=429, headers={"Retry-After": "1"},
+                                content={"error": {"message": "Rate limit reached", "type": "rate_limit_error"}})
+        if rng.random() < options.error_rate:
+            stats["errors"] += 1
+            return JSONResponse(status_code=500,
+                                content={"error": {"message": "Injected server error", "type": "server_error"}})
+
+        text = completion_text(body.get("messages", []))
+        model = body.get("model", "stub-model")
+
+        if body.get("stream"):
+            stats["streamed"] += 1
+            stats["active"] += 1
+            stats["max_active"] = max(stats["max_active"], stats["active"])
+            fail_at = None
+            if rng.random() < options.midstream_error_rate:
+                fail_at = rng.randint(0, max(0, len(text) // options.token_chars - 1))
+            return StreamingResponse(stream_completion(text, model, fail_at), media_type="text/event-stream")
+
+        stats["active"] += 1
+        stats["max_active"] = max(stats["max_active"], stats["active"])
+        try:
+            await asyncio.sleep(options.ttft_ms / 1000 + (len(text) / options.token_chars / options.tps if options.tps > 0 else 0))
+        finally:
+            stats["active"] -= 1
+        stats["completed"] += 1
+        stats["output_chars"] += len(text)
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": len(text) // options.token_chars, "total_tokens": 0},
+        }
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI 兼容的模型桩服务")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址")
+    parser.add_argument("--port", type=int, default=8001, help="监听端口")
+    parser.add_argument("--tps", type=float, default=200.0, help="每秒输出的令牌数（0 为不限速）")
+    parser.add_argument("--ttft-ms", type=float, default=500.0, help="首个令牌前的延迟（毫秒）")
+    parser.add_argument("--token-chars", type=int, default=2, help="每个令牌的字符数")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回 500 的概率")
+    parser.add_argument("--midstream-error-rate", type=float, default=0.0, help="流式输出中途断开的概率")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="返回 429 的概率")
+    parser.add_argument("--max-concurrency", type=int, default=0, help="并发请求数上限，超过时返回 429（0 为不限制）")
+    parser.add_argument("--stages", type=int, default=3, help="模板剧本的阶段数")
+    parser.add_argument("--script-file", help="回放录制的剧本响应（原始文本或模型响应缓存文件）")
+    parser.add_argument("--seed", type=int, default=0, help="随机数种子")
+    args = parser.parse_args()
+
+    options = StubOptions(
+        tps=args.tps,
+        ttft_ms=args.ttft_ms,
+        token_chars=args.token_chars,
+        error_rate=args.error_rate,
+        midstream_error_rate=args.midstream_error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        max_concurrency=args.max_concurrency,
+        stages=args.stages,
+        script_response=load_script_response(args.script_file) if args.script_file else None,
+        seed=args.seed,
+    )
+
+    import uvicorn
+    uvicorn.run(create_app(options), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
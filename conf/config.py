@@ -48,6 +48,61 @@ class Settings:
         self.API_KEY: str = os.getenv("API_KEY", "")
         self.API_MODEL: str = os.getenv("API_MODEL", "gpt-3.5-turbo")
         self.API_TEMPERATURE: float = float(os.getenv("API_TEMPERATURE", "1.0"))
+        self.AI_ROOM_CONCURRENCY: int = int(os.getenv("AI_ROOM_CONCURRENCY", "2"))  # 单个房间同时执行的NPC响应数
+        self.AI_GLOBAL_CONCURRENCY: int = int(os.getenv("AI_GLOBAL_CONCURRENCY", "8"))  # 全局同时进行的模型调用数
+        self.AI_NPC_MAX_TOKENS: int = int(os.getenv("AI_NPC_MAX_TOKENS", "300"))  # NPC单次回复的最大令牌数
+        self.AI_STREAM_CHUNK_INTERVAL_MS: int = int(os.getenv("AI_STREAM_CHUNK_INTERVAL_MS", "100"))  # NPC回复分段推送间隔（毫秒）
+
+        # HTTP客户端配置（模型接口调用共用的连接池）
+        self.HTTP_CLIENT_MAX_CONNECTIONS: int = int(os.getenv("HTTP_CLIENT_MAX_CONNECTIONS", "20"))  # 最大连接数
+        self.HTTP_CLIENT_MAX_KEEPALIVE: int = int(os.getenv("HTTP_CLIENT_MAX_KEEPALIVE", "10"))  # 最大保持的空闲连接数
+        self.HTTP_CLIENT_KEEPALIVE_EXPIRY: float = float(os.getenv("HTTP_CLIENT_KEEPALIVE_EXPIRY", "60.0"))  # 空闲连接保持时间（秒）
+        self.HTTP_CLIENT_HTTP2: bool = os.getenv("HTTP_CLIENT_HTTP2", "True").lower() == "true"  # 安装了 h2 时启用 HTTP/2
+        self.HTTP_CLIENT_CONNECT_TIMEOUT: float = float(os.getenv("HTTP_CLIENT_CONNECT_TIMEOUT", "10.0"))  # 连接超时（秒）
+        self.HTTP_CLIENT_READ_TIMEOUT: float = float(os.getenv("HTTP_CLIENT_READ_TIMEOUT", "60.0"))  # 默认读取超时（秒）
+        self.HTTP_CLIENT_WRITE_TIMEOUT: float = float(os.getenv("HTTP_CLIENT_WRITE_TIMEOUT", "30.0"))  # 写入超时（秒）
+        self.HTTP_CLIENT_POOL_TIMEOUT: float = float(os.getenv("HTTP_CLIENT_POOL_TIMEOUT", "30.0"))  # 等待空闲连接超时（秒）
+        self.SCRIPT_GENERATION_READ_TIMEOUT: float = float(os.getenv("SCRIPT_GENERATION_READ_TIMEOUT", "1800.0"))  # 剧本生成流式读取超时（秒）
+
+        # 模型响应缓存配置（剧本生成）
+        self.MODEL_CACHE_MODE: str = os.getenv("MODEL_CACHE_MODE", "off")  # off / read_through / record / replay
+        self.MODEL_CACHE_DIR: str = os.getenv("MODEL_CACHE_DIR", "./model_cache")  # 缓存目录
+        self.MODEL_CACHE_MAX_BYTES: int = int(os.getenv("MODEL_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))  # 缓存总大小上限（字节），超过后淘汰最久未使用的条目
+        self.MODEL_CACHE_TTL: int = int(os.getenv("MODEL_CACHE_TTL", str(7 * 24 * 3600)))  # 缓存有效期（秒），回放模式不检查
+        self.MODEL_CACHE_REPLAY_CHUNK_SIZE: int = int(os.getenv("MODEL_CACHE_REPLAY_CHUNK_SIZE", "1024"))  # 回放缓存时每段的字符数
+
+        # 剧本生成任务队列配置
+        self.SCRIPT_GENERATION_WORKERS: int = int(os.getenv("SCRIPT_GENERATION_WORKERS", "2"))  # 同时生成剧本的任务数
+        self.SCRIPT_GENERATION_PER_HOST_CONCURRENCY: int = int(os.getenv("SCRIPT_GENERATION_PER_HOST_CONCURRENCY", "1"))  # 每个房主同时生成剧本的任务数
+        self.SCRIPT_GENERATION_MAX_QUEUED_PER_HOST: int = int(os.getenv("SCRIPT_GENERATION_MAX_QUEUED_PER_HOST", "3"))  # 每个房主最多排队的任务数
+        self.SCRIPT_GENERATION_MAX_ATTEMPTS: int = int(os.getenv("SCRIPT_GENERATION_MAX_ATTEMPTS", "2"))  # 任务失败后最多执行的次数
+        self.SCRIPT_POOL_TARGET_DEPTH: int = int(os.getenv("SCRIPT_POOL_TARGET_DEPTH", "2"))  # 每个热门参数桶预生成的剧本数（0 为不启用剧本池）
+        self.SCRIPT_POOL_MAX_BUCKETS: int = int(os.getenv("SCRIPT_POOL_MAX_BUCKETS", "5"))  # 最多维护的热门参数桶数
+        self.SCRIPT_POOL_MIN_REQUESTS: int = int(os.getenv("SCRIPT_POOL_MIN_REQUESTS", "3"))  # 近期请求次数达到该值的参数桶才预生成
+        self.SCRIPT_POOL_DEMAND_DAYS: int = int(os.getenv("SCRIPT_POOL_DEMAND_DAYS", "7"))  # 统计请求次数的天数
+        self.SCRIPT_POOL_FILL_INTERVAL: float = float(os.getenv("SCRIPT_POOL_FILL_INTERVAL", "60.0"))  # 剧本池检查间隔（秒）
+
+        # 剧本内容缓存配置
+        self.SCRIPT_CONTENT_CACHE_SIZE: int = int(os.getenv("SCRIPT_CONTENT_CACHE_SIZE", "200"))  # 最多缓存的剧本数，超过后淘汰最久未使用的剧本
+
+        # 搜查记录缓存配置
+        self.SEARCH_REVEAL_CACHE_SIZE: int = int(os.getenv("SEARCH_REVEAL_CACHE_SIZE", "500"))  # 最多缓存搜查记录的房间数，超过后淘汰最久未使用的房间
+
+        # 投票计数缓存配置
+        self.VOTE_TALLY_CACHE_SIZE: int = int(os.getenv("VOTE_TALLY_CACHE_SIZE", "500"))  # 最多缓存投票计数的房间数，超过后淘汰最久未使用的房间
+
+        # WebSocket配置
+        self.WS_SEND_TIMEOUT: float = float(os.getenv("WS_SEND_TIMEOUT", "5.0"))  # 单次发送超时（秒）
+        self.WS_QUEUE_HIGH_WATER: int = int(os.getenv("WS_QUEUE_HIGH_WATER", "32"))  # 超过后丢弃积压的房间状态帧（增量改为重新发送全量快照）
+        self.WS_QUEUE_MAX_SIZE: int = int(os.getenv("WS_QUEUE_MAX_SIZE", "128"))  # 超过后断开慢客户端
+        self.ROOM_STATUS_DEBOUNCE_MS: int = int(os.getenv("ROOM_STATUS_DEBOUNCE_MS", "80"))  # 房间状态广播合并窗口（毫秒）
+        self.ROOM_STATUS_MAX_VERSION_GAP: int = int(os.getenv("ROOM_STATUS_MAX_VERSION_GAP", "10"))  # 增量基准落后超过该版本数时发送全量快照
+
+        # 游戏日志配置
+        self.GAME_LOG_BATCH_SIZE: int = int(os.getenv("GAME_LOG_BATCH_SIZE", "100"))  # 缓冲区达到该条数时立即批量写入
+        self.GAME_LOG_FLUSH_INTERVAL_MS: int = int(os.getenv("GAME_LOG_FLUSH_INTERVAL_MS", "200"))  # 最长写入间隔（毫秒）
+        self.RECENT_MESSAGE_BUFFER_SIZE: int = int(os.getenv("RECENT_MESSAGE_BUFFER_SIZE", "100"))  # 每个房间缓存的最近日志条数
+        self.MESSAGE_HISTORY_REPLAY_SIZE: int = int(os.getenv("MESSAGE_HISTORY_REPLAY_SIZE", "50"))  # 重连时回放的消息条数
         
 
     def is_development(self) -> bool:
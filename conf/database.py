@@ -15,10 +15,57 @@ TORTOISE_ORM = {
     },
 }
 
+# 模型中后来增加的唯一索引 (索引名, 表名, 字段)
+# generate_schemas 只创建不存在的表，不会把新的 unique_together 加到已有的表上，启动时由 ensure_unique_indexes 补建
+UNIQUE_INDEXES = [
+    # 同一玩家同一线索只能搜到一次（SearchActions，搜查次数的原子扣减依赖该索引）
+    ("uid_game_script_game_pl_0276c9", "game_script_search", ("game_player_id", "clues_found_id")),
+]
+
 async def init_db():
     """初始化数据库连接"""
     await Tortoise.init(TORTOISE_ORM)
     await Tortoise.generate_schemas()
+    await ensure_unique_indexes()
+
+async def ensure_unique_indexes():
+    """为已有的表补建 UNIQUE_INDEXES 中缺少的唯一索引
+
+    补建前删除重复的记录（每组保留ID最小的一条），否则建索引会失败。
+    支持 SQLite 和 MySQL；其他数据库需按 docs/sql/ 中的语句手动执行。
+    """
+    conn = Tortoise.get_connection("default")
+    dialect = conn.capabilities.dialect
+    if dialect not in ("sqlite", "mysql"):
+        print(f"数据库 {dialect} 不支持自动补建唯一索引，请按 docs/sql/ 中的语句手动执行")
+        return
+
+    for name, table, columns in UNIQUE_INDEXES:
+        if await _has_unique_index(conn, dialect, table, columns):
+            continue
+        column_list = ", ".join(columns)
+        # 子查询包一层派生表，MySQL 不允许 DELETE 时直接查询同一张表
+        deleted = await conn.execute_query(
+            f"DELETE FROM {table} WHERE id NOT IN ("
+            f"SELECT id FROM (SELECT MIN(id) AS id FROM {table} GROUP BY {column_list}) AS keep_rows)"
+        )
+        await conn.execute_script(f"CREATE UNIQUE INDEX {name} ON {table} ({column_list})")
+        print(f"已为 {table} 补建唯一索引 {name}（删除重复记录 {deleted[0]} 条）")
+
+async def _has_unique_index(conn, dialect: str, table: str, columns) -> bool:
+    """表上是否已有这些字段（按顺序）的唯一索引"""
+    indexes = {}
+    if dialect == "sqlite":
+        for index in await conn.execute_query_dict(f"PRAGMA index_list({table})"):
+            if index["unique"]:
+                info = await conn.execute_query_dict(f"PRAGMA index_info({index['name']})")
+                indexes[index["name"]] = [row["name"] for row in sorted(info, key=lambda row: row["seqno"])]
+    else:
+        for row in await conn.execute_query_dict(f"SHOW INDEX FROM {table}"):
+            if not int(row["Non_unique"]):
+                indexes.setdefault(row["Key_name"], []).append((row["Seq_in_index"], row["Column_name"]))
+        indexes = {key: [column for _, column in sorted(value)] for key, value in indexes.items()}
+    return list(columns) in indexes.values()
 
 async def close_db():
     """关闭数据库连接"""
@@ -0,0 +1,20 @@
+-- 搜查行动记录表 game_script_search 的唯一索引 (game_player_id, clues_found_id)
+--
+-- 同一玩家同一线索只能搜到一次；搜查次数的原子扣减依赖该索引拒绝重复的搜查记录。
+-- generate_schemas 不会把后来增加的唯一约束加到已有的表上：
+-- SQLite 和 MySQL 在应用启动时由 conf.database.ensure_unique_indexes 自动补建，
+-- 其他数据库（或需要在停机维护时执行）按下面的语句手动执行。
+--
+-- 1. 删除重复的搜查记录（每组保留ID最小的一条），否则建索引会失败
+DELETE FROM game_script_search
+WHERE id NOT IN (
+    SELECT id FROM (
+        SELECT MIN(id) AS id
+        FROM game_script_search
+        GROUP BY game_player_id, clues_found_id
+    ) AS keep_rows
+);
+
+-- 2. 创建唯一索引（索引名与 generate_schemas 新建表时的约束名一致）
+CREATE UNIQUE INDEX uid_game_script_game_pl_0276c9
+    ON game_script_search (game_player_id, clues_found_id);
@@ -1,20 +1,47 @@
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
-from conf.database import register_db
+from conf.database import register_db, ensure_unique_indexes
 from api.room_api import router as room_router
 from api.auth_api import router as auth_router
 from api.npc_api import router as npc_router
+from api.metrics_api import router as metrics_router
+from api.script_job_api import router as script_job_router
 from utils.scripts_util import router as scripts_router
 from websocket.websocket_routes import router as websocket_router
+from service.RoomActor import room_actor_registry
+from service.AIResponsePipeline import ai_response_pipeline
+from service.ScriptGenerationQueue import script_generation_queue
+from service.ScriptPool import script_pool
+from utils.game_log_writer import game_log_writer
+from utils.http_client import http_client
 from fastapi.middleware.cors import CORSMiddleware
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # 应用启动时的操作
     print("应用启动，初始化数据库连接...")
+    # 已有的表补建模型后来增加的唯一索引
+    await ensure_unique_indexes()
+    game_log_writer.start()
+    http_client.start()
+    # 恢复未完成的剧本生成任务并启动工作协程
+    await script_generation_queue.start()
+    # 在剧本生成空闲时为热门参数预生成剧本
+    script_pool.start()
     yield
     # 应用关闭时的操作
     print("应用关闭，清理资源...")
+    # 取消尚未完成的AI响应
+    await ai_response_pipeline.close()
+    await script_pool.close()
+    # 停止剧本生成，执行中的任务重新排队，下次启动时继续
+    await script_generation_queue.close()
+    # 处理完房间内剩余的消息并写入数据库
+    await room_actor_registry.close_all()
+    # 写入缓冲区中剩余的游戏日志
+    await game_log_writer.stop()
+    # 关闭模型接口的共享连接池
+    await http_client.close()
 
 
 # 创建FastAPI应用
@@ -32,6 +59,8 @@ app.include_router(auth_router)
 app.include_router(room_router)
 app.include_router(scripts_router)
 app.include_router(npc_router)
+app.include_router(metrics_router)
+app.include_router(script_job_router)
 # 添加WebSocket路由
 app.include_router(websocket_router)
 
@@ -0,0 +1,28 @@
+from pydantic import BaseModel
+from typing import List, Optional
+from datetime import datetime
+from .response import ApiResponse
+
+# 剧本生成任务相关的数据模型
+class ScriptJobData(BaseModel):
+    id: int
+    room_code: str
+    status: str
+    progress: int
+    total: int
+    attempts: int
+    queue_position: Optional[int] = None
+    script_id: Optional[int] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+class ScriptJobResponse(ApiResponse[ScriptJobData]):
+    pass
+
+class ScriptJobListData(BaseModel):
+    jobs: List[ScriptJobData]
+
+class ScriptJobListResponse(ApiResponse[ScriptJobListData]):
+    pass
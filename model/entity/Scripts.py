@@ -190,6 +190,7 @@ class SearchActions(BaseModel):
     
     class Meta:
         table = "game_script_search"
+        unique_together = [('game_player', 'clues_found')]  # 同一玩家同一线索只能搜到一次
         
         
 class ScriptTimeline(BaseModel):
@@ -242,4 +243,39 @@ class AIInteractions(BaseModel):
     execution_result = fields.TextField(null=True)  # 执行结果
     
     class Meta:
-        table = "ai_interactions"
\ No newline at end of file
+        table = "ai_interactions"
+
+# 剧本生成任务表
+class ScriptGenerationJobs(BaseModel):
+    """剧本生成任务表"""
+    room = fields.ForeignKeyField('models.GameRooms', related_name='script_generation_jobs')
+    host_user = fields.ForeignKeyField('models.Users', related_name='script_generation_jobs')  # 发起生成的房主
+    game_setting = fields.JSONField()  # 生成参数
+    status = fields.CharField(
+        max_length=10,
+        choices=[('排队中', '排队中'), ('生成中', '生成中'), ('已完成', '已完成'), ('失败', '失败'), ('已取消', '已取消')],
+        default='排队中'
+    )
+    progress = fields.IntField(default=0)  # 已生成的剧本字段数
+    attempts = fields.IntField(default=0)  # 已执行次数
+    # 失败时会删除生成了一部分的剧本，任务记录需要保留
+    script = fields.ForeignKeyField('models.Scripts', related_name='generation_jobs', null=True, on_delete=fields.SET_NULL)
+    from_pool = fields.BooleanField(default=False)  # 是否直接领取了预生成剧本池中的剧本
+    error = fields.TextField(null=True)  # 最近一次失败原因
+    started_at = fields.DatetimeField(null=True)
+    finished_at = fields.DatetimeField(null=True)
+
+    class Meta:
+        table = "script_generation_jobs"
+
+
+# 预生成剧本池表
+class ScriptPoolEntries(BaseModel):
+    """预生成且尚未被领取的剧本"""
+    script = fields.ForeignKeyField('models.Scripts', related_name='pool_entries')
+    bucket = fields.CharField(max_length=40, index=True)  # 生成参数的分桶键
+    game_setting = fields.JSONField()  # 生成参数
+    player_count = fields.IntField()
+
+    class Meta:
+        table = "script_pool"
@@ -11,6 +11,8 @@ class MessageType(str, Enum):
     
     # 房间状态相关
     ROOM_STATUS = "room_status"
+    ROOM_STATUS_DELTA = "room_status_delta"  # 房间状态增量（JSON Patch）
+    ROOM_STATUS_ACK = "room_status_ack"  # 客户端确认已应用的房间状态版本
     ROOM_SETTINGS_UPDATED = "room_settings_updated"
     PLAYER_JOINED = "player_joined"
     PLAYER_LEFT = "player_left"
@@ -19,6 +21,7 @@ class MessageType(str, Enum):
     # 聊天相关
     CHAT = "chat"
     PRIVATE_MESSAGE = "private_message"
+    MESSAGE_HISTORY = "message_history"  # 重连时回放的最近消息
     
     # 角色选择相关
     SELECT_CHARACTER = "select_character"
@@ -79,6 +82,7 @@ class MessageType(str, Enum):
     # 剧本生成相关
     GENERATE_SCRIPT = "generate_script"
     SCRIPT_GENERATION_STARTED = "script_generation_started"
+    SCRIPT_GENERATION_PROGRESS = "script_generation_progress"  # 剧本的某个部分已生成并保存
     SCRIPT_GENERATION_COMPLETED = "script_generation_completed"
     SCRIPT_GENERATION_FAILED = "script_generation_failed"
 
@@ -150,6 +154,11 @@ class RemoveNPCData(BaseModel):
     """移除NPC数据"""
     player_id: int = Field(..., gt=0)  # NPC的GamePlayer记录ID
 
+class RoomStatusAckData(BaseModel):
+    """房间状态确认数据"""
+    version: Optional[int] = Field(None, gt=0)  # 客户端已应用的版本
+    resync: bool = False  # 客户端缺少增量基准，请求全量快照
+
 # 接收消息类型映射
 INCOMING_MESSAGE_TYPES = {
     MessageType.CHAT: ChatMessageData,
@@ -176,11 +185,13 @@ OUTGOING_MESSAGE_TYPES = {
     MessageType.CONNECTED: dict,
     MessageType.ERROR: dict,
     MessageType.ROOM_STATUS: dict,
+    MessageType.ROOM_STATUS_DELTA: dict,
     MessageType.ROOM_SETTINGS_UPDATED: dict,
     MessageType.PLAYER_JOINED: dict,
     MessageType.PLAYER_LEFT: dict,
     MessageType.CHAT: dict,
     MessageType.PRIVATE_MESSAGE: dict,
+    MessageType.MESSAGE_HISTORY: dict,
     MessageType.CHARACTER_SELECTED: dict,
     MessageType.PLAYER_READY: dict,
     MessageType.ALL_READY: dict,
@@ -193,6 +204,7 @@ OUTGOING_MESSAGE_TYPES = {
     MessageType.CLUE_DISCOVERED: dict,
     MessageType.AI_MESSAGE: dict,
     MessageType.SCRIPT_GENERATION_STARTED: dict,
+    MessageType.SCRIPT_GENERATION_PROGRESS: dict,
     MessageType.SCRIPT_GENERATION_COMPLETED: dict,
     MessageType.SCRIPT_GENERATION_FAILED: dict,
     MessageType.NPC_ADDED: dict,
@@ -206,7 +218,7 @@ def create_message(message_type: MessageType, data: Any = None) -> Dict[str, Any
     from datetime import datetime
     
     # 对于状态类消息，保持原有data结构
-    if message_type in [MessageType.ROOM_STATUS]:
+    if message_type in [MessageType.ROOM_STATUS, MessageType.ROOM_STATUS_DELTA]:
         return {
             "type": message_type.value,
             "data": data
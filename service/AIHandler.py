@@ -1,7 +1,8 @@
 import json
 import asyncio
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime, timedelta
+from functools import partial
 from tortoise.exceptions import DoesNotExist
 
 from model.entity.Scripts import GameRooms, GamePlayers, AIConfig, AIInteractions, ScriptClues
@@ -11,6 +12,8 @@ from utils.game_log_util import game_log_util
 from .ai_npc_handler.AIPromptBuilder import AIPromptBuilder
 from .ai_npc_handler.AIDecisionEngine import AIDecisionEngine
 from .ai_npc_handler.AIResponseExecutor import AIResponseExecutor
+from .AIResponsePipeline import ai_response_pipeline
+from .RoomActor import RoomState, room_actor_registry
 
 class AIHandler:
     """AI NPC处理器"""
@@ -20,15 +23,13 @@ class AIHandler:
         self.decision_engine = AIDecisionEngine()
         self.response_executor = AIResponseExecutor()
     
-    async def handle_player_message(self, room_code: str, sender_id: int, message_data: Dict[str, Any]):
-        """处理玩家消息，触发AI响应"""
+    async def schedule_player_message(self, state: RoomState, sender_id: int, message_data: Dict[str, Any]):
+        """处理玩家消息：为需要响应的AI玩家各提交一个后台响应任务"""
         try:
-            room = await GameRooms.get(room_code=room_code).prefetch_related(
-                'players__user', 'players__character', 'script', 'current_stage','players__aiconfig'
-            )
+            room = state.room
             
             # 获取房间中的AI玩家
-            ai_players = [p for p in room.players if p.is_npc and p.is_alive]
+            ai_players = [p for p in state.players.values() if p.is_npc and p.is_alive]
             
             for ai_player in ai_players:
                 # 判断是否需要响应
@@ -37,11 +38,33 @@ class AIHandler:
                 )
                 
                 if should_respond:
-                    await self._generate_ai_response(ai_player, sender_id, message_data, room)
+                    ai_response_pipeline.submit(
+                        state.room_code,
+                        room.current_stage_id,
+                        partial(self._respond_to_message, room, ai_player, sender_id, message_data,
+                                (room.status, room.current_stage_id))
+                    )
                     
         except Exception as e:
             print(f"AI处理玩家消息失败: {str(e)}")
     
+    async def _respond_to_message(self, room: GameRooms, ai_player: GamePlayers, sender_id: int,
+                                  message_data: Dict[str, Any], expected: Tuple[str, Optional[int]]):
+        """后台响应任务：直接使用房间内存状态中的房间和玩家对象生成响应，不再重新加载房间
+
+        expected 为提交任务时房间的 (状态, 阶段ID)，发送前核对，已变化则放弃这次响应。
+        """
+        if ai_player.is_alive:
+            await self._generate_ai_response(ai_player, sender_id, message_data, room, expected)
+    
+    def _room_moved_on(self, room: GameRooms, expected: Tuple[str, Optional[int]]) -> bool:
+        """房间在任务提交后是否已离开原来的状态或阶段（以房间处理器当前的内存状态为准）"""
+        state = room_actor_registry.get_state(room.room_code)
+        if state is None:
+            # 房间已不活跃（所有玩家离线）
+            return True
+        return (state.room.status, state.room.current_stage_id) != expected
+    
     async def _should_ai_respond(self, ai_player: GamePlayers, sender_id: int, 
                                 message_data: Dict[str, Any], room: GameRooms) -> bool:
         """判断AI是否应该响应"""
@@ -57,22 +80,31 @@ class AIHandler:
         if message_type == MessageType.CHAT.value:
             # 基于AI性格决定响应概率
             import random
-            return ai_player.aiconfig.respond_probability > random.random()
+            return bool(ai_player.aiconfig) and ai_player.aiconfig.response_random > random.random()
         return False
     
     async def _generate_ai_response(self, ai_player: GamePlayers, trigger_player_id: int,
-                                  message_data: Dict[str, Any], room: GameRooms):
-        """生成AI响应"""
+                                  message_data: Dict[str, Any], room: GameRooms,
+                                  expected: Optional[Tuple[str, Optional[int]]] = None):
+        """生成AI响应（传入 expected 时，房间状态或阶段已变化则不再发送）"""
         try:
             # 构建上下文
             context = await self.prompt_builder.build_context(ai_player, room, message_data)
             
-            # AI决策
-            decision = await self.decision_engine.make_decision(ai_player,room, trigger_player_id,context)
+            # AI决策并流式执行响应（占用全局模型调用名额）
+            async with ai_response_pipeline.model_slot():
+                decision = await self.decision_engine.make_decision(ai_player,room, trigger_player_id,context)
+                if not decision.get("should_act"):
+                    return
+                if expected is not None and self._room_moved_on(room, expected):
+                    return
+                await self.response_executor.execute_response(ai_player, decision, room)
             
-            # 执行响应
-            await self.response_executor.execute_response(ai_player, decision, room)
+            trigger_player = next((p for p in room.players if p.user_id == trigger_player_id), None)
+            await self.decision_engine.record_interaction(ai_player, room, trigger_player, context, decision)
             
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
             print(f"生成AI响应失败: {str(e)}")
     
@@ -80,7 +112,7 @@ class AIHandler:
         """触发AI自主行动"""
         try:
             room = await GameRooms.get(room_code=room_code).prefetch_related(
-                'players__user', 'players__character', 'script', 'current_stage'
+                'players__user', 'players__character', 'script', 'current_stage', 'players__aiconfig'
             )
             ai_players = [p for p in room.players if p.is_npc and p.is_alive]
             
@@ -88,10 +120,13 @@ class AIHandler:
                 # 检查是否需要自主行动
                 if await self._should_ai_act_autonomously(ai_player, room):
                     context = await self.prompt_builder.build_autonomous_context(ai_player, room)
-                    decision = await self.decision_engine.make_decision(ai_player,room,None, context)
-                    
-                    if decision.get("should_act"):
+                    async with ai_response_pipeline.model_slot():
+                        decision = await self.decision_engine.make_decision(ai_player,room,None, context)
+                        if not decision.get("should_act"):
+                            continue
                         await self.response_executor.execute_response(ai_player, decision, room)
+                    
+                    await self.decision_engine.record_interaction(ai_player, room, None, context, decision)
                         
         except Exception as e:
             print(f"AI自主行动失败: {str(e)}")
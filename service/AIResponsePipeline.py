@@ -0,0 +1,146 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from conf.config import settings
+
+
+class _Timing:
+    """耗时统计（毫秒）"""
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, elapsed_ms: float):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+
+    def to_dict(self) -> Dict[str, float]:
+        return {
+            "avg_ms": round(self.total_ms / self.count, 2) if self.count else 0.0,
+            "max_ms": round(self.max_ms, 2)
+        }
+
+
+class AIResponsePipeline:
+    """AI NPC响应任务调度器
+
+    每个NPC的响应作为独立的后台任务并发执行，发送者的消息处理不再等待NPC响应。
+    同一房间同时执行的任务数受 AI_ROOM_CONCURRENCY 限制，
+    全局同时进行的模型调用数受 AI_GLOBAL_CONCURRENCY 限制；
+    房间进入新阶段时取消旧阶段尚未完成的任务。
+    """
+
+    def __init__(self):
+        # 各房间的并发限制 {room_code: semaphore}
+        self._room_slots: Dict[str, asyncio.Semaphore] = {}
+        self._model_slots: Optional[asyncio.Semaphore] = None
+        # 各房间未完成的任务 {room_code: {task: stage_id}}
+        self._jobs: Dict[str, Dict[asyncio.Task, Optional[int]]] = {}
+
+        # 统计
+        self.submitted_count = 0
+        self.completed_count = 0
+        self.cancelled_count = 0
+        self.failed_count = 0
+        self.running_count = 0
+        self.queue_wait = _Timing()
+        self.model_wait = _Timing()
+        self.model_time = _Timing()
+
+    def submit(self, room_code: str, stage_id: Optional[int], job: Callable[[], Awaitable[Any]]):
+        """提交一个响应任务（立即返回）"""
+        self.submitted_count += 1
+        task = asyncio.create_task(self._run(room_code, job, time.perf_counter()))
+        jobs = self._jobs.setdefault(room_code, {})
+        jobs[task] = stage_id
+
+        def _on_done(_):
+            room_jobs = self._jobs.get(room_code)
+            if room_jobs is not None:
+                room_jobs.pop(task, None)
+                if not room_jobs:
+                    del self._jobs[room_code]
+                    self._room_slots.pop(room_code, None)
+
+        task.add_done_callback(_on_done)
+        return task
+
+    @asynccontextmanager
+    async def model_slot(self):
+        """占用一个全局模型调用名额，并统计等待和调用耗时"""
+        if self._model_slots is None:
+            self._model_slots = asyncio.Semaphore(settings.AI_GLOBAL_CONCURRENCY)
+
+        started = time.perf_counter()
+        async with self._model_slots:
+            acquired = time.perf_counter()
+            self.model_wait.record((acquired - started) * 1000)
+            try:
+                yield
+            finally:
+                self.model_time.record((time.perf_counter() - acquired) * 1000)
+
+    def cancel_stale(self, room_code: str, stage_id: Optional[int]):
+        """取消房间中不属于指定阶段的任务"""
+        for task, job_stage_id in list(self._jobs.get(room_code, {}).items()):
+            if job_stage_id != stage_id:
+                task.cancel()
+
+    def cancel_room(self, room_code: str):
+        """取消房间的全部任务"""
+        for task in list(self._jobs.get(room_code, {})):
+            task.cancel()
+
+    async def close(self):
+        """取消并等待全部任务结束（应用关闭时调用）"""
+        tasks = [task for jobs in self._jobs.values() for task in jobs]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run(self, room_code: str, job: Callable[[], Awaitable[Any]], submitted: float):
+        """在房间并发名额内执行任务"""
+        room_slots = self._room_slots.get(room_code)
+        if room_slots is None:
+            room_slots = self._room_slots[room_code] = asyncio.Semaphore(settings.AI_ROOM_CONCURRENCY)
+
+        try:
+            async with room_slots:
+                self.queue_wait.record((time.perf_counter() - submitted) * 1000)
+                self.running_count += 1
+                try:
+                    await job()
+                finally:
+                    self.running_count -= 1
+            self.completed_count += 1
+        except asyncio.CancelledError:
+            self.cancelled_count += 1
+        except Exception as e:
+            self.failed_count += 1
+            print(f"房间 {room_code} AI响应任务失败: {str(e)}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取AI响应任务统计信息"""
+        pending = sum(len(jobs) for jobs in self._jobs.values())
+        return {
+            "submitted": self.submitted_count,
+            "completed": self.completed_count,
+            "cancelled": self.cancelled_count,
+            "failed": self.failed_count,
+            "running": self.running_count,
+            "queued": pending - self.running_count,
+            "active_rooms": len(self._jobs),
+            "queue_wait": self.queue_wait.to_dict(),
+            "model_wait": self.model_wait.to_dict(),
+            "model_time": self.model_time.to_dict()
+        }
+
+
+# 全局AI响应任务调度器实例
+ai_response_pipeline = AIResponsePipeline()
@@ -1,5 +1,6 @@
 import json
-from typing import Dict, Any
+import asyncio
+from typing import Dict, Any, Optional
 from datetime import datetime
 from tortoise.exceptions import DoesNotExist
 
@@ -11,6 +12,7 @@ from model.ws.notification_types import (
 from utils.game_log_util import game_log_util
 
 from service.AIHandler import ai_handler
+from service.RoomActor import RoomState, room_actor_registry
 
 # 导入各个处理器
 from .game_handler.ChatHandler import chat_handler
@@ -27,19 +29,25 @@ from .game_handler.NPCHandler import npc_handler
 
 class GameHandler:
     async def handle_message(self, websocket, room_code: str, user_id: int, message: Dict[str, Any]):
-        """处理游戏消息"""
+        """处理游戏消息：投递到房间处理器的邮箱，由其按顺序处理"""
+        room_actor_registry.post(room_code, self._process_message, user_id, message)
+
+    async def _process_message(self, state: Optional[RoomState], user_id: int, message: Dict[str, Any]):
+        """在房间处理器中处理一条游戏消息"""
         message_type = message.get("type")
         
+        if state is None:
+            await manager.send_personal_message(
+                create_error_message("房间不存在"), 
+                user_id
+            )
+            return
+        
         # 根据消息类型记录日志
         try:
-            room = await GameRooms.get(room_code=room_code)
-            player = None
-            
+            room = state.room
             # 获取发送消息的玩家信息
-            try:
-                player = await GamePlayers.get(room=room, user_id=user_id).prefetch_related('user')
-            except DoesNotExist:
-                pass
+            player = state.get_player(user_id)
             
             # 根据不同消息类型记录相应日志
             if message_type in [
@@ -113,10 +121,10 @@ class GameHandler:
         
         handler = handlers.get(message_type)
         if handler:
-            await handler(room_code, user_id, message.get("data", {}))
-            # 处理完消息后，触发AI响应
+            await handler(state, user_id, message.get("data", {}))
+            # 处理完消息后，在后台触发AI响应，避免阻塞房间内的其他消息
             if message_type in [MessageType.CHAT.value, MessageType.PRIVATE_MESSAGE.value]:
-                await ai_handler.handle_player_message(room_code, user_id, message)
+                await ai_handler.schedule_player_message(state, user_id, message)
         else:
             await manager.send_personal_message(
                 create_error_message(f"未知消息类型: {message_type}"), 
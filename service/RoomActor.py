@@ -0,0 +1,273 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from tortoise.exceptions import DoesNotExist
+
+from model.entity.Scripts import GameRooms, GamePlayers, ScriptCharacters, ScriptStages
+from service.VoteTallyStore import vote_tally_store
+
+
+class RoomState:
+    """活跃房间的内存状态
+
+    房间激活时从数据库加载一次，之后由房间的 RoomActor 顺序处理消息并维护，
+    处理器直接读写这里的对象，数据库写入通过 defer_write 异步落库。
+    投票计数由 vote_tally_store 维护，加载时与数据库核对。
+    """
+
+    def __init__(self, actor: "RoomActor", room: GameRooms, players: List[GamePlayers],
+                 characters: List[ScriptCharacters], stages: List[ScriptStages]):
+        self._actor = actor
+        self.room = room
+        self.room_code = room.room_code
+        # 玩家 {user_id: GamePlayers}
+        self.players: Dict[int, GamePlayers] = {player.user_id: player for player in players}
+        # 剧本角色 {character_id: ScriptCharacters}
+        self.characters: Dict[int, ScriptCharacters] = {character.id: character for character in characters}
+        # 剧本阶段 {stage_number: ScriptStages}
+        self.stages: Dict[int, ScriptStages] = {stage.stage_number: stage for stage in stages}
+
+    @classmethod
+    async def load(cls, actor: "RoomActor", room_code: str) -> "RoomState":
+        """从数据库加载房间状态"""
+        # 玩家预取到房间对象上，后台任务（AI 响应等）可以直接使用 state.room
+        room = await GameRooms.get(room_code=room_code).prefetch_related(
+            'script', 'current_stage', 'players__user', 'players__character', 'players__aiconfig'
+        )
+        players = list(room.players)
+
+        characters, stages = [], []
+        if room.script_id:
+            characters = await ScriptCharacters.filter(script_id=room.script_id)
+            stages = await ScriptStages.filter(script_id=room.script_id)
+
+        # 房间可能在处理器之外被修改过，核对缓存的投票计数
+        await vote_tally_store.reconcile(room.id)
+        return cls(actor, room, players, characters, stages)
+
+    def get_player(self, user_id: int) -> Optional[GamePlayers]:
+        """按用户ID获取玩家"""
+        return self.players.get(user_id)
+
+    def get_player_by_id(self, player_id: int) -> Optional[GamePlayers]:
+        """按GamePlayer ID获取玩家"""
+        for player in self.players.values():
+            if player.id == player_id:
+                return player
+        return None
+
+    def get_player_by_character(self, character_id: int) -> Optional[GamePlayers]:
+        """获取选择了指定角色的玩家"""
+        for player in self.players.values():
+            if player.character_id == character_id:
+                return player
+        return None
+
+    def defer_write(self, write: Callable[[], Awaitable[Any]]):
+        """登记一次异步数据库写入（按登记顺序执行）"""
+        self._actor.defer_write(write)
+
+    async def flush(self):
+        """等待已登记的数据库写入全部完成"""
+        await self._actor.flush()
+
+    def invalidate(self):
+        """标记状态过期，处理下一条消息前重新从数据库加载"""
+        self._actor.invalidate()
+
+
+# 消息处理函数：handler(state, *args)，房间不存在时 state 为 None
+RoomHandler = Callable[..., Awaitable[None]]
+
+
+class RoomActor:
+    """单个房间的消息处理器
+
+    房间内所有消息进入同一个邮箱按顺序处理，互相冲突的操作（投票、搜证等）天然串行；
+    状态修改先作用于内存，数据库写入由独立的写协程按顺序异步完成。
+    """
+
+    def __init__(self, room_code: str, previous: Optional[asyncio.Task] = None):
+        self.room_code = room_code
+        self.state: Optional[RoomState] = None
+        self._stale = True
+        # 上一个同名房间处理器的关闭任务，加载状态前需等待其写入完成
+        self._previous = previous
+        self._mailbox: asyncio.Queue = asyncio.Queue()
+        self._writes: asyncio.Queue = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+        self._write_task: Optional[asyncio.Task] = None
+
+        # 统计
+        self.processed_count = 0
+        self.reload_count = 0
+        self.write_count = 0
+        self.write_error_count = 0
+
+    def start(self):
+        """启动消息处理和写入协程"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            self._write_task = asyncio.create_task(self._write_loop())
+
+    def post(self, handler: RoomHandler, *args):
+        """投递一条待处理的消息（立即返回）"""
+        self._mailbox.put_nowait((handler, args))
+
+    def defer_write(self, write: Callable[[], Awaitable[Any]]):
+        """登记一次异步数据库写入"""
+        self._writes.put_nowait(write)
+
+    def invalidate(self):
+        """标记状态过期"""
+        self._stale = True
+
+    async def flush(self):
+        """等待已登记的数据库写入全部完成"""
+        await self._writes.join()
+
+    @property
+    def mailbox_depth(self) -> int:
+        return self._mailbox.qsize()
+
+    @property
+    def pending_writes(self) -> int:
+        return self._writes.qsize()
+
+    async def close(self):
+        """处理完邮箱中剩余的消息、写入全部数据后停止"""
+        self._mailbox.put_nowait(None)
+        if self._task:
+            await self._task
+        await self.flush()
+        if self._write_task:
+            self._write_task.cancel()
+
+    async def _ensure_state(self) -> Optional[RoomState]:
+        """按需（首次或失效后）加载房间状态"""
+        if self._previous:
+            previous, self._previous = self._previous, None
+            await asyncio.gather(previous, return_exceptions=True)
+
+        if self._stale or self.state is None:
+            # 先让已登记的写入落库，避免读到旧数据
+            await self.flush()
+            self._stale = False
+            self.reload_count += 1
+            try:
+                self.state = await RoomState.load(self, self.room_code)
+            except DoesNotExist:
+                self.state = None
+        return self.state
+
+    async def _run(self):
+        """顺序处理邮箱中的消息"""
+        while True:
+            item = await self._mailbox.get()
+            if item is None:
+                return
+
+            handler, args = item
+            try:
+                state = await self._ensure_state()
+                await handler(state, *args)
+            except Exception as e:
+                print(f"房间 {self.room_code} 处理消息失败: {str(e)}")
+            self.processed_count += 1
+
+    async def _write_loop(self):
+        """按登记顺序执行数据库写入"""
+        while True:
+            write = await self._writes.get()
+            try:
+                await write()
+                self.write_count += 1
+            except Exception as e:
+                self.write_error_count += 1
+                print(f"房间 {self.room_code} 写入数据库失败: {str(e)}")
+            finally:
+                self._writes.task_done()
+
+
+class RoomActorRegistry:
+    """活跃房间处理器注册表
+
+    房间收到第一条消息时创建处理器，房间最后一个连接断开时关闭。
+    HTTP接口等在处理器之外修改房间数据后需调用 invalidate 使内存状态失效。
+    """
+
+    def __init__(self):
+        self._actors: Dict[str, RoomActor] = {}
+        # 正在关闭的处理器 {room_code: task}
+        self._closing: Dict[str, asyncio.Task] = {}
+
+    def get(self, room_code: str) -> RoomActor:
+        """获取房间处理器，不存在时创建"""
+        actor = self._actors.get(room_code)
+        if actor is None:
+            actor = RoomActor(room_code, previous=self._closing.get(room_code))
+            actor.start()
+            self._actors[room_code] = actor
+        return actor
+
+    def post(self, room_code: str, handler: RoomHandler, *args):
+        """向房间投递一条待处理的消息"""
+        self.get(room_code).post(handler, *args)
+
+    def get_state(self, room_code: str) -> Optional[RoomState]:
+        """获取房间处理器当前的内存状态（不创建处理器，房间不活跃或尚未加载时为 None）"""
+        actor = self._actors.get(room_code)
+        return actor.state if actor else None
+
+    def invalidate(self, room_code: str):
+        """使房间的内存状态失效"""
+        actor = self._actors.get(room_code)
+        if actor:
+            actor.invalidate()
+
+    async def flush(self, room_code: str):
+        """等待房间已登记的数据库写入完成"""
+        actor = self._actors.get(room_code)
+        if actor:
+            await actor.flush()
+        closing = self._closing.get(room_code)
+        if closing:
+            await asyncio.wait({closing})
+
+    def close(self, room_code: str):
+        """关闭房间处理器（在后台完成剩余消息和写入）"""
+        actor = self._actors.pop(room_code, None)
+        if actor is None:
+            return
+        task = asyncio.create_task(actor.close())
+        self._closing[room_code] = task
+
+        def _on_closed(_):
+            if self._closing.get(room_code) is task:
+                del self._closing[room_code]
+
+        task.add_done_callback(_on_closed)
+
+    async def close_all(self):
+        """关闭全部房间处理器（应用关闭时调用）"""
+        for room_code in list(self._actors.keys()):
+            self.close(room_code)
+        if self._closing:
+            await asyncio.gather(*self._closing.values(), return_exceptions=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取房间处理器统计信息"""
+        actors = list(self._actors.values())
+        return {
+            "active_rooms": len(actors),
+            "closing_rooms": len(self._closing),
+            "mailbox_depth": sum(actor.mailbox_depth for actor in actors),
+            "pending_writes": sum(actor.pending_writes for actor in actors),
+            "processed_messages": sum(actor.processed_count for actor in actors),
+            "state_reloads": sum(actor.reload_count for actor in actors),
+            "db_writes": sum(actor.write_count for actor in actors),
+            "db_write_errors": sum(actor.write_error_count for actor in actors)
+        }
+
+
+# 全局房间处理器注册表实例
+room_actor_registry = RoomActorRegistry()
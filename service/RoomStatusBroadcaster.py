@@ -0,0 +1,57 @@
+import asyncio
+from typing import Dict, Set, Any
+
+from conf.config import settings
+from .RoomStatusHandler import room_status_handler
+
+
+class RoomStatusBroadcaster:
+    """房间状态广播调度器
+
+    处理器只需把房间标记为“脏”，调度器在一个时间窗口
+    （ROOM_STATUS_DEBOUNCE_MS）内合并所有请求，每个窗口最多重建并广播一次房间状态。
+    """
+
+    def __init__(self):
+        # 等待广播的房间
+        self._dirty_rooms: Set[str] = set()
+        # 各房间的刷新任务 {room_code: task}
+        self._flush_tasks: Dict[str, asyncio.Task] = {}
+
+        # 统计
+        self.requested_count = 0
+        self.broadcast_count = 0
+
+    def request_broadcast(self, room_code: str):
+        """请求广播房间状态（立即返回，实际广播在窗口结束时合并执行）"""
+        self.requested_count += 1
+        self._dirty_rooms.add(room_code)
+        if room_code not in self._flush_tasks:
+            self._flush_tasks[room_code] = asyncio.create_task(self._flush_loop(room_code))
+
+    async def _flush_loop(self, room_code: str):
+        """按窗口刷新房间状态，直到房间不再有新的请求"""
+        try:
+            while room_code in self._dirty_rooms:
+                await asyncio.sleep(settings.ROOM_STATUS_DEBOUNCE_MS / 1000)
+                # 先清除标记，广播期间的新请求会触发下一轮刷新
+                self._dirty_rooms.discard(room_code)
+                self.broadcast_count += 1
+                try:
+                    await room_status_handler.broadcast_room_status(room_code)
+                except Exception as e:
+                    print(f"调度广播房间状态失败: {str(e)}")
+        finally:
+            self._flush_tasks.pop(room_code, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取广播统计信息"""
+        return {
+            "requested": self.requested_count,
+            "broadcast": self.broadcast_count,
+            "pending_rooms": len(self._dirty_rooms)
+        }
+
+
+# 全局房间状态广播调度器实例
+room_status_broadcaster = RoomStatusBroadcaster()
@@ -12,34 +12,50 @@ from .room_status_handler.stage_builder import build_stage_info
 from .room_status_handler.clues_builder import build_clues_info
 from .room_status_handler.voting_builder import build_voting_info, build_game_result
 from .room_status_handler.search_builder import build_searchable_info
+from .room_status_handler.shared_builder import build_shared_status_data
+from .RoomStatusVersionStore import room_status_version_store
+from .RoomActor import room_actor_registry
 
 class RoomStatusHandler:
     """房间状态处理器"""
     
-    async def send_room_status(self, room_code: str, user_id: int):
-        """发送房间当前状态给指定用户"""
+    async def _load_room(self, room_code: str) -> GameRooms:
+        """加载构建房间状态所需的房间对象图（先等待房间处理器的待写入数据落库）"""
+        await room_actor_registry.flush(room_code)
+        return await GameRooms.get(room_code=room_code).prefetch_related(
+            'script', 'host_user', 'players__user', 'players__character', 'current_stage'
+        )
+    
+    def _build_base_room_info(self, room: GameRooms) -> Dict[str, Any]:
+        """构建基础房间信息"""
+        return {
+            "code": room.room_code,
+            "status": room.status,
+            "max_players": room.max_players,
+            "host_user_id": room.host_user_id,
+            "ai_dm_personality": room.ai_dm_personality,
+            "game_settings": room.game_setting,
+            "started_at": room.started_at.isoformat() if room.started_at else None,
+            "finished_at": room.finished_at.isoformat() if room.finished_at else None
+        }
+    
+    async def send_room_status(self, room_code: str, user_id: int, force_full: bool = False):
+        """发送房间当前状态给指定用户
+
+        force_full 为 True 时（首次连接、客户端请求重新同步）丢弃该用户的版本记录并发送全量快照。
+        """
         try:
-            room = await GameRooms.get(room_code=room_code).prefetch_related(
-                'script', 'host_user', 'players__user', 'players__character', 'current_stage'
-            )
-            
-            # 构建基础房间信息
-            base_room_info = {
-                "code": room.room_code,
-                "status": room.status,
-                "max_players": room.max_players,
-                "host_user_id": room.host_user_id,
-                "ai_dm_personality": room.ai_dm_personality,
-                "game_settings": room.game_setting,
-                "started_at": room.started_at.isoformat() if room.started_at else None,
-                "finished_at": room.finished_at.isoformat() if room.finished_at else None
-            }
+            room = await self._load_room(room_code)
+            shared = await build_shared_status_data(room)
             
             # 根据房间状态组装不同的数据
-            room_status_data = await self._build_room_status_by_phase(room, base_room_info, user_id)
+            room_status_data = await self._build_room_status_by_phase(
+                room, self._build_base_room_info(room), user_id, shared
+            )
 
+            version = room_status_version_store.next_version(room_code)
             await manager.send_personal_message(
-                create_message(MessageType.ROOM_STATUS, room_status_data), 
+                room_status_version_store.build_message(room_code, user_id, version, room_status_data, force_full),
                 user_id
             )
             
@@ -51,64 +67,89 @@ class RoomStatusHandler:
             )
     
     async def broadcast_room_status(self, room_code: str):
-        """向房间内所有用户广播房间状态"""
+        """向房间内所有用户广播房间状态
+
+        房间对象图和与观看者无关的数据只加载、构建一次，
+        每个玩家只叠加自己的私有线索、背景故事和搜证信息。
+        同一次广播共用一个版本号，已确认过版本的玩家只收到增量。
+        """
         try:
             connected_users = manager.get_room_users(room_code)
+            if not connected_users:
+                return
+            
+            room = await self._load_room(room_code)
+            shared = await build_shared_status_data(room)
+            base_room_info = self._build_base_room_info(room)
+            version = room_status_version_store.next_version(room_code)
+            
             for user_id in connected_users:
-                await self.send_room_status(room_code, user_id)
+                room_status_data = await self._build_room_status_by_phase(room, base_room_info, user_id, shared)
+                await manager.send_personal_message(
+                    room_status_version_store.build_message(room_code, user_id, version, room_status_data),
+                    user_id
+                )
         except Exception as e:
             print(f"广播房间状态失败: {str(e)}")
     
-    async def _build_room_status_by_phase(self, room: GameRooms, base_info: Dict[str, Any], user_id: int) -> Dict[str, Any]:
+    async def handle_status_ack(self, room_code: str, user_id: int, version: Optional[int], resync: bool = False):
+        """处理客户端的房间状态确认"""
+        if resync:
+            await self.send_room_status(room_code, user_id, force_full=True)
+        elif version is not None:
+            room_status_version_store.acknowledge(room_code, user_id, version)
+    
+    async def _build_room_status_by_phase(self, room: GameRooms, base_info: Dict[str, Any], user_id: int,
+                                          shared: Dict[str, Any]) -> Dict[str, Any]:
         """根据房间阶段构建不同的状态数据"""
         status_data = {
             "room": base_info,
-            "script": await build_script_info(room.script) if room.script else None
+            "script": shared["script"]
         }
         
         if room.status == "等待中":
             # 等待中阶段：返回基础房间信息和玩家信息
-            status_data["players"] = await build_players_info(room)
+            status_data["players"] = shared["players"]
             
         elif room.status == "生成剧本中":
             # 生成剧本中：返回基础房间信息和玩家信息
-            status_data["players"] = await build_players_info(room)
+            status_data["players"] = shared["players"]
             
         elif room.status == "选择角色":
             # 选择角色阶段：返回角色信息和玩家信息
-            status_data["players"] = await build_players_info(room)
-            status_data["characters"] = await build_characters_info(room)
+            status_data["players"] = shared["players"]
+            status_data["characters"] = shared["characters"]
             
         elif room.status == "进行中":
             # 进行中阶段：返回完整的游戏信息
-            status_data["players"] = await build_players_info(room)
-            status_data["story_timeline"] = await build_story_timeline_info(room.script, user_id, room)
+            status_data["players"] = shared["players"]
+            status_data["story_timeline"] = await build_story_timeline_info(room.script, user_id, room, shared)
             status_data["characters"] = await build_detailed_characters_info(room, user_id)
-            status_data["current_stage"] = await build_stage_info(room, user_id)
-            status_data["clues"] = await build_clues_info(room, user_id)
+            status_data["current_stage"] = await build_stage_info(room, user_id, shared)
+            status_data["clues"] = await build_clues_info(room, user_id, shared)
             
         elif room.status == "搜证中":
             # 搜证阶段：返回搜证相关信息
-            status_data["players"] = await build_players_info(room)
-            status_data["story_timeline"] = await build_story_timeline_info(room.script, user_id, room)
+            status_data["players"] = shared["players"]
+            status_data["story_timeline"] = await build_story_timeline_info(room.script, user_id, room, shared)
             status_data["characters"] = await build_detailed_characters_info(room, user_id)
-            status_data["current_stage"] = await build_stage_info(room, user_id)
-            status_data["search_info"] = await build_searchable_info(room, user_id)
+            status_data["current_stage"] = await build_stage_info(room, user_id, shared)
+            status_data["search_info"] = await build_searchable_info(room, user_id, shared)
 
         elif room.status == "投票中":
             # 投票阶段：返回投票相关信息
-            status_data["players"] = await build_players_info(room)
+            status_data["players"] = shared["players"]
             status_data["characters"] = await build_detailed_characters_info(room, user_id)
-            status_data["story_timeline"] = await build_story_timeline_info(room.script, user_id, room)
-            status_data["voting_info"] = await build_voting_info(room)
+            status_data["story_timeline"] = await build_story_timeline_info(room.script, user_id, room, shared)
+            status_data["voting_info"] = shared["voting_info"]
             
         elif room.status in ["已结束"]:
             # 结束阶段：返回结果信息
-            status_data["players"] = await build_players_info(room)
-            status_data["story_timeline"] = await build_story_timeline_info(room.script, user_id, room)
+            status_data["players"] = shared["players"]
+            status_data["story_timeline"] = await build_story_timeline_info(room.script, user_id, room, shared)
             status_data["characters"] = await build_detailed_characters_info(room, user_id)
-            status_data["current_stage"] = await build_stage_info(room, user_id)
-            status_data["clues"] = await build_clues_info(room, user_id)
+            status_data["current_stage"] = await build_stage_info(room, user_id, shared)
+            status_data["clues"] = await build_clues_info(room, user_id, shared)
             status_data["solution"] = room.script.solution
         
         return status_data
@@ -0,0 +1,106 @@
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+from conf.config import settings
+from model.ws.notification_types import MessageType, create_message
+from utils.json_patch_util import make_json_patch
+
+
+class _ViewerState:
+    """单个观看者的房间状态版本记录"""
+
+    def __init__(self):
+        # 已发送、尚未被确认版本取代的快照 {version: snapshot}
+        self.snapshots: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        # 客户端最近确认的版本
+        self.acked_version: Optional[int] = None
+
+
+class RoomStatusVersionStore:
+    """房间状态版本管理
+
+    每个房间维护单调递增的版本号，每个观看者保留最近发送过的快照。
+    客户端确认（room_status_ack）某个版本后，后续状态以该版本为基准
+    发送 JSON Patch 增量（room_status_delta）；首次连接、客户端请求重新同步、
+    尚无确认或基准落后超过 ROOM_STATUS_MAX_VERSION_GAP 时发送全量快照。
+    """
+
+    def __init__(self):
+        # 房间当前版本 {room_code: version}
+        self._room_versions: Dict[str, int] = {}
+        # 观看者状态 {(room_code, user_id): _ViewerState}
+        self._viewers: Dict[Tuple[str, int], _ViewerState] = {}
+
+        # 统计
+        self.full_count = 0
+        self.delta_count = 0
+
+    def next_version(self, room_code: str) -> int:
+        """为房间分配新的状态版本号"""
+        version = self._room_versions.get(room_code, 0) + 1
+        self._room_versions[room_code] = version
+        return version
+
+    def build_message(self, room_code: str, user_id: int, version: int,
+                      snapshot: Dict[str, Any], force_full: bool = False) -> Dict[str, Any]:
+        """为观看者构建房间状态消息（全量快照或增量）"""
+        viewer = self._viewers.get((room_code, user_id))
+        if viewer is None or force_full:
+            viewer = _ViewerState()
+            self._viewers[(room_code, user_id)] = viewer
+
+        base_version = viewer.acked_version
+        base = viewer.snapshots.get(base_version) if base_version is not None else None
+
+        viewer.snapshots[version] = snapshot
+        # 只保留确认版本及之后的快照，数量不超过允许的版本差
+        while len(viewer.snapshots) > settings.ROOM_STATUS_MAX_VERSION_GAP + 1:
+            viewer.snapshots.popitem(last=False)
+
+        if base is None or version - base_version > settings.ROOM_STATUS_MAX_VERSION_GAP:
+            self.full_count += 1
+            message = create_message(MessageType.ROOM_STATUS, snapshot)
+            message["version"] = version
+            return message
+
+        self.delta_count += 1
+        return create_message(MessageType.ROOM_STATUS_DELTA, {
+            "base_version": base_version,
+            "version": version,
+            "patch": make_json_patch(base, snapshot)
+        })
+
+    def acknowledge(self, room_code: str, user_id: int, version: int):
+        """记录客户端已应用的版本，并丢弃更早的快照"""
+        viewer = self._viewers.get((room_code, user_id))
+        if viewer is None or version not in viewer.snapshots:
+            return
+        if viewer.acked_version is not None and version <= viewer.acked_version:
+            return
+
+        viewer.acked_version = version
+        for old_version in [v for v in viewer.snapshots if v < version]:
+            del viewer.snapshots[old_version]
+
+    def reset_viewer(self, room_code: str, user_id: int):
+        """清除观看者的版本记录，下一次发送全量快照"""
+        self._viewers.pop((room_code, user_id), None)
+
+    def drop_room(self, room_code: str):
+        """清除房间的全部版本记录"""
+        self._room_versions.pop(room_code, None)
+        for key in [key for key in self._viewers if key[0] == room_code]:
+            del self._viewers[key]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取版本统计信息"""
+        return {
+            "full_snapshots": self.full_count,
+            "deltas": self.delta_count,
+            "tracked_viewers": len(self._viewers),
+            "stored_snapshots": sum(len(viewer.snapshots) for viewer in self._viewers.values())
+        }
+
+
+# 全局房间状态版本管理实例
+room_status_version_store = RoomStatusVersionStore()
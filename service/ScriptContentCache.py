@@ -0,0 +1,216 @@
+import asyncio
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from conf.config import settings
+from model.entity.Scripts import (
+    ScriptStages, ScriptCharacters, CharacterStageGoals, ScriptClues, ScriptTimeline
+)
+
+
+class ScriptContent:
+    """一个剧本的全部内容（阶段、角色、线索、时间线、角色任务）及其索引
+
+    线索可见性预先计算为位集（整数的第 i 位对应 clues[i]）：按阶段累计的线索、公开线索、
+    各角色私有线索各一个掩码，某个玩家在某阶段可见的线索只需做位运算，再由 clues_in 取出。
+
+    对象只读共享；唯一的例外是角色任务的 search_attempts：数据库中的次数只由 ClueSearchHandler
+    的条件 UPDATE 扣减，缓存中的值只是本进程的近似副本（用于快速拒绝），多进程部署时可能过期，
+    不能作为剩余搜查次数的依据，需要准确的次数时查询数据库。
+    """
+
+    def __init__(self, script_id: int, stages: List[ScriptStages], characters: List[ScriptCharacters],
+                 clues: List[ScriptClues], timeline: List[ScriptTimeline], goals: List[CharacterStageGoals]):
+        self.script_id = script_id
+        # 阶段按序号排列
+        self.stages = sorted(stages, key=lambda stage: stage.stage_number)
+        self.stages_by_number: Dict[int, ScriptStages] = {stage.stage_number: stage for stage in self.stages}
+        self.characters: Dict[int, ScriptCharacters] = {character.id: character for character in characters}
+
+        # 线索按发现阶段排列（没有发现阶段的线索不会出现在任何阶段中）
+        self.clues = sorted(
+            (clue for clue in clues if clue.discovery_stage),
+            key=lambda clue: (clue.discovery_stage.stage_number, clue.id)
+        )
+        self.clues_by_id: Dict[int, ScriptClues] = {clue.id: clue for clue in clues}
+        # 线索 {发现阶段ID: [线索]}
+        self.clues_by_stage: Dict[int, List[ScriptClues]] = {}
+        # 线索位 {线索ID: 1 << 在 clues 中的下标}
+        self.clue_bits: Dict[int, int] = {}
+        # 公开线索掩码、各角色私有线索掩码 {角色ID: 掩码}
+        self.public_mask = 0
+        self.character_masks: Dict[int, int] = {}
+        # 按阶段累计的线索掩码：_stage_masks[i] 为阶段序号不超过 _stage_numbers[i] 的全部线索
+        self._stage_numbers: List[int] = []
+        self._stage_masks: List[int] = []
+        cumulative = 0
+        for index, clue in enumerate(self.clues):
+            bit = 1 << index
+            self.clue_bits[clue.id] = bit
+            if clue.is_public:
+                self.public_mask |= bit
+            elif clue.character_id:
+                self.character_masks[clue.character_id] = self.character_masks.get(clue.character_id, 0) | bit
+            self.clues_by_stage.setdefault(clue.discovery_stage_id, []).append(clue)
+
+            cumulative |= bit
+            stage_number = clue.discovery_stage.stage_number
+            if self._stage_numbers and self._stage_numbers[-1] == stage_number:
+                self._stage_masks[-1] = cumulative
+            else:
+                self._stage_numbers.append(stage_number)
+                self._stage_masks.append(cumulative)
+
+        # 时间线按创建时间排列
+        self.timeline = sorted(timeline, key=lambda event: (event.created_at, event.id))
+        self.public_timeline = [event for event in self.timeline if event.is_public]
+        # 私有时间线 {角色ID: [事件]}
+        self.private_timeline_by_character: Dict[int, List[ScriptTimeline]] = {}
+        for event in self.timeline:
+            if not event.is_public and event.character_id:
+                self.private_timeline_by_character.setdefault(event.character_id, []).append(event)
+
+        # 角色任务 {(角色ID, 阶段ID): 任务}
+        self.goals: Dict[Tuple[int, int], CharacterStageGoals] = {
+            (goal.character_id, goal.stage_id): goal for goal in goals
+        }
+
+    def stages_up_to(self, stage_number: int) -> List[ScriptStages]:
+        """指定阶段及之前的阶段"""
+        return [stage for stage in self.stages if stage.stage_number <= stage_number]
+
+    def stage_mask(self, stage_number: int) -> int:
+        """指定阶段及之前可发现的全部线索的掩码"""
+        index = bisect_right(self._stage_numbers, stage_number)
+        return self._stage_masks[index - 1] if index else 0
+
+    def private_mask(self, character_id: int, stage_number: int) -> int:
+        """角色在指定阶段及之前的私有线索的掩码"""
+        return self.character_masks.get(character_id, 0) & self.stage_mask(stage_number)
+
+    def visible_mask(self, character_id: Optional[int], stage_number: int) -> int:
+        """角色在指定阶段可见的剧本线索（公开线索和自己的私有线索）的掩码"""
+        return (self.public_mask | self.character_masks.get(character_id, 0)) & self.stage_mask(stage_number)
+
+    def mask_of(self, clue_ids: Iterable[int]) -> int:
+        """线索ID集合的掩码（不在阶段中的线索忽略）"""
+        mask = 0
+        for clue_id in clue_ids:
+            mask |= self.clue_bits.get(clue_id, 0)
+        return mask
+
+    def clues_in(self, mask: int) -> List[ScriptClues]:
+        """掩码中的线索，按 clues 的顺序（发现阶段、ID）排列"""
+        clues = []
+        while mask:
+            low = mask & -mask
+            clues.append(self.clues[low.bit_length() - 1])
+            mask ^= low
+        return clues
+
+    def clues_up_to(self, stage_number: int) -> List[ScriptClues]:
+        """指定阶段及之前可发现的全部线索"""
+        return self.clues_in(self.stage_mask(stage_number))
+
+    def public_clues_up_to(self, stage_number: int) -> List[ScriptClues]:
+        return self.clues_in(self.public_mask & self.stage_mask(stage_number))
+
+    def private_clues_up_to(self, character_id: int, stage_number: int) -> List[ScriptClues]:
+        """角色在指定阶段及之前的私有线索"""
+        return self.clues_in(self.private_mask(character_id, stage_number))
+
+    def private_timeline(self, character_id: int) -> List[ScriptTimeline]:
+        return self.private_timeline_by_character.get(character_id, [])
+
+    def get_goal(self, character_id: int, stage_id: int) -> Optional[CharacterStageGoals]:
+        return self.goals.get((character_id, stage_id))
+
+    @classmethod
+    async def load(cls, script_id: int) -> "ScriptContent":
+        stages = await ScriptStages.filter(script_id=script_id)
+        characters = await ScriptCharacters.filter(script_id=script_id)
+        clues = await ScriptClues.filter(script_id=script_id).prefetch_related('discovery_stage')
+        timeline = await ScriptTimeline.filter(script_id=script_id).prefetch_related('character')
+        goals = await CharacterStageGoals.filter(stage__script_id=script_id)
+        return cls(script_id, stages, characters, clues, timeline, goals)
+
+
+class ScriptContentCache:
+    """剧本内容缓存
+
+    游戏开始后剧本内容不再变化，房间状态构建、AI 提示词和线索搜查都从这里读取，
+    不再每次查询阶段、线索、时间线和角色任务。按剧本ID缓存，
+    最多保留 SCRIPT_CONTENT_CACHE_SIZE 个最近使用的剧本；剧本被修改或删除时调用 invalidate。
+    """
+
+    def __init__(self):
+        self._contents: "OrderedDict[int, ScriptContent]" = OrderedDict()
+        # 加载中的剧本，同一剧本的并发请求共用一次加载
+        self._loading: Dict[int, asyncio.Task] = {}
+        # 加载期间剧本已失效的加载任务，其结果不写入缓存
+        self._stale_loads: Set[asyncio.Task] = set()
+
+        # 统计
+        self.hit_count = 0
+        self.miss_count = 0
+        self.eviction_count = 0
+        self.invalidation_count = 0
+
+    async def get(self, script_id: int) -> ScriptContent:
+        """获取剧本内容，未缓存时从数据库加载"""
+        content = self._contents.get(script_id)
+        if content is not None:
+            self._contents.move_to_end(script_id)
+            self.hit_count += 1
+            return content
+
+        self.miss_count += 1
+        task = self._loading.get(script_id)
+        if task is None:
+            task = asyncio.create_task(self._load(script_id))
+            self._loading[script_id] = task
+        return await asyncio.shield(task)
+
+    async def _load(self, script_id: int) -> ScriptContent:
+        task = asyncio.current_task()
+        try:
+            content = await ScriptContent.load(script_id)
+        finally:
+            if self._loading.get(script_id) is task:
+                del self._loading[script_id]
+            stale = task in self._stale_loads
+            self._stale_loads.discard(task)
+        if stale:
+            return content
+
+        self._contents[script_id] = content
+        while len(self._contents) > settings.SCRIPT_CONTENT_CACHE_SIZE:
+            self._contents.popitem(last=False)
+            self.eviction_count += 1
+        return content
+
+    def invalidate(self, script_id: int):
+        """剧本被修改或删除后丢弃缓存"""
+        task = self._loading.pop(script_id, None)
+        if task is not None:
+            self._stale_loads.add(task)
+        if self._contents.pop(script_id, None) is not None:
+            self.invalidation_count += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        lookups = self.hit_count + self.miss_count
+        return {
+            "scripts": len(self._contents),
+            "loading": len(self._loading),
+            "hits": self.hit_count,
+            "misses": self.miss_count,
+            "hit_rate": round(self.hit_count / lookups, 4) if lookups else 0.0,
+            "evictions": self.eviction_count,
+            "invalidations": self.invalidation_count
+        }
+
+
+# 全局剧本内容缓存实例
+script_content_cache = ScriptContentCache()
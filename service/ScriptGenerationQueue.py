@@ -0,0 +1,373 @@
+import asyncio
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from conf.config import settings
+from model.entity.Scripts import GameRooms, ScriptGenerationJobs
+from utils.script_importer import SCRIPT_SECTIONS
+
+
+class ScriptGenerationQueue:
+    """剧本生成任务队列
+
+    任务持久化在 script_generation_jobs 表中，由 SCRIPT_GENERATION_WORKERS 个工作协程执行。
+    各房主的任务轮流出队：每个房主同时执行的任务数受 SCRIPT_GENERATION_PER_HOST_CONCURRENCY 限制，
+    排队中的任务数受 SCRIPT_GENERATION_MAX_QUEUED_PER_HOST 限制，
+    一个房主同时开很多房间生成剧本也不会占满模型额度或挤占其他房主。
+    失败的任务最多执行 SCRIPT_GENERATION_MAX_ATTEMPTS 次；服务重启后未完成的任务重新排队。
+    预生成剧本池等后台任务通过 run_background 以低优先级排队：只在没有房间任务排队时出队，
+    同样占用工作协程，不会超出 SCRIPT_GENERATION_WORKERS 的模型并发。
+    """
+
+    def __init__(self):
+        # 各房主排队中的任务 {host_user_id: deque[job_id]}
+        self._queues: Dict[int, Deque[int]] = {}
+        # 有排队任务的房主，按轮流出队的顺序排列
+        self._hosts: Deque[int] = deque()
+        # 各房主执行中的任务数
+        self._running_hosts: Dict[int, int] = {}
+        # 执行中的任务 {job_id: task}
+        self._running: Dict[int, asyncio.Task] = {}
+        # 任务入队时间，用于统计排队耗时
+        self._enqueued_at: Dict[int, float] = {}
+        # 排队中的低优先级后台任务 (任务函数, 结果)
+        self._background: Deque[Tuple[Callable[[], Awaitable[Any]], asyncio.Future]] = deque()
+        # 执行中的后台任务
+        self._background_running: Set[asyncio.Task] = set()
+        self._wakeup: Optional[asyncio.Condition] = None
+        self._workers: List[asyncio.Task] = []
+        self._closing = False
+
+        # 统计
+        self.submitted_count = 0
+        self.completed_count = 0
+        self.failed_count = 0
+        self.cancelled_count = 0
+        self.retried_count = 0
+        self.recovered_count = 0
+        self.background_completed_count = 0
+        self.background_failed_count = 0
+        self._queue_wait_total_ms = 0.0
+        self._queue_wait_count = 0
+        self._run_time_total_ms = 0.0
+        self._run_time_count = 0
+
+    async def start(self):
+        """恢复未完成的任务并启动工作协程"""
+        if self._workers:
+            return
+        self._closing = False
+        self._wakeup = asyncio.Condition()
+        await self._recover()
+        self._workers = [
+            asyncio.create_task(self._worker())
+            for _ in range(settings.SCRIPT_GENERATION_WORKERS)
+        ]
+
+    async def close(self):
+        """停止工作协程；执行中的任务重新排队，下次启动时继续"""
+        self._closing = True
+        # 先停止工作协程，否则任务结束后工作协程会取出下一个任务开始执行
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        running = list(self._running.values()) + list(self._background_running)
+        for task in running:
+            task.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
+        while self._background:
+            _, future = self._background.popleft()
+            future.cancel()
+
+    def can_submit(self, host_user_id: int) -> bool:
+        """房主排队中的任务数是否未达到上限"""
+        return len(self._queues.get(host_user_id, ())) < settings.SCRIPT_GENERATION_MAX_QUEUED_PER_HOST
+
+    async def submit(self, room: GameRooms, host_user_id: int, game_setting: Dict[str, Any]) -> ScriptGenerationJobs:
+        """创建剧本生成任务并排队"""
+        job = await ScriptGenerationJobs.create(
+            room=room,
+            host_user_id=host_user_id,
+            game_setting=game_setting
+        )
+        self.submitted_count += 1
+        await self._enqueue(job.id, host_user_id)
+        return job
+
+    async def cancel(self, job: ScriptGenerationJobs) -> bool:
+        """取消排队中或执行中的任务，返回是否已取消"""
+        task = self._running.get(job.id)
+        if task is not None:
+            # 由执行任务的协程清理部分剧本并更新任务状态
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            return True
+
+        queue = self._queues.get(job.host_user_id)
+        if queue is None or job.id not in queue:
+            return False
+        queue.remove(job.id)
+        if not queue:
+            self._remove_host(job.host_user_id)
+        self._enqueued_at.pop(job.id, None)
+        await self._finish_cancelled(job)
+        return True
+
+    async def run_background(self, func: Callable[[], Awaitable[Any]]) -> Any:
+        """以低优先级排队执行后台任务并等待结果（不持久化，服务重启后不恢复）"""
+        future = asyncio.get_running_loop().create_future()
+        self._background.append((func, future))
+        if self._wakeup is not None:
+            async with self._wakeup:
+                self._wakeup.notify()
+        try:
+            return await future
+        except asyncio.CancelledError:
+            # 调用方取消时，尚未出队的任务不再执行
+            future.cancel()
+            raise
+
+    def queue_position(self, job: ScriptGenerationJobs) -> Optional[int]:
+        """排队中的任务前面大约还有多少个任务（按各房主轮流出队估算）"""
+        queue = self._queues.get(job.host_user_id)
+        if queue is None or job.id not in queue:
+            return None
+        index = queue.index(job.id)
+        ahead = index
+        for host_user_id, other in self._queues.items():
+            if host_user_id != job.host_user_id:
+                ahead += min(len(other), index + 1)
+        return ahead
+
+    def is_running(self, job_id: int) -> bool:
+        return job_id in self._running
+
+    def is_idle(self) -> bool:
+        """没有排队中或执行中的房间任务"""
+        return not self._queues and not self._running
+
+    async def _recover(self):
+        """恢复上次运行未完成的任务"""
+        from .game_handler.ScriptGeneratorHandler import script_generator_handler
+
+        # 执行中断的任务：删除生成了一部分的剧本后重新排队
+        for job in await ScriptGenerationJobs.filter(status="生成中"):
+            await script_generator_handler.discard_partial(job.room_id, job.script_id)
+            job.script_id = None
+            job.progress = 0
+            job.error = "服务重启，任务中断"
+            if job.attempts >= settings.SCRIPT_GENERATION_MAX_ATTEMPTS:
+                job.status = "失败"
+                job.finished_at = datetime.now()
+                await job.save()
+                await script_generator_handler.fail_generation(job.room_id, "剧本生成失败：服务重启，任务中断")
+                self.failed_count += 1
+            else:
+                job.status = "排队中"
+                await job.save()
+
+        for job in await ScriptGenerationJobs.filter(status="排队中").order_by("id"):
+            self._queues.setdefault(job.host_user_id, deque()).append(job.id)
+            if job.host_user_id not in self._hosts:
+                self._hosts.append(job.host_user_id)
+            self._enqueued_at[job.id] = time.perf_counter()
+            self.recovered_count += 1
+
+    async def _enqueue(self, job_id: int, host_user_id: int):
+        self._queues.setdefault(host_user_id, deque()).append(job_id)
+        if host_user_id not in self._hosts:
+            self._hosts.append(host_user_id)
+        self._enqueued_at[job_id] = time.perf_counter()
+        if self._wakeup is not None:
+            async with self._wakeup:
+                self._wakeup.notify()
+
+    def _remove_host(self, host_user_id: int):
+        self._queues.pop(host_user_id, None)
+        if host_user_id in self._hosts:
+            self._hosts.remove(host_user_id)
+
+    def _pick(self) -> Optional[Tuple[int, int]]:
+        """按房主轮流取出下一个可执行的任务 (job_id, host_user_id)"""
+        if self._closing:
+            return None
+        limit = settings.SCRIPT_GENERATION_PER_HOST_CONCURRENCY
+        for host_user_id in list(self._hosts):
+            if self._running_hosts.get(host_user_id, 0) >= limit:
+                continue
+            queue = self._queues[host_user_id]
+            job_id = queue.popleft()
+            # 本轮已出队的房主排到最后
+            self._hosts.remove(host_user_id)
+            if queue:
+                self._hosts.append(host_user_id)
+            else:
+                del self._queues[host_user_id]
+            self._running_hosts[host_user_id] = self._running_hosts.get(host_user_id, 0) + 1
+            return job_id, host_user_id
+        return None
+
+    def _pick_background(self) -> Optional[Tuple[Callable[[], Awaitable[Any]], asyncio.Future]]:
+        """没有房间任务排队时取出下一个后台任务"""
+        if self._closing or self._queues:
+            return None
+        while self._background:
+            func, future = self._background.popleft()
+            if not future.done():
+                return func, future
+        return None
+
+    async def _worker(self):
+        while True:
+            async with self._wakeup:
+                picked = self._pick()
+                background = None if picked else self._pick_background()
+                while picked is None and background is None:
+                    await self._wakeup.wait()
+                    picked = self._pick()
+                    background = None if picked else self._pick_background()
+            if background is not None:
+                task = asyncio.create_task(self._execute_background(*background))
+                self._background_running.add(task)
+            else:
+                job_id, host_user_id = picked
+                task = asyncio.create_task(self._execute(job_id, host_user_id))
+                self._running[job_id] = task
+            # 任务被取消时不影响工作协程
+            await asyncio.wait([task])
+
+    async def _execute_background(self, func: Callable[[], Awaitable[Any]], future: asyncio.Future):
+        """执行一个后台任务，结果交给等待的调用方"""
+        try:
+            result = await func()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            self.background_failed_count += 1
+            if not future.done():
+                future.set_exception(e)
+        else:
+            self.background_completed_count += 1
+            if not future.done():
+                future.set_result(result)
+        finally:
+            self._background_running.discard(asyncio.current_task())
+            if self._wakeup is not None and not self._closing:
+                async with self._wakeup:
+                    self._wakeup.notify_all()
+
+    async def _execute(self, job_id: int, host_user_id: int):
+        """执行一个任务并根据结果更新任务状态"""
+        from .game_handler.ScriptGeneratorHandler import script_generator_handler
+
+        enqueued_at = self._enqueued_at.pop(job_id, None)
+        if enqueued_at is not None:
+            self._queue_wait_total_ms += (time.perf_counter() - enqueued_at) * 1000
+            self._queue_wait_count += 1
+        started = time.perf_counter()
+        try:
+            job = await ScriptGenerationJobs.get_or_none(id=job_id)
+            if job is None or job.status != "排队中":
+                return
+            job.status = "生成中"
+            job.attempts += 1
+            job.progress = 0
+            job.started_at = datetime.now()
+            await job.save()
+
+            try:
+                script_id = await script_generator_handler.generate_script(job)
+            except asyncio.CancelledError:
+                if self._closing:
+                    # 服务关闭：本次执行不计入次数，重启后继续
+                    job.status = "排队中"
+                    job.attempts -= 1
+                    job.progress = 0
+                    job.script_id = None
+                    await job.save()
+                else:
+                    await self._finish_cancelled(job)
+                raise
+            except Exception as e:
+                job.error = str(e)
+                job.progress = 0
+                job.script_id = None
+                if job.attempts < settings.SCRIPT_GENERATION_MAX_ATTEMPTS:
+                    job.status = "排队中"
+                    await job.save()
+                    self.retried_count += 1
+                    await script_generator_handler.notify_retry(job.room_id, str(e))
+                    await self._enqueue(job.id, host_user_id)
+                else:
+                    job.status = "失败"
+                    job.finished_at = datetime.now()
+                    await job.save()
+                    self.failed_count += 1
+                    await script_generator_handler.fail_generation(job.room_id, f"剧本生成失败：{str(e)}")
+            else:
+                job.status = "已完成"
+                job.progress = len(SCRIPT_SECTIONS)
+                job.script_id = script_id
+                job.error = None
+                job.finished_at = datetime.now()
+                await job.save()
+                self.completed_count += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # 数据库异常等：任务保持当前状态，下次启动时恢复
+            print(f"剧本生成任务 {job_id} 执行异常: {str(e)}")
+        finally:
+            self._run_time_total_ms += (time.perf_counter() - started) * 1000
+            self._run_time_count += 1
+            self._running.pop(job_id, None)
+            self._running_hosts[host_user_id] -= 1
+            if not self._running_hosts[host_user_id]:
+                del self._running_hosts[host_user_id]
+            # 房主的执行名额已释放，唤醒等待的工作协程
+            if self._wakeup is not None and not self._closing:
+                async with self._wakeup:
+                    self._wakeup.notify_all()
+
+    async def _finish_cancelled(self, job: ScriptGenerationJobs):
+        from .game_handler.ScriptGeneratorHandler import script_generator_handler
+
+        job.status = "已取消"
+        job.progress = 0
+        job.script_id = None
+        job.finished_at = datetime.now()
+        await job.save()
+        self.cancelled_count += 1
+        await script_generator_handler.fail_generation(job.room_id, "剧本生成已取消")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取任务队列统计信息"""
+        return {
+            "workers": len(self._workers),
+            "queued": sum(len(queue) for queue in self._queues.values()),
+            "running": len(self._running),
+            "queued_hosts": len(self._hosts),
+            "running_hosts": len(self._running_hosts),
+            "submitted": self.submitted_count,
+            "completed": self.completed_count,
+            "failed": self.failed_count,
+            "cancelled": self.cancelled_count,
+            "retried": self.retried_count,
+            "recovered": self.recovered_count,
+            "background_queued": len(self._background),
+            "background_running": len(self._background_running),
+            "background_completed": self.background_completed_count,
+            "background_failed": self.background_failed_count,
+            "queue_wait_avg_ms": round(self._queue_wait_total_ms / self._queue_wait_count, 2)
+            if self._queue_wait_count else 0.0,
+            "run_time_avg_ms": round(self._run_time_total_ms / self._run_time_count, 2)
+            if self._run_time_count else 0.0
+        }
+
+
+# 全局剧本生成任务队列实例
+script_generation_queue = ScriptGenerationQueue()
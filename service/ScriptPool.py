@@ -0,0 +1,201 @@
+import asyncio
+import hashlib
+import json
+from collections import Counter
+from datetime import datetime, timedelta
+from functools import partial
+from typing import Any, Dict, Optional, Tuple
+
+from conf.config import settings
+from model.entity.Scripts import Scripts, ScriptGenerationJobs, ScriptPoolEntries, Users
+
+# 决定剧本内容的生成参数
+BUCKET_FIELDS = ("theme", "difficulty", "ai_dm_personality", "duration_mins")
+
+
+def bucket_params(game_setting: Dict[str, Any], player_count: int) -> Tuple:
+    """生成参数的规范化形式"""
+    return tuple(str(game_setting.get(field, "")).strip() for field in BUCKET_FIELDS) + (int(player_count),)
+
+
+def bucket_key(game_setting: Dict[str, Any], player_count: int) -> str:
+    """生成参数的分桶键"""
+    params = bucket_params(game_setting, player_count)
+    return hashlib.sha1(json.dumps(params, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def bucket_label(game_setting: Dict[str, Any], player_count: int) -> str:
+    """分桶的可读名称，用于统计信息"""
+    theme, difficulty, personality, duration, players = bucket_params(game_setting, player_count)
+    return f"{theme}/{difficulty}/{personality}/{duration}分钟/{players}人"
+
+
+class ScriptPool:
+    """预生成剧本池
+
+    按生成参数（主题、难度、DM风格、时长、人数）分桶保存预先生成且尚未被领取的剧本，
+    房主生成剧本时所在的桶中有剧本就直接领取，无需等待模型生成。
+    后台补充协程按近期的生成请求选出热门参数桶，在剧本生成任务队列空闲时
+    逐个提交低优先级的生成任务（与房间任务共用工作协程），把每个桶补充到 SCRIPT_POOL_TARGET_DEPTH 个。
+    预生成不读写模型响应缓存，否则同一个桶每次都会得到相同的剧本。
+    """
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        # 热门桶的剧本数 {label: depth}（补充协程每轮刷新）
+        self._depths: Dict[str, int] = {}
+
+        # 统计
+        self.hit_count = 0
+        self.miss_count = 0
+        self.filled_count = 0
+        self.fill_failed_count = 0
+
+    def start(self):
+        """启动后台补充协程（目标深度为 0 时不启用）"""
+        if self._task is None and settings.SCRIPT_POOL_TARGET_DEPTH > 0:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._fill_loop())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def claim(self, game_setting: Dict[str, Any], player_count: int, user_id: int) -> Optional[int]:
+        """领取一个参数匹配的预生成剧本，返回剧本ID；没有时返回 None"""
+        bucket = bucket_key(game_setting, player_count)
+        for entry in await ScriptPoolEntries.filter(bucket=bucket).order_by("id").limit(3):
+            # 删除成功即领取成功，多个房间同时领取时只有一个能删除
+            if await ScriptPoolEntries.filter(id=entry.id).delete():
+                await Scripts.filter(id=entry.script_id).update(author_id=user_id)
+                self.hit_count += 1
+                label = bucket_label(game_setting, player_count)
+                if self._depths.get(label):
+                    self._depths[label] -= 1
+                # 桶被领取后尽快补充
+                if self._wakeup is not None:
+                    self._wakeup.set()
+                return entry.script_id
+        self.miss_count += 1
+        return None
+
+    async def _fill_loop(self):
+        while True:
+            try:
+                filled = await self._fill_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"补充剧本池失败: {str(e)}")
+                self.fill_failed_count += 1
+                filled = False
+            if filled:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), settings.SCRIPT_POOL_FILL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def _fill_once(self) -> bool:
+        """为最缺剧本的热门桶生成一个剧本，返回是否生成了剧本"""
+        from service.ScriptGenerationQueue import script_generation_queue
+        from utils.response_cache import response_cache, MODE_REPLAY
+
+        # 回放模式不调用模型，无法预生成
+        if response_cache.mode == MODE_REPLAY:
+            return False
+        # 有房间在等待或正在生成剧本时不提交
+        if not script_generation_queue.is_idle():
+            return False
+
+        buckets = await self._popular_buckets()
+        if not buckets:
+            self._depths = {}
+            return False
+        depths = {}
+        for key, (game_setting, player_count) in buckets.items():
+            depths[key] = await ScriptPoolEntries.filter(bucket=key).count()
+        self._depths = {bucket_label(*buckets[key]): depth for key, depth in depths.items()}
+
+        key = min(depths, key=depths.get)
+        if depths[key] >= settings.SCRIPT_POOL_TARGET_DEPTH:
+            return False
+        game_setting, player_count = buckets[key]
+        # 在任务队列中执行：房间任务排队时后出队，并受工作协程数限制
+        await script_generation_queue.run_background(partial(self._generate, key, game_setting, player_count))
+        return True
+
+    async def _popular_buckets(self) -> Dict[str, Tuple[Dict[str, Any], int]]:
+        """近期请求次数最多的参数桶 {bucket: (game_setting, player_count)}"""
+        since = datetime.now() - timedelta(days=settings.SCRIPT_POOL_DEMAND_DAYS)
+        rows = await ScriptGenerationJobs.filter(created_at__gte=since).values_list("game_setting", "room__max_players")
+        demand = Counter()
+        params = {}
+        for game_setting, player_count in rows:
+            if not game_setting or not player_count:
+                continue
+            key = bucket_key(game_setting, player_count)
+            demand[key] += 1
+            params[key] = ({field: game_setting.get(field) for field in BUCKET_FIELDS}, player_count)
+        return {
+            key: params[key]
+            for key, count in demand.most_common(settings.SCRIPT_POOL_MAX_BUCKETS)
+            if count >= settings.SCRIPT_POOL_MIN_REQUESTS
+        }
+
+    async def _generate(self, key: str, game_setting: Dict[str, Any], player_count: int):
+        """生成一个剧本并放入剧本池"""
+        from utils.scripts_util import create_user_prompt, call_ai_api, parse_and_save_script
+
+        user_prompt = create_user_prompt(
+            game_setting["theme"],
+            player_count,
+            game_setting["difficulty"],
+            game_setting["ai_dm_personality"],
+            game_setting["duration_mins"]
+        )
+        ai_response = await call_ai_api(user_prompt, use_cache=False)
+        # 领取前剧本的作者是剧本池的系统用户，领取时改为领取的房主
+        author = await self._pool_user()
+        script_id = await parse_and_save_script(ai_response, author.id, player_count, game_setting["duration_mins"])
+        await ScriptPoolEntries.create(
+            script_id=script_id,
+            bucket=key,
+            game_setting=game_setting,
+            player_count=player_count
+        )
+        self.filled_count += 1
+
+    async def _pool_user(self) -> Users:
+        user, _ = await Users.get_or_create(
+            username="script_pool",
+            defaults={
+                "password_hash": "",
+                "nickname": "剧本池",
+                "email": "script_pool@system.local",
+                "is_active": False
+            }
+        )
+        return user
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取剧本池统计信息"""
+        lookups = self.hit_count + self.miss_count
+        return {
+            "enabled": self._task is not None,
+            "hits": self.hit_count,
+            "misses": self.miss_count,
+            "hit_rate": round(self.hit_count / lookups, 4) if lookups else 0.0,
+            "filled": self.filled_count,
+            "fill_failed": self.fill_failed_count,
+            "depth": sum(self._depths.values()),
+            "buckets": dict(self._depths)
+        }
+
+
+# 全局预生成剧本池实例
+script_pool = ScriptPool()
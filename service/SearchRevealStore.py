@@ -0,0 +1,181 @@
+import asyncio
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set
+
+from conf.config import settings
+from model.entity.Scripts import GameRooms, ScriptClues, ScriptStages, SearchActions
+from service.ScriptContentCache import ScriptContent, script_content_cache
+
+
+class SearchReveal:
+    """一条搜查记录（搜查者从某个玩家处搜到的线索）"""
+
+    __slots__ = ("id", "game_player_id", "searchable_player_id", "clue", "stage_name", "stage_number",
+                 "is_public", "created_at")
+
+    def __init__(self, action: SearchActions, clue: ScriptClues, stage: Optional[ScriptStages]):
+        self.id = action.id
+        self.game_player_id = action.game_player_id
+        self.searchable_player_id = action.searchable_player_id
+        self.clue = clue
+        # 没有所属阶段的记录不会出现在任何阶段中
+        self.stage_name = stage.name if stage else None
+        self.stage_number = stage.stage_number if stage else None
+        self.is_public = action.is_public
+        self.created_at: datetime = action.created_at
+
+
+class RoomReveals:
+    """一个房间的搜查记录，按搜查者分组，并为每个搜查者维护已搜到线索的掩码"""
+
+    def __init__(self, room_id: int, content: ScriptContent):
+        self.room_id = room_id
+        self.content = content
+        self._reveals: Dict[int, List[SearchReveal]] = {}
+        self._found_masks: Dict[int, int] = {}
+        self._reveal_ids: Set[int] = set()
+
+    def add(self, reveal: SearchReveal):
+        if reveal.id in self._reveal_ids:
+            return
+        self._reveal_ids.add(reveal.id)
+        self._reveals.setdefault(reveal.game_player_id, []).append(reveal)
+        self._found_masks[reveal.game_player_id] = (
+            self._found_masks.get(reveal.game_player_id, 0) | self.content.clue_bits.get(reveal.clue.id, 0)
+        )
+
+    def reveals_up_to(self, game_player_id: int, stage_number: int) -> List[SearchReveal]:
+        """搜查者在指定阶段及之前的搜查记录，按阶段排列"""
+        reveals = [
+            reveal for reveal in self._reveals.get(game_player_id, [])
+            if reveal.stage_number is not None and reveal.stage_number <= stage_number
+        ]
+        reveals.sort(key=lambda reveal: reveal.stage_number)
+        return reveals
+
+    def found_mask(self, game_player_id: int) -> int:
+        """搜查者已搜到的线索的掩码"""
+        return self._found_masks.get(game_player_id, 0)
+
+    def has_found(self, game_player_id: int, clue_id: int) -> bool:
+        if self.found_mask(game_player_id) & self.content.clue_bits.get(clue_id, 0):
+            return True
+        # 不在阶段中的线索没有掩码位，逐条比较
+        return any(reveal.clue.id == clue_id for reveal in self._reveals.get(game_player_id, []))
+
+    @property
+    def size(self) -> int:
+        return len(self._reveal_ids)
+
+
+class SearchRevealStore:
+    """房间搜查记录缓存
+
+    房间状态构建不再每次查询搜查记录：每个房间首次使用时加载一次，
+    之后由 ClueSearchHandler 在创建搜查记录后调用 record 增量更新。
+    已搜到线索的掩码与剧本内容的可见性掩码做位运算即可得到玩家可见/可搜查的线索。
+    最多保留 SEARCH_REVEAL_CACHE_SIZE 个最近使用的房间。
+    """
+
+    def __init__(self):
+        self._rooms: "OrderedDict[int, RoomReveals]" = OrderedDict()
+        # 加载中的房间，同一房间的并发请求共用一次加载
+        self._loading: Dict[int, asyncio.Task] = {}
+        # 加载期间有新记录或已失效的加载任务，其结果不写入缓存
+        self._stale_loads: Set[asyncio.Task] = set()
+
+        # 统计
+        self.hit_count = 0
+        self.miss_count = 0
+        self.record_count = 0
+        self.eviction_count = 0
+        self.invalidation_count = 0
+
+    async def get(self, room: GameRooms) -> RoomReveals:
+        """获取房间的搜查记录，未缓存或房间已更换剧本时从数据库加载"""
+        reveals = self._rooms.get(room.id)
+        if reveals is not None and reveals.content.script_id == room.script_id:
+            self._rooms.move_to_end(room.id)
+            self.hit_count += 1
+            return reveals
+
+        self.miss_count += 1
+        task = self._loading.get(room.id)
+        if task is None:
+            task = asyncio.create_task(self._load(room.id, room.script_id))
+            self._loading[room.id] = task
+        reveals = await asyncio.shield(task)
+        if reveals.content.script_id != room.script_id:
+            # 共用的加载开始于更换剧本之前
+            self.invalidate(room.id)
+            return await self.get(room)
+        return reveals
+
+    async def _load(self, room_id: int, script_id: int) -> RoomReveals:
+        task = asyncio.current_task()
+        try:
+            content = await script_content_cache.get(script_id)
+            actions = await SearchActions.filter(game_player__room_id=room_id).prefetch_related(
+                'clues_found__discovery_stage', 'stage'
+            ).order_by('id')
+        finally:
+            if self._loading.get(room_id) is task:
+                del self._loading[room_id]
+            stale = task in self._stale_loads
+            self._stale_loads.discard(task)
+
+        reveals = RoomReveals(room_id, content)
+        for action in actions:
+            reveals.add(SearchReveal(action, action.clues_found, action.stage))
+        if stale:
+            return reveals
+
+        self._rooms[room_id] = reveals
+        while len(self._rooms) > settings.SEARCH_REVEAL_CACHE_SIZE:
+            self._rooms.popitem(last=False)
+            self.eviction_count += 1
+        return reveals
+
+    def record(self, room: GameRooms, action: SearchActions, clue: ScriptClues, stage: Optional[ScriptStages]):
+        """新建搜查记录后增量更新（房间未缓存时下次使用再加载）"""
+        task = self._loading.get(room.id)
+        if task is not None:
+            # 加载的查询可能早于这条记录
+            self._stale_loads.add(task)
+            del self._loading[room.id]
+        reveals = self._rooms.get(room.id)
+        if reveals is None:
+            return
+        if reveals.content.script_id != room.script_id:
+            self.invalidate(room.id)
+            return
+        reveals.add(SearchReveal(action, clue, stage))
+        self.record_count += 1
+
+    def invalidate(self, room_id: int):
+        """房间被删除或搜查记录被外部修改后丢弃缓存"""
+        task = self._loading.pop(room_id, None)
+        if task is not None:
+            self._stale_loads.add(task)
+        if self._rooms.pop(room_id, None) is not None:
+            self.invalidation_count += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        lookups = self.hit_count + self.miss_count
+        return {
+            "rooms": len(self._rooms),
+            "reveals": sum(reveals.size for reveals in self._rooms.values()),
+            "loading": len(self._loading),
+            "hits": self.hit_count,
+            "misses": self.miss_count,
+            "hit_rate": round(self.hit_count / lookups, 4) if lookups else 0.0,
+            "records": self.record_count,
+            "evictions": self.eviction_count,
+            "invalidations": self.invalidation_count
+        }
+
+
+# 全局搜查记录缓存实例
+search_reveal_store = SearchRevealStore()
@@ -0,0 +1,201 @@
+import asyncio
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional, Set, Tuple
+
+from tortoise.functions import Count
+
+from conf.config import settings
+from model.entity.Scripts import GameVotes
+
+
+class VoteTally:
+    """一个房间的投票及得票数
+
+    投票和改票时增量更新得票数，读取得票数不需要重新统计全部投票。
+    """
+
+    def __init__(self, room_id: int):
+        self.room_id = room_id
+        # 投票 {投票者GamePlayer ID: (被投票者GamePlayer ID, 投票时间)}，按首次投票的顺序排列
+        self._votes: Dict[int, Tuple[int, datetime]] = {}
+        # 得票数 {被投票者GamePlayer ID: 票数}，只包含有票的玩家
+        self._counts: Dict[int, int] = {}
+
+    def cast(self, voter_player_id: int, voted_player_id: int, timestamp: datetime) -> Optional[int]:
+        """记录一次投票或改票，返回之前投给的玩家ID（首次投票为 None）"""
+        previous = self._votes.get(voter_player_id)
+        previous_voted_id = previous[0] if previous else None
+        self._votes[voter_player_id] = (voted_player_id, timestamp)
+        if previous_voted_id == voted_player_id:
+            return previous_voted_id
+
+        if previous_voted_id is not None:
+            remaining = self._counts[previous_voted_id] - 1
+            if remaining:
+                self._counts[previous_voted_id] = remaining
+            else:
+                del self._counts[previous_voted_id]
+        self._counts[voted_player_id] = self._counts.get(voted_player_id, 0) + 1
+        return previous_voted_id
+
+    def get(self, voter_player_id: int) -> Optional[int]:
+        """投票者投给的玩家ID"""
+        vote = self._votes.get(voter_player_id)
+        return vote[0] if vote else None
+
+    def clear(self):
+        self._votes.clear()
+        self._counts.clear()
+
+    def __len__(self) -> int:
+        return len(self._votes)
+
+    def items(self) -> Iterator[Tuple[int, int, datetime]]:
+        """全部投票 (投票者ID, 被投票者ID, 投票时间)"""
+        for voter_player_id, (voted_player_id, timestamp) in self._votes.items():
+            yield voter_player_id, voted_player_id, timestamp
+
+    @property
+    def counts(self) -> Dict[int, int]:
+        """得票数 {被投票者GamePlayer ID: 票数}（只读）"""
+        return self._counts
+
+    def leader(self) -> Optional[Tuple[int, int]]:
+        """得票最多的玩家 (GamePlayer ID, 票数)，没有投票时为 None
+
+        票数相同时先达到该票数（最后一票的投票时间最早）的玩家领先，再相同时 GamePlayer ID 小的领先。
+        """
+        if not self._counts:
+            return None
+        top = max(self._counts.values())
+        # 得票最多的玩家各自最后一票的投票时间
+        reached_at: Dict[int, datetime] = {}
+        for voted_player_id, timestamp in self._votes.values():
+            if self._counts[voted_player_id] == top:
+                if voted_player_id not in reached_at or timestamp > reached_at[voted_player_id]:
+                    reached_at[voted_player_id] = timestamp
+        leader_id = min(reached_at, key=lambda player_id: (reached_at[player_id], player_id))
+        return leader_id, top
+
+
+class VoteTallyStore:
+    """房间投票计数缓存
+
+    VoteHandler 投票时直接更新这里的计数，投票阶段的房间状态广播和结束投票时的结果
+    都从这里读取，不再每次加载全部投票记录。房间状态重新加载时（HTTP 接口修改房间等之后）
+    用一条 GROUP BY 查询核对得票数，不一致时丢弃并从数据库重新加载。
+    最多保留 VOTE_TALLY_CACHE_SIZE 个最近使用的房间；被淘汰的房间重新加载前
+    需要先等房间已登记的投票写入落库（get 的 flush 参数）。
+    """
+
+    def __init__(self):
+        self._tallies: "OrderedDict[int, VoteTally]" = OrderedDict()
+        # 加载中的房间，同一房间的并发请求共用一次加载
+        self._loading: Dict[int, asyncio.Task] = {}
+        # 加载期间已失效的加载任务，其结果不写入缓存
+        self._stale_loads: Set[asyncio.Task] = set()
+
+        # 统计
+        self.hit_count = 0
+        self.miss_count = 0
+        self.reconcile_count = 0
+        self.mismatch_count = 0
+        self.eviction_count = 0
+
+    async def get(self, room_id: int, flush: Optional[Callable[[], Awaitable[Any]]] = None) -> VoteTally:
+        """获取房间的投票计数，未缓存时从数据库加载
+
+        flush 用于等待房间已登记（defer_write）的数据库写入完成，加载前调用，避免读到旧的投票记录。
+        """
+        tally = self._tallies.get(room_id)
+        if tally is not None:
+            self._tallies.move_to_end(room_id)
+            self.hit_count += 1
+            return tally
+
+        self.miss_count += 1
+        task = self._loading.get(room_id)
+        if task is None:
+            task = asyncio.create_task(self._load(room_id, flush))
+            self._loading[room_id] = task
+        return await asyncio.shield(task)
+
+    async def _load(self, room_id: int, flush: Optional[Callable[[], Awaitable[Any]]]) -> VoteTally:
+        task = asyncio.current_task()
+        try:
+            if flush is not None:
+                await flush()
+            votes = await GameVotes.filter(room_id=room_id).order_by('id').values_list(
+                'voter_game_player_id', 'voted_game_player_id', 'timestamp'
+            )
+        finally:
+            if self._loading.get(room_id) is task:
+                del self._loading[room_id]
+            stale = task in self._stale_loads
+            self._stale_loads.discard(task)
+
+        tally = VoteTally(room_id)
+        for voter_player_id, voted_player_id, timestamp in votes:
+            tally.cast(voter_player_id, voted_player_id, timestamp)
+        if stale:
+            return tally
+        self._store(tally)
+        return tally
+
+    def _store(self, tally: VoteTally):
+        self._tallies[tally.room_id] = tally
+        self._tallies.move_to_end(tally.room_id)
+        while len(self._tallies) > settings.VOTE_TALLY_CACHE_SIZE:
+            self._tallies.popitem(last=False)
+            self.eviction_count += 1
+
+    def reset(self, room_id: int) -> VoteTally:
+        """开始新一轮投票：清空计数（不需要从数据库加载）"""
+        self.invalidate(room_id)
+        tally = VoteTally(room_id)
+        self._store(tally)
+        return tally
+
+    async def reconcile(self, room_id: int) -> VoteTally:
+        """用一条 GROUP BY 查询核对缓存的得票数，不一致时从数据库重新加载"""
+        tally = self._tallies.get(room_id)
+        if tally is None:
+            return await self.get(room_id)
+
+        self.reconcile_count += 1
+        counts = dict(await GameVotes.filter(room_id=room_id).annotate(
+            vote_count=Count('id')
+        ).group_by('voted_game_player_id').values_list('voted_game_player_id', 'vote_count'))
+        if counts == tally.counts and self._tallies.get(room_id) is tally:
+            return tally
+
+        self.mismatch_count += 1
+        self.invalidate(room_id)
+        return await self.get(room_id)
+
+    def invalidate(self, room_id: int):
+        """投票记录被外部修改后丢弃缓存"""
+        task = self._loading.pop(room_id, None)
+        if task is not None:
+            self._stale_loads.add(task)
+        self._tallies.pop(room_id, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        lookups = self.hit_count + self.miss_count
+        return {
+            "rooms": len(self._tallies),
+            "votes": sum(len(tally) for tally in self._tallies.values()),
+            "loading": len(self._loading),
+            "hits": self.hit_count,
+            "misses": self.miss_count,
+            "hit_rate": round(self.hit_count / lookups, 4) if lookups else 0.0,
+            "reconciles": self.reconcile_count,
+            "mismatches": self.mismatch_count,
+            "evictions": self.eviction_count
+        }
+
+
+# 全局投票计数缓存实例
+vote_tally_store = VoteTallyStore()
@@ -0,0 +1,37 @@
+from typing import AsyncIterator, Dict, List, Optional
+
+from conf.config import settings
+from utils.http_client import http_client
+from utils.sse_decoder import iter_completion_deltas
+
+
+class AIChatClient:
+    """NPC对话模型客户端（OpenAI 兼容的 chat/completions 流式接口）"""
+
+    @property
+    def is_configured(self) -> bool:
+        return bool(settings.API_URL and settings.API_KEY)
+
+    async def stream_chat(self, messages: List[Dict[str, str]], max_tokens: Optional[int] = None,
+                          temperature: Optional[float] = None) -> AsyncIterator[str]:
+        """流式调用模型，逐段返回生成的文本"""
+        headers = {
+            "Authorization": f"Bearer {settings.API_KEY}",
+            "Content-Type": "application/json"
+        }
+        payload = {
+            "model": settings.API_MODEL,
+            "messages": messages,
+            "temperature": settings.API_TEMPERATURE if temperature is None else temperature,
+            "max_tokens": max_tokens or settings.AI_NPC_MAX_TOKENS,
+            "stream": True
+        }
+
+        async with http_client.client.stream('POST', settings.API_URL, json=payload, headers=headers) as response:
+            response.raise_for_status()
+            async for content in iter_completion_deltas(response):
+                yield content
+
+
+# 全局NPC对话模型客户端实例
+ai_chat_client = AIChatClient()
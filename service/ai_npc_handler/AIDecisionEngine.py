@@ -1,66 +1,101 @@
-import json
 import random
-from typing import Dict, Any, Optional
-from model.entity.Scripts import AIInteractions
+from typing import Dict, Any, AsyncIterator, Optional
+from model.entity.Scripts import AIInteractions, GamePlayers
+from .AIPromptBuilder import AIPromptBuilder
+from .AIChatClient import ai_chat_client
 
 class AIDecisionEngine:
-    """AI决策引擎"""
-    
-    async def make_decision(self, ai_player,room,trigger_player_id, context: Dict[str, Any]) -> Dict[str, Any]:
+    """AI决策引擎
+
+    决定NPC是否行动以及行动类型；需要发言时，决策中的 reply 是模型流式生成的回复，
+    由 AIResponseExecutor 边生成边推送给玩家。
+    """
+
+    # 未配置模型接口时使用的回复
+    FALLBACK_RESPONSES = [
+        "我明白你的意思。",
+        "这个信息很有趣...",
+        "我需要仔细考虑一下。",
+        "你觉得这和案件有什么关系？"
+    ]
+
+    def __init__(self):
+        self.prompt_builder = AIPromptBuilder()
+
+    async def make_decision(self, ai_player, room, trigger_player_id, context: Dict[str, Any]) -> Dict[str, Any]:
         """基于上下文做出决策"""
-        trigger_message = context.get("trigger_message", {})
+        trigger_message = context.get("trigger_message")
+        if not trigger_message:
+            return await self.make_autonomous_decision(ai_player, context)
+
         message_type = trigger_message.get("type")
-        
-        
-        
-        decision = {"action_type": "无行动", "should_act": False}
         if message_type == "private_message":
-            decision=  await self._decide_private_chat_response(ai_player, context)
+            return await self._decide_private_chat_response(ai_player, trigger_player_id, context)
         elif message_type == "chat":
-            decision=  await self._decide_public_chat_response(ai_player, context)
-        else:
-            decision=  {"action_type": "无行动", "should_act": False}
-                    # 记录交互
-                    
-        interaction = await AIInteractions.create(
-            room=room,
-            ai_player=ai_player,
-            trigger_player_id=trigger_player_id,
-            interaction_type=decision.get("action_type"),
-            context_data=context,
-            ai_response=decision
-        )
-        return decision
-    
+            return await self._decide_public_chat_response(ai_player, context)
+        return {"action_type": "无行动", "should_act": False}
+
     async def make_autonomous_decision(self, ai_player, context: Dict[str, Any]) -> Dict[str, Any]:
         """自主决策"""
         game_status = context.get("game_info", {}).get("status")
-        
+
         if game_status == "进行中":
             return await self._decide_autonomous_action(ai_player, context)
-        elif game_status == "搜证中":
-            return await self._decide_search_action(ai_player, context)
-        elif game_status == "投票中":
-            return await self._decide_vote_action(ai_player, context)
-        
+
+        # 搜证和投票阶段暂不自主行动
         return {"action_type": "无行动", "should_act": False}
-    
-    async def _decide_private_chat_response(self, ai_player, context: Dict[str, Any]) -> Dict[str, Any]:
+
+    async def record_interaction(self, ai_player, room, trigger_player: Optional[GamePlayers],
+                                 context: Dict[str, Any], decision: Dict[str, Any]):
+        """记录AI交互（回复生成完成后调用）"""
+        await AIInteractions.create(
+            room=room,
+            ai_player=ai_player,
+            trigger_player=trigger_player,
+            interaction_type=decision.get("action_type"),
+            context_data=context,
+            ai_response={key: value for key, value in decision.items() if key != "reply"}
+        )
+
+    async def _decide_private_chat_response(self, ai_player, trigger_player_id, context: Dict[str, Any]) -> Dict[str, Any]:
         """决策私聊回应"""
-        trigger_message = context.get("trigger_message", {})
-        message_content = trigger_message.get("data", {}).get("message", "")
-        
-        # 简化的回应逻辑
-        responses = [
-            "我明白你的意思。",
-            "这个信息很有趣...",
-            "我需要仔细考虑一下。",
-            "你觉得这和案件有什么关系？"
-        ]
-        
+        message_content = context.get("trigger_message", {}).get("data", {}).get("message", "")
+        instruction = f"玩家私下对你说：「{message_content}」。请以你的角色身份私下回复对方。"
+
         return {
             "action_type": "回应私聊",
             "should_act": True,
-            "content": random.choice(responses),
-            "recipient_id": trigger_message.get("data", {}).get("sender_id")
+            "recipient_id": trigger_player_id,
+            "reply": self._stream_reply(ai_player, context, instruction)
         }
+
+    async def _decide_public_chat_response(self, ai_player, context: Dict[str, Any]) -> Dict[str, Any]:
+        """决策公共聊天回应"""
+        message_content = context.get("trigger_message", {}).get("data", {}).get("message", "")
+        instruction = f"有玩家在公共频道说：「{message_content}」。请以你的角色身份在公共频道回应。"
+
+        return {
+            "action_type": "回应聊天",
+            "should_act": True,
+            "reply": self._stream_reply(ai_player, context, instruction)
+        }
+
+    async def _decide_autonomous_action(self, ai_player, context: Dict[str, Any]) -> Dict[str, Any]:
+        """决策主动发言"""
+        instruction = "现在轮到你主动发言。请结合你的任务，在公共频道提出一个问题或分享一个观点来推进调查。"
+
+        return {
+            "action_type": "主动聊天",
+            "should_act": True,
+            "reply": self._stream_reply(ai_player, context, instruction)
+        }
+
+    async def _stream_reply(self, ai_player, context: Dict[str, Any], instruction: str) -> AsyncIterator[str]:
+        """流式生成角色回复，未配置模型接口时使用预设回复"""
+        if not ai_chat_client.is_configured:
+            yield random.choice(self.FALLBACK_RESPONSES)
+            return
+
+        messages = self.prompt_builder.build_chat_messages(ai_player, context, instruction)
+        async for content in ai_chat_client.stream_chat(messages):
+            yield content
@@ -1,5 +1,7 @@
 from typing import Dict, Any, List
 from model.entity.Scripts import GameRooms, GamePlayers, GameLogs, ScriptClues
+from utils.recent_message_buffer import recent_message_buffer
+from service.ScriptContentCache import script_content_cache
 
 class AIPromptBuilder:
     """AI提示词构建器"""
@@ -11,10 +13,10 @@ class AIPromptBuilder:
             "game_info": await self._build_game_info(room),
             "character_info": await self._build_character_info(ai_player),
             "players_info": await self._build_players_info(room),
-            "recent_messages": await self._build_recent_messages(room),
+            "recent_messages": await self._build_recent_messages(ai_player, room),
             "current_clues": await self._build_current_clues(ai_player, room),
             "trigger_message": message_data,
-            "ai_state": ai_player.ai_state or {}
+            "ai_state": getattr(ai_player, "ai_state", None) or {}
         }
         return context
     
@@ -24,13 +26,48 @@ class AIPromptBuilder:
             "game_info": await self._build_game_info(room),
             "character_info": await self._build_character_info(ai_player),
             "players_info": await self._build_players_info(room),
-            "recent_messages": await self._build_recent_messages(room),
+            "recent_messages": await self._build_recent_messages(ai_player, room),
             "current_clues": await self._build_current_clues(ai_player, room),
-            "ai_state": ai_player.ai_state or {},
+            "ai_state": getattr(ai_player, "ai_state", None) or {},
             "stage_goals": await self._build_stage_goals(ai_player, room)
         }
         return context
     
+    def build_chat_messages(self, ai_player: GamePlayers, context: Dict[str, Any],
+                            instruction: str) -> List[Dict[str, str]]:
+        """把决策上下文转换为对话模型的消息列表"""
+        character = context.get("character_info") or {}
+        game_info = context.get("game_info") or {}
+        base_prompt = ai_player.aiconfig.base_prompt if ai_player.aiconfig else ""
+        
+        system_lines = [
+            base_prompt,
+            f"你正在参与一场剧本杀游戏《{game_info.get('script_title') or '未命名剧本'}》，扮演角色「{character.get('name', ai_player.user.nickname)}」。",
+            f"剧本简介：{game_info.get('script_description') or '无'}",
+            f"当前阶段：{game_info.get('current_stage') or '无'}，阶段目标：{game_info.get('stage_goal') or '无'}",
+            f"你的公开身份：{character.get('public_info') or '无'}",
+            f"你的背景故事（只有你知道）：{character.get('backstory') or '无'}",
+        ]
+        if character.get("is_murderer"):
+            system_lines.append("你是本案的凶手，必须隐藏身份，不能承认自己的罪行。")
+        if character.get("stage_goals"):
+            system_lines.append("你的任务：" + "；".join(goal["goal"] for goal in character["stage_goals"]))
+        
+        players = "、".join(
+            f"{p['character_name'] or '未选角色'}({p['nickname']})" for p in context.get("players_info", [])
+        )
+        system_lines.append(f"在场玩家：{players}")
+        system_lines.append("请始终以角色身份用中文口语回复，每次回复不超过100字，不要输出任何角色之外的说明。")
+        
+        history = "\n".join(
+            f"[{'私聊' if m['is_private'] else '公开'}] {m['sender']}：{m['content']}"
+            for m in context.get("recent_messages", [])
+        )
+        return [
+            {"role": "system", "content": "\n".join(line for line in system_lines if line)},
+            {"role": "user", "content": f"最近的对话：\n{history or '（暂无）'}\n\n{instruction}"}
+        ]
+    
     async def _build_game_info(self, room: GameRooms) -> Dict[str, Any]:
         """构建游戏信息"""
         return {
@@ -50,7 +87,7 @@ class AIPromptBuilder:
         
         # 获取角色的当前阶段目标
         stage_goals = []
-        if hasattr(character, 'stage_goals'):
+        if getattr(character.stage_goals, '_fetched', False):
             stage_goals = [
                 {
                     "goal": goal.goal_description,
@@ -84,20 +121,22 @@ class AIPromptBuilder:
                 players_info.append(info)
         return players_info
     
-    async def _build_recent_messages(self, room: GameRooms, limit: int = 10) -> List[Dict[str, Any]]:
-        """构建最近消息"""
-        recent_logs = await GameLogs.filter(room=room).order_by('-timestamp').limit(limit).prefetch_related(
-            'sender_game_player__user', 'recipient_game_player__user'
-        )
+    async def _build_recent_messages(self, ai_player: GamePlayers, room: GameRooms,
+                                     limit: int = 10) -> List[Dict[str, Any]]:
+        """构建最近消息（读取房间的最近日志缓冲区，包含尚未落库的日志）
+
+        只包含 NPC 可见的日志：其他玩家之间的私聊和其他玩家的搜查记录不会进入提示词。
+        """
+        recent_logs = await recent_message_buffer.get_visible(room.room_code, ai_player.user_id, limit)
         
         messages = []
-        for log in reversed(recent_logs):
+        for log in recent_logs:
             message = {
-                "type": log.message_type,
-                "content": log.content,
-                "sender": log.send_nickname or "系统",
-                "timestamp": log.timestamp.isoformat(),
-                "is_private": log.message_type == "私聊"
+                "type": log["message_type"],
+                "content": log["content"],
+                "sender": log["send_nickname"] or "系统",
+                "timestamp": log["timestamp"].isoformat(),
+                "is_private": log["message_type"] == "私聊"
             }
             messages.append(message)
         
@@ -109,11 +148,8 @@ class AIPromptBuilder:
             return []
             
         # 获取当前阶段可发现的线索
-        current_stage = room.current_stage
-        available_clues = await ScriptClues.filter(
-            script=room.script,
-            discovery_stage=current_stage
-        )
+        content = await script_content_cache.get(room.script_id)
+        available_clues = content.clues_by_stage.get(room.current_stage_id, [])
         
         clues_info = []
         for clue in available_clues:
@@ -134,11 +170,10 @@ class AIPromptBuilder:
         if not ai_player.character or not room.current_stage:
             return []
             
-        from model.entity.Scripts import CharacterStageGoals
-        goals = await CharacterStageGoals.filter(
-            character=ai_player.character,
-            stage=room.current_stage
-        )
+        content = await script_content_cache.get(room.script_id)
+        goal = content.get_goal(ai_player.character_id, room.current_stage_id)
+        if not goal:
+            return []
         
         return [
             {
@@ -146,6 +181,5 @@ class AIPromptBuilder:
                 "is_mandatory": goal.is_mandatory,
                 "search_attempts": goal.search_attempts
             }
-            for goal in goals
         ]
         
\ No newline at end of file
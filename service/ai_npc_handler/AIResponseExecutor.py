@@ -1,44 +1,114 @@
+import asyncio
+import uuid
 from model.ws.notification_types import MessageType, create_message, create_formatted_data
 from websocket.connection_manager import manager
 from utils.game_log_util import game_log_util
-from typing import Dict, Any, List
+from conf.config import settings
+from typing import Dict, Any, List, AsyncIterator, Awaitable, Callable
 
 class AIResponseExecutor:
     """AI响应执行器"""
-    
+
     async def execute_response(self, ai_player, decision: Dict[str, Any], room):
         """执行AI响应"""
         action_type = decision.get("action_type")
-        
+
         if action_type == "回应私聊":
             await self._execute_private_chat(ai_player, decision, room)
-        elif action_type == "主动聊天":
+        elif action_type in ("回应聊天", "主动聊天"):
             await self._execute_public_chat(ai_player, decision, room)
-        elif action_type == "搜证":
-            await self._execute_search(ai_player, decision, room)
-        elif action_type == "公开线索":
-            await self._execute_reveal_clue(ai_player, decision, room)
-    
+
     async def _execute_private_chat(self, ai_player, decision: Dict[str, Any], room):
-        """执行私聊"""
-        content = decision.get("content", "")
+        """执行私聊（流式推送给接收者）"""
         recipient_id = decision.get("recipient_id")
-        
+        recipient = next((p for p in room.players if p.user_id == recipient_id), None)
+        if not recipient:
+            return
+
+        async def send(data: Dict[str, Any]):
+            await manager.send_personal_message(create_message(MessageType.PRIVATE_MESSAGE, data), recipient_id)
+
+        content = await self._stream_reply(decision["reply"], send, lambda message: create_formatted_data(
+            message=message,
+            send_id=ai_player.user_id,
+            send_nickname=self._display_name(ai_player),
+            recipient_id=recipient_id,
+            recipient_nickname=recipient.user.nickname
+        ))
+        decision["content"] = content
+        if not content:
+            return
+
         # 记录日志
         await game_log_util.create_private_chat_log(
             room=room,
             sender_player=ai_player,
-            recipient_user_id=recipient_id,
+            recipient_player=recipient,
             content=content
         )
-        
-        # 发送消息给接收者
-        await manager.send_personal_message(
-            create_message(MessageType.PRIVATE_MESSAGE, create_formatted_data(
-                message=content,
-                send_id=ai_player.user_id,
-                send_nickname=ai_player.user.nickname,
-                recipient_id=recipient_id
-            )),
-            recipient_id
-        )
\ No newline at end of file
+
+    async def _execute_public_chat(self, ai_player, decision: Dict[str, Any], room):
+        """执行公共聊天（流式广播给房间）"""
+        async def send(data: Dict[str, Any]):
+            await manager.broadcast_to_room(room.room_code, create_message(MessageType.CHAT, data))
+
+        content = await self._stream_reply(decision["reply"], send, lambda message: create_formatted_data(
+            message=message,
+            send_id=ai_player.user_id,
+            send_nickname=self._display_name(ai_player)
+        ))
+        decision["content"] = content
+        if not content:
+            return
+
+        # 记录日志
+        await game_log_util.create_chat_log(
+            room=room,
+            sender_player=ai_player,
+            content=content
+        )
+
+    async def _stream_reply(self, reply: AsyncIterator[str], send: Callable[[Dict[str, Any]], Awaitable[None]],
+                            format_data: Callable[[str], Dict[str, Any]]) -> str:
+        """边生成边推送回复
+
+        同一条回复的消息帧带有相同的 stream_id：生成过程中每隔 AI_STREAM_CHUNK_INTERVAL_MS
+        推送一次新增的文本（done=False），生成结束后推送完整内容（done=True）。
+        任务被取消（阶段切换、房间关闭）时推送已生成的内容并标记 cancelled，结束客户端已打开的流。
+        """
+        stream_id = uuid.uuid4().hex
+        loop = asyncio.get_running_loop()
+        parts: List[str] = []
+        pending: List[str] = []
+        last_sent = None
+
+        try:
+            async for content in reply:
+                parts.append(content)
+                pending.append(content)
+                now = loop.time()
+                if last_sent is None or (now - last_sent) * 1000 >= settings.AI_STREAM_CHUNK_INTERVAL_MS:
+                    await send({**format_data("".join(pending)), "stream_id": stream_id, "done": False})
+                    pending.clear()
+                    last_sent = now
+        except asyncio.CancelledError:
+            if last_sent is not None:
+                await send({**format_data("".join(parts).strip()), "stream_id": stream_id,
+                            "done": True, "cancelled": True})
+            raise
+        except Exception as e:
+            # 已推送部分内容时以已生成的内容结束这条回复
+            if not parts:
+                raise
+            print(f"AI回复生成中断: {str(e)}")
+
+        content = "".join(parts).strip()
+        await send({**format_data(content), "stream_id": stream_id, "done": True})
+        return content
+
+    @staticmethod
+    def _display_name(ai_player) -> str:
+        """与玩家聊天消息一致的显示名称：角色名(昵称)"""
+        if ai_player.character:
+            return f"{ai_player.character.name}({ai_player.user.nickname})"
+        return ai_player.user.nickname
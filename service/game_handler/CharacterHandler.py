@@ -3,21 +3,22 @@ from tortoise.exceptions import DoesNotExist
 
 from model.entity.Scripts import GameRooms, GamePlayers, ScriptCharacters
 from websocket.connection_manager import manager
+from service.RoomActor import RoomState
 from model.ws.notification_types import MessageType, create_message, create_error_message, create_formatted_data
 
 class CharacterHandler:
-    async def handle_select_character(self, room_code: str, user_id: int, data: Dict[str, Any]):
+    async def handle_select_character(self, state: RoomState, user_id: int, data: Dict[str, Any]):
         """处理角色选择"""
         try:
-            room = await GameRooms.get(room_code=room_code)
-            player = await GamePlayers.get(room=room, user_id=user_id).prefetch_related('user')
+            room_code = state.room_code
+            player = state.get_player(user_id)
+            if not player:
+                raise DoesNotExist("player")
             character_id = data.get("character_id")
             
             if character_id:
                 # 检查角色是否已被选择
-                existing_player = await GamePlayers.filter(
-                    room=room, character_id=character_id
-                ).first()
+                existing_player = state.get_player_by_character(character_id)
                 
                 if existing_player and existing_player.user_id != user_id:
                     await manager.send_personal_message(
@@ -27,9 +28,11 @@ class CharacterHandler:
                     return
                 
                 # 分配角色
-                character = await ScriptCharacters.get(id=character_id)
+                character = state.characters.get(character_id)
+                if not character:
+                    raise DoesNotExist("character")
                 player.character = character
-                await player.save()
+                state.defer_write(lambda: player.save(update_fields=["character_id"]))
                 
                 # 通知房间内所有用户
                 await manager.broadcast_to_room(room_code, create_message(MessageType.CHARACTER_SELECTED,
@@ -41,8 +44,8 @@ class CharacterHandler:
                 ))
                 
                 # 广播房间状态更新
-                from ..RoomStatusHandler import room_status_handler
-                await room_status_handler.broadcast_room_status(room_code)
+                from ..RoomStatusBroadcaster import room_status_broadcaster
+                room_status_broadcaster.request_broadcast(room_code)
             
         except DoesNotExist:
             await manager.send_personal_message(
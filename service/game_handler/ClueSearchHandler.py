@@ -1,19 +1,27 @@
 from typing import Dict, Any
-from tortoise.exceptions import DoesNotExist
+from tortoise.exceptions import DoesNotExist, IntegrityError
+from tortoise.expressions import F
+from tortoise.transactions import in_transaction
 
-from model.entity.Scripts import GameRooms, GamePlayers, ScriptClues
+from model.entity.Scripts import GameRooms, GamePlayers, ScriptClues, CharacterStageGoals
 from websocket.connection_manager import manager
+from service.RoomActor import RoomState
 from model.ws.notification_types import MessageType, create_message, create_error_message, create_formatted_data
 from utils.game_log_util import game_log_util
+from service.ScriptContentCache import script_content_cache
+from service.SearchRevealStore import search_reveal_store
 
 class ClueSearchHandler:
-    async def handle_search_script_clue(self, room_code: str, user_id: int, data: Dict[str, Any]):
+    async def handle_search_script_clue(self, state: RoomState, user_id: int, data: Dict[str, Any]):
         """处理搜查线索"""
         try:
-            from model.entity.Scripts import SearchActions, CharacterStageGoals
+            from model.entity.Scripts import SearchActions
             
-            room = await GameRooms.get(room_code=room_code).prefetch_related('current_stage', 'script')
-            player = await GamePlayers.get(room=room, user_id=user_id).prefetch_related('user', 'character')
+            room_code = state.room_code
+            room = state.room
+            player = state.get_player(user_id)
+            if not player:
+                raise DoesNotExist("player")
             
             # 检查房间状态
             if room.status != "搜证中":
@@ -41,9 +49,9 @@ class ClueSearchHandler:
                 return
             
             # 验证线索是否存在且属于当前剧本
-            try:
-                clue = await ScriptClues.get(id=clue_id, script=room.script).prefetch_related('character', 'discovery_stage')
-            except DoesNotExist:
+            content = await script_content_cache.get(room.script_id)
+            clue = content.clues_by_id.get(clue_id)
+            if clue is None:
                 await manager.send_personal_message(
                     create_error_message("线索不存在或不属于当前剧本"), 
                     user_id
@@ -58,24 +66,17 @@ class ClueSearchHandler:
                 )
                 return
             
-            # 检查用户是否已经搜查过这个线索
-            existing_search = await SearchActions.filter(
-                game_player=player,
-                clues_found=clue
-            ).first()
-            
-            if existing_search:
+            # 检查用户是否已经搜查过这个线索（内存中的快速检查，最终以唯一约束为准）
+            reveals = await search_reveal_store.get(room)
+            if reveals.has_found(player.id, clue.id):
                 await manager.send_personal_message(
                     create_error_message("已经搜查过该线索"), 
                     user_id
                 )
                 return
             
-            # 获取当前用户在当前阶段的搜查次数限制
-            stage_goal = await CharacterStageGoals.filter(
-                character=player.character,
-                stage=room.current_stage
-            ).first()
+            # 获取当前用户在当前阶段的搜查次数限制（内存中的快速检查，最终以条件更新为准）
+            stage_goal = content.get_goal(player.character_id, room.current_stage_id)
             
             if not stage_goal or stage_goal.search_attempts <= 0:
                 await manager.send_personal_message(
@@ -86,11 +87,8 @@ class ClueSearchHandler:
             
             # 找到线索的拥有者
             searchable_player = None
-            if clue.character:
-                searchable_player = await GamePlayers.filter(
-                    room=room,
-                    character=clue.character
-                ).first()
+            if clue.character_id:
+                searchable_player = state.get_player_by_character(clue.character_id)
             
             if not searchable_player:
                 await manager.send_personal_message(
@@ -99,18 +97,45 @@ class ClueSearchHandler:
                 )
                 return
             
-            # 创建搜查记录
-            search_action = await SearchActions.create(
-                game_player=player,
-                searchable_player=searchable_player,
-                clues_found=clue,
-                is_public=False,
-                stage=room.current_stage
-            )
+            # 扣减搜查次数并创建搜查记录（同一事务）：
+            # 次数用条件更新扣减（剩余次数大于 0 时才更新），重复搜查由 (玩家, 线索) 唯一约束拦截，
+            # 并发的请求（连续点击、多个服务进程）不会多扣次数或重复记录
+            search_action = None
+            try:
+                async with in_transaction() as connection:
+                    spent = await CharacterStageGoals.filter(
+                        id=stage_goal.id,
+                        search_attempts__gt=0
+                    ).using_db(connection).update(search_attempts=F('search_attempts') - 1)
+                    if spent:
+                        search_action = await SearchActions.create(
+                            game_player=player,
+                            searchable_player=searchable_player,
+                            clues_found=clue,
+                            is_public=False,
+                            stage=room.current_stage,
+                            using_db=connection
+                        )
+            except IntegrityError:
+                # 事务已回滚，搜查次数未扣减；缓存的搜查记录缺少这条记录，下次使用时重新加载
+                search_reveal_store.invalidate(room.id)
+                await manager.send_personal_message(
+                    create_error_message("已经搜查过该线索"), 
+                    user_id
+                )
+                return
+            
+            if search_action is None:
+                stage_goal.search_attempts = 0
+                await manager.send_personal_message(
+                    create_error_message("当前阶段搜查次数已用完"), 
+                    user_id
+                )
+                return
             
-            # 减少搜查次数
+            # 同步缓存中的任务对象和搜查记录
             stage_goal.search_attempts -= 1
-            await stage_goal.save()
+            search_reveal_store.record(room, search_action, clue, room.current_stage)
             
             # 记录搜查日志
             await game_log_util.create_clue_log(
@@ -4,13 +4,16 @@ from tortoise.exceptions import DoesNotExist
 
 from model.entity.Scripts import GameRooms, GamePlayers
 from websocket.connection_manager import manager
+from service.RoomActor import RoomState
+from service.AIResponsePipeline import ai_response_pipeline
 from model.ws.notification_types import MessageType, create_message, create_error_message, create_formatted_data
 
 class GameControlHandler:
-    async def handle_start_game(self, room_code: str, user_id: int, data: Dict[str, Any]):
+    async def handle_start_game(self, state: RoomState, user_id: int, data: Dict[str, Any]):
         """处理开始游戏"""
         try:
-            room = await GameRooms.get(room_code=room_code).prefetch_related('script__stages')
+            room_code = state.room_code
+            room = state.room
             
             # 检查是否是房主
             if room.host_user_id != user_id:
@@ -20,8 +23,17 @@ class GameControlHandler:
                 )
                 return
             
+            # 剧本生成完成前不能开始游戏（角色生成后即可选择角色，但阶段和线索可能尚未保存）
+            from .ScriptGeneratorHandler import script_generator_handler
+            if script_generator_handler.is_generating(room_code):
+                await manager.send_personal_message(
+                    create_error_message("剧本尚未生成完成，请稍候"), 
+                    user_id
+                )
+                return
+            
             # 检查游戏是否可以开始
-            all_players = await GamePlayers.filter(room=room,is_npc = False).prefetch_related('character')
+            all_players = [p for p in state.players.values() if not p.is_npc]
             if not all(p.is_ready and p.character for p in all_players):
                 await manager.send_personal_message(
                     create_error_message("还有玩家未准备好或未选择角色"), 
@@ -34,11 +46,12 @@ class GameControlHandler:
             room.started_at = datetime.now()
             
             # 设置当前阶段为第一阶段
-            first_stage = await room.script.stages.filter(stage_number=1).first()
+            first_stage = state.stages.get(1)
             if first_stage:
                 room.current_stage = first_stage
             
-            await room.save()
+            state.defer_write(lambda: room.save(update_fields=["status", "started_at", "current_stage_id"]))
+            ai_response_pipeline.cancel_stale(room_code, room.current_stage_id)
             
             # 通知所有玩家游戏开始
             await manager.broadcast_to_room(room_code, create_message(MessageType.GAME_STARTED,
@@ -50,8 +63,8 @@ class GameControlHandler:
             ))
             
             # 广播房间状态更新
-            from ..RoomStatusHandler import room_status_handler
-            await room_status_handler.broadcast_room_status(room_code)
+            from ..RoomStatusBroadcaster import room_status_broadcaster
+            room_status_broadcaster.request_broadcast(room_code)
             
         except DoesNotExist:
             await manager.send_personal_message(
@@ -59,10 +72,11 @@ class GameControlHandler:
                 user_id
             )
 
-    async def handle_next_stage(self, room_code: str, user_id: int, data: Dict[str, Any]):
+    async def handle_next_stage(self, state: RoomState, user_id: int, data: Dict[str, Any]):
         """处理进入下一阶段"""
         try:
-            room = await GameRooms.get(room_code=room_code).prefetch_related('script__stages', 'current_stage')
+            room_code = state.room_code
+            room = state.room
             
             # 检查是否是房主
             if room.host_user_id != user_id:
@@ -89,12 +103,14 @@ class GameControlHandler:
             
             # 获取下一阶段
             next_stage_number = room.current_stage.stage_number + 1
-            next_stage = await room.script.stages.filter(stage_number=next_stage_number).first()
+            next_stage = state.stages.get(next_stage_number)
             
             if not next_stage:
                 # 没有下一阶段，游戏结束
                 room.status = "投票中"
-                await room.save()
+                state.defer_write(lambda: room.save(update_fields=["status"]))
+                # 进入投票后不再继续生成中的AI响应
+                ai_response_pipeline.cancel_room(room_code)
                 
                 await manager.broadcast_to_room(room_code, create_message(MessageType.GAME_PHASE_CHANGED,
                     create_formatted_data(
@@ -106,7 +122,9 @@ class GameControlHandler:
             else:
                 # 切换到下一阶段
                 room.current_stage = next_stage
-                await room.save()
+                state.defer_write(lambda: room.save(update_fields=["current_stage_id"]))
+                # 取消上一阶段尚未完成的AI响应
+                ai_response_pipeline.cancel_stale(room_code, room.current_stage_id)
                 
                 await manager.broadcast_to_room(room_code, create_message(MessageType.GAME_PHASE_CHANGED,
                     create_formatted_data(
@@ -117,8 +135,8 @@ class GameControlHandler:
                 ))
             
             # 广播房间状态更新
-            from ..RoomStatusHandler import room_status_handler
-            await room_status_handler.broadcast_room_status(room_code)
+            from ..RoomStatusBroadcaster import room_status_broadcaster
+            room_status_broadcaster.request_broadcast(room_code)
             
         except DoesNotExist:
             await manager.send_personal_message(
@@ -3,21 +3,23 @@ from tortoise.exceptions import DoesNotExist
 
 from model.entity.Scripts import GameRooms, GamePlayers
 from websocket.connection_manager import manager
+from service.RoomActor import RoomState
 from model.ws.notification_types import MessageType, create_message, create_error_message, create_formatted_data
 from utils.game_log_util import game_log_util
 
 class MessageHandler:
-    async def handle_private_message(self, room_code: str, user_id: int, data: Dict[str, Any]):
+    async def handle_private_message(self, state: RoomState, user_id: int, data: Dict[str, Any]):
         """处理私聊消息"""
         try:
-            room = await GameRooms.get(room_code=room_code)
-            sender = await GamePlayers.get(room=room, user_id=user_id).prefetch_related('user')
+            sender = state.get_player(user_id)
             recipient_id = data.get("recipient_id")
-            recipient = await GamePlayers.get(room=room, user_id=recipient_id).prefetch_related('user')
+            recipient = state.get_player(recipient_id)
+            if not sender or not recipient:
+                raise DoesNotExist("player")
             
             # 使用工具类记录私聊日志
             await game_log_util.create_private_chat_log(
-                room=room,
+                room=state.room,
                 sender_player=sender,
                 recipient_player=recipient,
                 content=data.get("message", "")
@@ -40,14 +42,15 @@ class MessageHandler:
                 user_id
             )
 
-    async def handle_player_action(self, room_code: str, user_id: int, data: Dict[str, Any]):
+    async def handle_player_action(self, state: RoomState, user_id: int, data: Dict[str, Any]):
         """处理玩家行动"""
         try:
-            room = await GameRooms.get(room_code=room_code)
-            player = await GamePlayers.get(room=room, user_id=user_id).prefetch_related('user')
+            player = state.get_player(user_id)
+            if not player:
+                raise DoesNotExist("player")
             
             # 广播行动给房间内所有用户
-            await manager.broadcast_to_room(room_code, create_message(MessageType.PLAYER_ACTION,
+            await manager.broadcast_to_room(state.room_code, create_message(MessageType.PLAYER_ACTION,
                 create_formatted_data(
                     message=f"{player.user.nickname} 执行了行动：{data.get('action', '')}",
                     send_id=user_id,
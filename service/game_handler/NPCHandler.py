@@ -3,14 +3,18 @@ from tortoise.exceptions import DoesNotExist
 
 from model.entity.Scripts import GameRooms, GamePlayers, Users, AIConfig
 from websocket.connection_manager import manager
+from service.RoomActor import RoomState
 from model.ws.notification_types import MessageType, create_message, create_error_message, create_formatted_data
 
 class NPCHandler:
-    async def handle_add_npc(self, room_code: str, user_id: int, data: Dict[str, Any]):
+    async def handle_add_npc(self, state: RoomState, user_id: int, data: Dict[str, Any]):
         """处理添加NPC"""
         try:
-            room = await GameRooms.get(room_code=room_code)
-            player = await GamePlayers.get(room=room, user_id=user_id).prefetch_related('user')
+            room_code = state.room_code
+            room = state.room
+            player = state.get_player(user_id)
+            if not player:
+                raise DoesNotExist("player")
             
             # 检查是否是房主
             if room.host_user_id != user_id:
@@ -29,7 +33,7 @@ class NPCHandler:
                 return
             
             # 检查房间是否已满
-            current_player_count = await GamePlayers.filter(room=room).count()
+            current_player_count = len(state.players)
             if current_player_count >= room.max_players:
                 await manager.send_personal_message(
                     create_error_message("房间已满，无法添加NPC"), 
@@ -80,6 +84,8 @@ class NPCHandler:
                 aiconfig=ai_config,
                 is_ready=True  # NPC默认准备就绪
             )
+            # 玩家列表发生变化，重新加载房间状态
+            state.invalidate()
             
             # 通知房间内所有用户NPC已添加
             await manager.broadcast_to_room(room_code, create_message(MessageType.NPC_ADDED,
@@ -91,8 +97,8 @@ class NPCHandler:
             ))
             
             # 广播房间状态更新
-            from ..RoomStatusHandler import room_status_handler
-            await room_status_handler.broadcast_room_status(room_code)
+            from ..RoomStatusBroadcaster import room_status_broadcaster
+            room_status_broadcaster.request_broadcast(room_code)
             
         except DoesNotExist:
             await manager.send_personal_message(
@@ -105,11 +111,14 @@ class NPCHandler:
                 user_id
             )
 
-    async def handle_remove_npc(self, room_code: str, user_id: int, data: Dict[str, Any]):
+    async def handle_remove_npc(self, state: RoomState, user_id: int, data: Dict[str, Any]):
         """处理移除NPC"""
         try:
-            room = await GameRooms.get(room_code=room_code)
-            player = await GamePlayers.get(room=room, user_id=user_id).prefetch_related('user')
+            room_code = state.room_code
+            room = state.room
+            player = state.get_player(user_id)
+            if not player:
+                raise DoesNotExist("player")
             
             # 检查是否是房主
             if room.host_user_id != user_id:
@@ -136,13 +145,8 @@ class NPCHandler:
                 return
             
             # 查找要移除的NPC
-            try:
-                npc_player = await GamePlayers.get(
-                    id=player_id,
-                    room=room, 
-                    is_npc=True
-                ).prefetch_related('user')
-            except DoesNotExist:
+            npc_player = state.get_player_by_id(player_id)
+            if not npc_player or not npc_player.is_npc:
                 await manager.send_personal_message(
                     create_error_message("NPC不存在或不属于该房间"), 
                     user_id
@@ -153,6 +157,7 @@ class NPCHandler:
             
             # 移除NPC
             await npc_player.delete()
+            state.invalidate()
             
             # 通知房间内所有用户NPC已移除
             await manager.broadcast_to_room(room_code, create_message(MessageType.NPC_REMOVED,
@@ -164,8 +169,8 @@ class NPCHandler:
             ))
             
             # 广播房间状态更新
-            from ..RoomStatusHandler import room_status_handler
-            await room_status_handler.broadcast_room_status(room_code)
+            from ..RoomStatusBroadcaster import room_status_broadcaster
+            room_status_broadcaster.request_broadcast(room_code)
             
         except DoesNotExist:
             await manager.send_personal_message(
@@ -3,14 +3,18 @@ from tortoise.exceptions import DoesNotExist
 
 from model.entity.Scripts import GameRooms, GamePlayers
 from websocket.connection_manager import manager
+from service.RoomActor import RoomState
 from model.ws.notification_types import MessageType, create_message, create_error_message, create_formatted_data
 
 class RoomSettingsHandler:
-    async def handle_update_room_settings(self, room_code: str, user_id: int, data: Dict[str, Any]):
+    async def handle_update_room_settings(self, state: RoomState, user_id: int, data: Dict[str, Any]):
         """处理房间设置更新"""
         try:
-            room = await GameRooms.get(room_code=room_code)
-            player = await GamePlayers.get(room=room, user_id=user_id).prefetch_related('user')
+            room_code = state.room_code
+            room = state.room
+            player = state.get_player(user_id)
+            if not player:
+                raise DoesNotExist("player")
             
             # 检查是否是房主
             if room.host_user_id != user_id:
@@ -42,7 +46,7 @@ class RoomSettingsHandler:
                 current_settings["duration_mins"] = data["duration_mins"]
             
             room.game_setting = current_settings
-            await room.save()
+            state.defer_write(lambda: room.save(update_fields=["game_setting", "ai_dm_personality"]))
             
             # 广播设置更新给房间内所有用户
             await manager.broadcast_to_room(room_code, create_message(MessageType.ROOM_SETTINGS_UPDATED,
@@ -54,8 +58,8 @@ class RoomSettingsHandler:
             ))
             
             # 广播房间状态更新
-            from ..RoomStatusHandler import room_status_handler
-            await room_status_handler.broadcast_room_status(room_code)
+            from ..RoomStatusBroadcaster import room_status_broadcaster
+            room_status_broadcaster.request_broadcast(room_code)
             
         except DoesNotExist:
             await manager.send_personal_message(
@@ -1,17 +1,28 @@
-from typing import Dict, Any
-import asyncio
+from typing import Dict, Any, Optional
+from datetime import datetime
 from tortoise.exceptions import DoesNotExist
 
-from model.entity.Scripts import GameRooms, GamePlayers
+from model.entity.Scripts import GameRooms, GamePlayers, Scripts, ScriptGenerationJobs
 from websocket.connection_manager import manager
+from service.RoomActor import RoomState, room_actor_registry
+from service.ScriptContentCache import script_content_cache
 from model.ws.notification_types import MessageType, create_message, create_error_message, create_formatted_data
+from utils.json_section_scanner import JsonSectionScanner
+from utils.script_importer import ScriptImporter, SCRIPT_SECTIONS
 
 class ScriptGeneratorHandler:
-    async def handle_generate_script(self, room_code: str, user_id: int, data: Dict[str, Any] = None):
+    def __init__(self):
+        # 正在生成剧本的房间
+        self._generating = set()
+
+    async def handle_generate_script(self, state: RoomState, user_id: int, data: Dict[str, Any] = None):
         """处理剧本生成请求"""
         try:
-            room = await GameRooms.get(room_code=room_code)
-            player = await GamePlayers.get(room=room, user_id=user_id).prefetch_related('user')
+            room_code = state.room_code
+            room = state.room
+            player = state.get_player(user_id)
+            if not player:
+                raise DoesNotExist("player")
             
             # 检查是否是房主
             if room.host_user_id != user_id:
@@ -55,39 +66,97 @@ class ScriptGeneratorHandler:
                     )
                     return
                 
-            room.status = "生成剧本中"
-            await room.save()
+            # 剧本池中有参数匹配的预生成剧本时直接领取
+            from service.ScriptPool import script_pool
+            script_id = await script_pool.claim(game_setting, room.max_players, user_id)
+            if script_id:
+                await self._assign_pooled_script(room, user_id, script_id)
+                return
             
-            # 通知房间内所有用户剧本生成开始
-            await manager.broadcast_to_room(room_code, create_message(MessageType.SCRIPT_GENERATION_STARTED,
-                create_formatted_data(
-                    message=f"{player.user.nickname} 开始生成剧本...",
-                    send_id=None,
-                    send_nickname="系统"
+            # 同一房主排队的任务过多时拒绝，避免大量房间同时生成剧本占满模型额度
+            from service.ScriptGenerationQueue import script_generation_queue
+            if not script_generation_queue.can_submit(user_id):
+                await manager.send_personal_message(
+                    create_error_message("排队中的剧本生成任务过多，请稍后再试"), 
+                    user_id
                 )
-            ))
+                return
+                
+            room.status = "生成剧本中"
+            await room.save(update_fields=["status"])
+            
+            # 提交到剧本生成任务队列，由后台工作协程执行
+            job = await script_generation_queue.submit(room, user_id, game_setting)
+            
+            # 通知房间内所有用户剧本生成开始（附带任务ID，可通过任务接口查询进度或取消）
+            started = create_formatted_data(
+                message=f"{player.user.nickname} 开始生成剧本...",
+                send_id=None,
+                send_nickname="系统"
+            )
+            started["job_id"] = job.id
+            await manager.broadcast_to_room(room_code, create_message(MessageType.SCRIPT_GENERATION_STARTED, started))
             
             from websocket.websocket_routes import broadcast_room_status
             await broadcast_room_status(room_code)
             
-            # 异步调用剧本生成API
-            asyncio.create_task(self._generate_script_async(room_code, user_id, room.game_setting))
-            
         except DoesNotExist:
             await manager.send_personal_message(
                 create_error_message("房间或用户不存在"), 
                 user_id
             )
 
-    async def _generate_script_async(self, room_code: str, user_id: int, data: Dict[str, Any]):
-        """异步生成剧本"""
+    async def _assign_pooled_script(self, room: GameRooms, user_id: int, script_id: int):
+        """使用剧本池中的剧本，房间直接进入选择角色"""
+        room.script_id = script_id
+        room.status = "选择角色"
+        await room.save(update_fields=["script_id", "status"])
+        # 记录为已完成的任务，便于查询和统计各参数的请求次数
+        now = datetime.now()
+        await ScriptGenerationJobs.create(
+            room=room,
+            host_user_id=user_id,
+            game_setting=room.game_setting,
+            status="已完成",
+            progress=len(SCRIPT_SECTIONS),
+            script_id=script_id,
+            from_pool=True,
+            started_at=now,
+            finished_at=now
+        )
+        # 剧本、角色和阶段已变化，重新加载房间状态
+        room_actor_registry.invalidate(room.room_code)
+        
+        script = await Scripts.get(id=script_id)
+        await manager.broadcast_to_room(room.room_code, create_message(MessageType.SCRIPT_GENERATION_COMPLETED,
+            create_formatted_data(
+                message=f"剧本生成完成：{script.title}",
+                send_id=None,
+                send_nickname="系统"
+            )
+        ))
+        
+        from websocket.websocket_routes import broadcast_room_status
+        await broadcast_room_status(room.room_code)
+
+    def is_generating(self, room_code: str) -> bool:
+        """房间是否正在生成剧本"""
+        return room_code in self._generating
+
+    async def generate_script(self, job: ScriptGenerationJobs) -> int:
+        """执行剧本生成任务：边生成边保存，角色保存后即可开始选择角色
+
+        失败或被取消时删除已保存的部分剧本并重新抛出异常，由任务队列决定重试还是结束任务。
+        """
+        # 导入剧本生成相关模块
+        from utils.scripts_util import create_user_prompt, stream_ai_api
+        
+        data = job.game_setting
+        room = await GameRooms.get(id=job.room_id)
+        room_code = room.room_code
+        importer = None
+        self._generating.add(room_code)
         try:
-            # 导入剧本生成相关模块
-            from utils.scripts_util import call_ai_api, parse_and_save_script, create_user_prompt
-            
-            # 获取房间信息
-            room = await GameRooms.get(room_code=room_code)
-            
             # 创建用户提示词
             user_prompt = create_user_prompt(
                 data["theme"],
@@ -97,65 +166,135 @@ class ScriptGeneratorHandler:
                 data["duration_mins"]
             )
             
-            # 调用 AI 接口生成剧本
-            ai_response = await call_ai_api(user_prompt)
+            # 调用 AI 接口生成剧本，每个顶层字段生成完毕后立即保存
+            importer = ScriptImporter(job.host_user_id, room.max_players, data["duration_mins"])
+            scanner = JsonSectionScanner()
+            # 读完整个响应（根对象之后的内容会被忽略），完整的响应才会写入模型响应缓存
+            async for content in stream_ai_api(user_prompt):
+                for name, section in scanner.feed(content):
+                    if await importer.add_section(name, section):
+                        await self._on_section_saved(room, importer, name, job)
+            script_id = await importer.finish()
             
-            # 从文件读取AI响应用于测试
-            try:
-                with open("test.json", "r", encoding="utf-8") as f:
-                    ai_response = f.read()
-            except FileNotFoundError:
-                raise Exception("test.json文件不存在")
-            except Exception as e:
-                raise Exception(f"读取test.json文件失败: {str(e)}")
-                
-            # 解析并保存到数据库
-            script_id = await parse_and_save_script(ai_response, user_id, room.max_players, data["duration_mins"])
-            
-            # 将剧本关联到房间
+            # 剧本全部保存后开放选择角色（角色先生成时已提前开放）
             room.script_id = script_id
             room.status = "选择角色"
-            await room.save()
-            
-            # 获取生成的剧本信息
-            from model.entity.Scripts import Scripts
-            script = await Scripts.get(id=script_id).prefetch_related('characters')
+            await room.save(update_fields=["script_id", "status"])
+            # 剧本、角色和阶段已变化，重新加载房间状态
+            room_actor_registry.invalidate(room_code)
             
             # 通知房间内所有用户剧本生成完成
             await manager.broadcast_to_room(room_code, create_message(MessageType.SCRIPT_GENERATION_COMPLETED,
                 create_formatted_data(
-                    message=f"剧本生成完成：{script.title}",
+                    message=f"剧本生成完成：{importer.script.title}",
                     send_id=None,
                     send_nickname="系统"
                 )
             ))
             
             # 广播房间状态更新
-            from ..RoomStatusHandler import room_status_handler
-            await room_status_handler.broadcast_room_status(room_code)
+            from ..RoomStatusBroadcaster import room_status_broadcaster
+            room_status_broadcaster.request_broadcast(room_code)
+            return script_id
             
-        except Exception as e:
-            # 剧本生成失败时恢复房间状态
-            print(f"剧本生成失败: {str(e)}")
-            try:
-                room = await GameRooms.get(room_code=room_code)
-                room.status = "等待中"
-                await room.save()
-            except:
-                pass
-                
-            # 通知房间内所有用户剧本生成失败
-            await manager.broadcast_to_room(room_code, create_message(MessageType.SCRIPT_GENERATION_FAILED,
-                create_formatted_data(
-                    message=f"剧本生成失败：{str(e)}",
-                    send_id=None,
-                    send_nickname="系统"
-                )
-            ))
-            
-            # 广播房间状态更新
-            from ..RoomStatusHandler import room_status_handler
-            await room_status_handler.broadcast_room_status(room_code)
+        except BaseException as e:
+            # 删除部分剧本，房间回到生成剧本中
+            print(f"剧本生成中断: {str(e) or type(e).__name__}")
+            if importer and importer.script_id:
+                try:
+                    await self.discard_partial(job.room_id, importer.script_id)
+                except Exception as reset_error:
+                    print(f"删除部分剧本失败: {str(reset_error)}")
+            raise
+        finally:
+            self._generating.discard(room_code)
+
+    async def discard_partial(self, room_id: int, script_id: Optional[int] = None):
+        """删除生成了一部分的剧本，房间回到生成剧本中状态（等待重试）"""
+        room = await GameRooms.get_or_none(id=room_id)
+        if room is None:
+            return
+        script_id = script_id or room.script_id
+        # 先让房间处理器中已登记的写入（如选择角色）落库
+        await room_actor_registry.flush(room.room_code)
+        # 角色即将被删除，先清除玩家的角色选择
+        await GamePlayers.filter(room_id=room.id).update(character_id=None, is_ready=False)
+        room.script_id = None
+        room.status = "生成剧本中"
+        await room.save(update_fields=["script_id", "status"])
+        room_actor_registry.invalidate(room.room_code)
+        if script_id:
+            # 级联删除阶段、角色、线索等
+            await Scripts.filter(id=script_id).delete()
+            script_content_cache.invalidate(script_id)
+
+    async def notify_retry(self, room_id: int, reason: str):
+        """通知房间剧本生成失败，正在重新生成"""
+        room = await GameRooms.get_or_none(id=room_id)
+        if room is None:
+            return
+        progress = create_formatted_data(
+            message=f"剧本生成失败，正在重新生成：{reason}",
+            send_id=None,
+            send_nickname="系统"
+        )
+        progress.update(section=None, completed=0, total=len(SCRIPT_SECTIONS))
+        await manager.broadcast_to_room(room.room_code, create_message(MessageType.SCRIPT_GENERATION_PROGRESS, progress))
+        
+        from ..RoomStatusBroadcaster import room_status_broadcaster
+        room_status_broadcaster.request_broadcast(room.room_code)
+
+    async def fail_generation(self, room_id: int, message: str):
+        """剧本生成任务结束（失败或取消）：房间恢复到等待中并通知房间内用户"""
+        room = await GameRooms.get_or_none(id=room_id)
+        if room is None or room.status != "生成剧本中":
+            return
+        room.script_id = None
+        room.status = "等待中"
+        await room.save(update_fields=["script_id", "status"])
+        room_actor_registry.invalidate(room.room_code)
+        
+        # 通知房间内所有用户剧本生成失败
+        await manager.broadcast_to_room(room.room_code, create_message(MessageType.SCRIPT_GENERATION_FAILED,
+            create_formatted_data(
+                message=message,
+                send_id=None,
+                send_nickname="系统"
+            )
+        ))
+        
+        # 广播房间状态更新
+        from ..RoomStatusBroadcaster import room_status_broadcaster
+        room_status_broadcaster.request_broadcast(room.room_code)
+
+    async def _on_section_saved(self, room: GameRooms, importer: ScriptImporter, name: str,
+                                job: ScriptGenerationJobs):
+        """剧本的一个字段保存后：关联剧本、开放选择角色并通知进度"""
+        room_code = room.room_code
+        update_fields = []
+        if importer.script_id and room.script_id != importer.script_id:
+            room.script_id = importer.script_id
+            update_fields.append("script_id")
+        if importer.has_saved("characters") and room.status == "生成剧本中":
+            room.status = "选择角色"
+            update_fields.append("status")
+        if update_fields:
+            await room.save(update_fields=update_fields)
+            room_actor_registry.invalidate(room_code)
+        
+        completed = len(importer.received)
+        await ScriptGenerationJobs.filter(id=job.id).update(progress=completed, script_id=importer.script_id)
+        
+        progress = create_formatted_data(
+            message=f"剧本生成进度：{SCRIPT_SECTIONS[name]}已生成（{completed}/{len(SCRIPT_SECTIONS)}）",
+            send_id=None,
+            send_nickname="系统"
+        )
+        progress.update(section=name, completed=completed, total=len(SCRIPT_SECTIONS))
+        await manager.broadcast_to_room(room_code, create_message(MessageType.SCRIPT_GENERATION_PROGRESS, progress))
+        
+        from ..RoomStatusBroadcaster import room_status_broadcaster
+        room_status_broadcaster.request_broadcast(room_code)
 
 # 全局剧本生成处理器实例
 script_generator_handler = ScriptGeneratorHandler()
@@ -3,13 +3,15 @@ from tortoise.exceptions import DoesNotExist
 
 from model.entity.Scripts import GameRooms
 from websocket.connection_manager import manager
+from service.RoomActor import RoomState
 from model.ws.notification_types import MessageType, create_message, create_error_message, create_formatted_data
 
 class SearchHandler:
-    async def handle_search_begin(self, room_code: str, user_id: int, data: Dict[str, Any]):
+    async def handle_search_begin(self, state: RoomState, user_id: int, data: Dict[str, Any]):
         """处理开始搜证"""
         try:
-            room = await GameRooms.get(room_code=room_code).prefetch_related('script__stages')
+            room_code = state.room_code
+            room = state.room
             
             # 检查是否是房主
             if room.host_user_id != user_id:
@@ -21,7 +23,7 @@ class SearchHandler:
             
             # 开始搜证
             room.status = "搜证中"
-            await room.save()
+            state.defer_write(lambda: room.save(update_fields=["status"]))
             
             # 通知所有玩家搜证开始
             await manager.broadcast_to_room(room_code, create_message(MessageType.GAME_STARTED,
@@ -33,8 +35,8 @@ class SearchHandler:
             ))
             
             # 广播房间状态更新
-            from ..RoomStatusHandler import room_status_handler
-            await room_status_handler.broadcast_room_status(room_code)
+            from ..RoomStatusBroadcaster import room_status_broadcaster
+            room_status_broadcaster.request_broadcast(room_code)
             
         except DoesNotExist:
             await manager.send_personal_message(
@@ -42,10 +44,11 @@ class SearchHandler:
                 user_id
             )
 
-    async def handle_search_end(self, room_code: str, user_id: int, data: Dict[str, Any]):
+    async def handle_search_end(self, state: RoomState, user_id: int, data: Dict[str, Any]):
         """处理结束搜证"""
         try:
-            room = await GameRooms.get(room_code=room_code).prefetch_related('script__stages')
+            room_code = state.room_code
+            room = state.room
             
             # 检查是否是房主
             if room.host_user_id != user_id:
@@ -57,7 +60,7 @@ class SearchHandler:
             
             # 结束搜证
             room.status = "进行中"
-            await room.save()
+            state.defer_write(lambda: room.save(update_fields=["status"]))
             
             # 通知所有玩家搜证结束
             await manager.broadcast_to_room(room_code, create_message(MessageType.GAME_STARTED,
@@ -69,8 +72,8 @@ class SearchHandler:
             ))
             
             # 广播房间状态更新
-            from ..RoomStatusHandler import room_status_handler
-            await room_status_handler.broadcast_room_status(room_code)
+            from ..RoomStatusBroadcaster import room_status_broadcaster
+            room_status_broadcaster.request_broadcast(room_code)
             
         except DoesNotExist:
             await manager.send_personal_message(
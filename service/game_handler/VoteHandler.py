@@ -1,16 +1,21 @@
 from typing import Dict, Any
 from datetime import datetime
+from tortoise import timezone
 from tortoise.exceptions import DoesNotExist
 
-from model.entity.Scripts import GameRooms, GamePlayers
+from model.entity.Scripts import GameRooms, GamePlayers, GameVotes
 from websocket.connection_manager import manager
+from service.RoomActor import RoomState
+from service.AIResponsePipeline import ai_response_pipeline
+from service.VoteTallyStore import vote_tally_store
 from model.ws.notification_types import MessageType, create_message, create_error_message, create_formatted_data
 
 class VoteHandler:
-    async def handle_start_vote(self, room_code: str, user_id: int, data: Dict[str, Any]):
+    async def handle_start_vote(self, state: RoomState, user_id: int, data: Dict[str, Any]):
         """处理开启投票"""
         try:
-            room = await GameRooms.get(room_code=room_code)
+            room_code = state.room_code
+            room = state.room
             
             # 检查是否是房主
             if room.host_user_id != user_id:
@@ -30,11 +35,13 @@ class VoteHandler:
             
             # 将房间状态改为投票中
             room.status = "投票中"
-            await room.save()
+            state.defer_write(lambda: room.save(update_fields=["status"]))
+            # 进入投票后不再继续生成中的AI响应
+            ai_response_pipeline.cancel_room(room_code)
             
             # 清除之前的投票记录
-            from model.entity.Scripts import GameVotes
-            await GameVotes.filter(room=room).delete()
+            vote_tally_store.reset(room.id)
+            state.defer_write(lambda: GameVotes.filter(room_id=room.id).delete())
             
             # 通知所有玩家投票开始
             await manager.broadcast_to_room(room_code, create_message(MessageType.VOTE_STARTED,
@@ -46,8 +53,8 @@ class VoteHandler:
             ))
             
             # 广播房间状态更新
-            from ..RoomStatusHandler import room_status_handler
-            await room_status_handler.broadcast_room_status(room_code)
+            from ..RoomStatusBroadcaster import room_status_broadcaster
+            room_status_broadcaster.request_broadcast(room_code)
             
         except DoesNotExist:
             await manager.send_personal_message(
@@ -55,10 +62,11 @@ class VoteHandler:
                 user_id
             )
 
-    async def handle_end_vote(self, room_code: str, user_id: int, data: Dict[str, Any]):
+    async def handle_end_vote(self, state: RoomState, user_id: int, data: Dict[str, Any]):
         """处理结束投票"""
         try:
-            room = await GameRooms.get(room_code=room_code)
+            room_code = state.room_code
+            room = state.room
             
             # 检查是否是房主
             if room.host_user_id != user_id:
@@ -79,32 +87,17 @@ class VoteHandler:
             # 将房间状态改为已结束
             room.status = "已结束"
             room.finished_at = datetime.now()
-            await room.save()
-            
-            # 统计投票结果
-            from model.entity.Scripts import GameVotes
-            votes = await GameVotes.filter(room=room).prefetch_related(
-                'voter_game_player__user', 'voted_game_player__user', 'voted_game_player__character'
-            ).all()
-            
-            # 计算得票数
-            vote_counts = {}
-            for vote in votes:
-                voted_user_id = vote.voted_game_player.user.id
-                if voted_user_id not in vote_counts:
-                    vote_counts[voted_user_id] = {
-                        "user_id": voted_user_id,
-                        "nickname": vote.voted_game_player.user.nickname,
-                        "character_name": vote.voted_game_player.character.name if vote.voted_game_player.character else "未知",
-                        "vote_count": 0
-                    }
-                vote_counts[voted_user_id]["vote_count"] += 1
-            
-            # 找到得票最多的玩家
+            state.defer_write(lambda: room.save(update_fields=["status", "finished_at"]))
+            
+            # 得票最多的玩家（投票时已增量计数；计数被淘汰时先等投票写入落库再加载）
+            tally = await vote_tally_store.get(room.id, state.flush)
+            leader = tally.leader()
+            voted_player = state.get_player_by_id(leader[0]) if leader else None
+            
             result_message = "投票结束！"
-            if vote_counts:
-                max_voted = max(vote_counts.values(), key=lambda x: x["vote_count"])
-                result_message += f" {max_voted['character_name']}({max_voted['nickname']}) 获得最多票数 {max_voted['vote_count']} 票。"
+            if voted_player:
+                character_name = voted_player.character.name if voted_player.character else "未知"
+                result_message += f" {character_name}({voted_player.user.nickname}) 获得最多票数 {leader[1]} 票。"
             else:
                 result_message += " 没有人投票。"
             
@@ -118,8 +111,8 @@ class VoteHandler:
             ))
             
             # 广播房间状态更新
-            from ..RoomStatusHandler import room_status_handler
-            await room_status_handler.broadcast_room_status(room_code)
+            from ..RoomStatusBroadcaster import room_status_broadcaster
+            room_status_broadcaster.request_broadcast(room_code)
             
         except DoesNotExist:
             await manager.send_personal_message(
@@ -127,13 +120,14 @@ class VoteHandler:
                 user_id
             )
 
-    async def handle_game_vote(self, room_code: str, user_id: int, data: Dict[str, Any]):
+    async def handle_game_vote(self, state: RoomState, user_id: int, data: Dict[str, Any]):
         """处理游戏投票"""
         try:
-            from model.entity.Scripts import GameVotes
-            
-            room = await GameRooms.get(room_code=room_code).prefetch_related('current_stage')
-            voter_player = await GamePlayers.get(room=room, user_id=user_id).prefetch_related('user', 'character')
+            room_code = state.room_code
+            room = state.room
+            voter_player = state.get_player(user_id)
+            if not voter_player:
+                raise DoesNotExist("player")
             
             # ...existing validation code...
             if room.status != "投票中":
@@ -165,9 +159,8 @@ class VoteHandler:
                 )
                 return
             
-            try:
-                voted_player = await GamePlayers.get(room=room, user_id=voted_user_id).prefetch_related('user', 'character')
-            except DoesNotExist:
+            voted_player = state.get_player(voted_user_id)
+            if not voted_player:
                 await manager.send_personal_message(
                     create_error_message("被投票的用户不在房间中"), 
                     user_id
@@ -182,31 +175,35 @@ class VoteHandler:
                 return
             
             # 检查用户是否已经投过票
-            existing_vote = await GameVotes.filter(
-                room=room,
-                voter_game_player=voter_player
-            ).prefetch_related('voted_game_player').first()
-            
-            if existing_vote:
-                if existing_vote.voted_game_player.user_id == voted_user_id:
-                    await manager.send_personal_message(
-                        create_error_message("您已经投票给该玩家"), 
-                        user_id
-                    )
-                    return
-                else:
-                    existing_vote.voted_game_player = voted_player
-                    existing_vote.timestamp = datetime.now()
-                    await existing_vote.save()
-                    
-                    vote_message = f"{voter_player.character.name}({voter_player.user.nickname}) 更改投票给 {voted_player.character.name}({voted_player.user.nickname})"
-            else:
-                await GameVotes.create(
-                    room=room,
-                    stage=room.current_stage,
-                    voter_game_player=voter_player,
-                    voted_game_player=voted_player
+            tally = await vote_tally_store.get(room.id, state.flush)
+            existing_voted_id = tally.get(voter_player.id)
+            if existing_voted_id == voted_player.id:
+                await manager.send_personal_message(
+                    create_error_message("您已经投票给该玩家"), 
+                    user_id
                 )
+                return
+            
+            # 投票或改票（增量更新得票数）
+            voted_at = timezone.now()
+            tally.cast(voter_player.id, voted_player.id, voted_at)
+            
+            if existing_voted_id is not None:
+                state.defer_write(lambda: GameVotes.filter(
+                    room_id=room.id,
+                    voter_game_player_id=voter_player.id
+                ).update(voted_game_player_id=voted_player.id, timestamp=voted_at))
+                
+                vote_message = f"{voter_player.character.name}({voter_player.user.nickname}) 更改投票给 {voted_player.character.name}({voted_player.user.nickname})"
+            else:
+                stage_id = room.current_stage_id
+                state.defer_write(lambda: GameVotes.create(
+                    room_id=room.id,
+                    stage_id=stage_id,
+                    voter_game_player_id=voter_player.id,
+                    voted_game_player_id=voted_player.id,
+                    timestamp=voted_at
+                ))
                 
                 vote_message = f"{voter_player.character.name}({voter_player.user.nickname}) 投票给 {voted_player.character.name}({voted_player.user.nickname})"
             
@@ -219,9 +216,9 @@ class VoteHandler:
                 )
             ))
             
-            if await GamePlayers.filter(room=room).count() ==  await GameVotes.filter(room=room).count():
+            if len(state.players) == len(tally):
                 room.status = "已结束"
-                await room.save()
+                state.defer_write(lambda: room.save(update_fields=["status"]))
 
                 await manager.broadcast_to_room(room_code, create_message(MessageType.VOTE_ENDED,
                     create_formatted_data(
@@ -232,8 +229,8 @@ class VoteHandler:
                 ))
                 
             # 广播房间状态更新
-            from ..RoomStatusHandler import room_status_handler
-            await room_status_handler.broadcast_room_status(room_code)
+            from ..RoomStatusBroadcaster import room_status_broadcaster
+            room_status_broadcaster.request_broadcast(room_code)
             
         except DoesNotExist:
             await manager.send_personal_message(
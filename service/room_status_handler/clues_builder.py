@@ -1,8 +1,11 @@
-from typing import Dict, List, Any
-from model.entity.Scripts import GameRooms, ScriptClues
+from typing import Dict, List, Any, Optional
+from model.entity.Scripts import GameRooms
+from .shared_builder import build_clue_entry
+from ..ScriptContentCache import script_content_cache
+from ..SearchRevealStore import search_reveal_store
 
-async def build_clues_info(room: GameRooms, user_id: int) -> Dict[str, List[Dict[str, Any]]]:
-    """构建线索信息（包含当前阶段及之前所有阶段的线索）"""
+async def build_clues_info(room: GameRooms, user_id: int, shared: Optional[Dict[str, Any]] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """构建线索信息（包含当前阶段及之前所有阶段的线索，传入广播共享数据时不再查询数据库）"""
     if not room.current_stage or not room.script:
         return {"public": [], "private": [], "searched": [], "public_by_stage": {}, "private_by_stage": {}, "searched_by_stage": {}}
     
@@ -16,70 +19,60 @@ async def build_clues_info(room: GameRooms, user_id: int) -> Dict[str, List[Dict
                 current_character = player.character
             break
     
-    # 获取当前阶段及之前所有阶段的公开线索
-    public_clues = await ScriptClues.filter(
-        script=room.script,
-        discovery_stage__stage_number__lte=room.current_stage.stage_number,
-        is_public=True
-    ).prefetch_related('discovery_stage').order_by('discovery_stage__stage_number').all()
+    if shared is not None and "script_content" in shared:
+        # 公开线索已在共享数据中构建
+        content = shared["script_content"]
+        public_clues = None
+    else:
+        content = await script_content_cache.get(room.script_id)
+        # 当前阶段及之前所有阶段的公开线索
+        public_clues = content.public_clues_up_to(room.current_stage.stage_number)
     
-    # 获取当前用户在当前阶段及之前所有阶段的私有线索
+    # 当前用户在当前阶段及之前所有阶段的私有线索
     private_clues = []
     if current_character:
-        private_clues = await ScriptClues.filter(
-            script=room.script,
-            discovery_stage__stage_number__lte=room.current_stage.stage_number,
-            is_public=False,
-            character=current_character
-        ).prefetch_related('discovery_stage').order_by('discovery_stage__stage_number').all()
+        private_clues = content.private_clues_up_to(current_character.id, room.current_stage.stage_number)
     
     # 获取搜查到的线索
     searched_clues = []
     searched_public_clues = []
     if current_player:
-        from model.entity.Scripts import SearchActions
+        # 获取当前用户进行的搜查记录
+        if shared is not None and "search_reveals" in shared:
+            reveals = shared["search_reveals"]
+        else:
+            reveals = await search_reveal_store.get(room)
+        players_by_id = {player.id: player for player in room.players}
         
-        # 获取当前用户进行的搜查行动
-        search_actions = await SearchActions.filter(
-            game_player=current_player,
-            stage__stage_number__lte=room.current_stage.stage_number
-        ).prefetch_related('clues_found', 'clues_found__discovery_stage', 'stage','searchable_player__character').order_by('stage__stage_number').all()
-        
-        for action in search_actions:
-            if action.clues_found:
-                clue_info = {
-                    "id": action.clues_found.id,
-                    "name": action.clues_found.name,
-                    "description": action.clues_found.description,
-                    "image_url": action.clues_found.image_url,
-                    "discovery_location": action.clues_found.discovery_location,
-                    "discovery_stage": action.stage.name if action.stage else "未知阶段",
-                    "stage_number": action.stage.stage_number if action.stage else 0,
-                    "searched_from": action.searchable_player.character.name if action.searchable_player else "未知",
-                    "is_public_search": action.is_public
-                }
-                
-                searched_clues.append(clue_info)
-                
-                # 如果搜查线索是公开的，也添加到公开线索中
-                if action.is_public:
-                    searched_public_clues.append(clue_info)
+        for reveal in reveals.reveals_up_to(current_player.id, room.current_stage.stage_number):
+            searchable_player = players_by_id.get(reveal.searchable_player_id)
+            if not searchable_player:
+                # 被搜查的玩家已离开房间（其搜查记录随之删除）
+                continue
+            clue = reveal.clue
+            clue_info = {
+                "id": clue.id,
+                "name": clue.name,
+                "description": clue.description,
+                "image_url": clue.image_url,
+                "discovery_location": clue.discovery_location,
+                "discovery_stage": reveal.stage_name,
+                "stage_number": reveal.stage_number,
+                "searched_from": searchable_player.character.name,
+                "is_public_search": reveal.is_public
+            }
+            
+            searched_clues.append(clue_info)
+            
+            # 如果搜查线索是公开的，也添加到公开线索中
+            if reveal.is_public:
+                searched_public_clues.append(clue_info)
     
     # 合并公开线索和搜查出的公开线索
-    all_public_clues = []
-    
-    # 添加原始公开线索
-    for clue in public_clues:
-        all_public_clues.append({
-            "id": clue.id,
-            "name": clue.name,
-            "description": clue.description,
-            "image_url": clue.image_url,
-            "discovery_location": clue.discovery_location,
-            "discovery_stage": clue.discovery_stage.name if clue.discovery_stage else "未知阶段",
-            "stage_number": clue.discovery_stage.stage_number if clue.discovery_stage else 0,
-            "source": "script"  # 标记来源为剧本
-        })
+    if public_clues is None:
+        all_public_clues = list(shared["public_clues"])
+    else:
+        all_public_clues = [build_clue_entry(clue) for clue in public_clues]
     
     # 添加搜查出的公开线索
     for clue in searched_public_clues:
@@ -87,18 +80,7 @@ async def build_clues_info(room: GameRooms, user_id: int) -> Dict[str, List[Dict
         all_public_clues.append(clue)
     
     # 构建私有线索信息
-    private_clues_flat = []
-    for clue in private_clues:
-        private_clues_flat.append({
-            "id": clue.id,
-            "name": clue.name,
-            "description": clue.description,
-            "image_url": clue.image_url,
-            "discovery_location": clue.discovery_location,
-            "discovery_stage": clue.discovery_stage.name if clue.discovery_stage else "未知阶段",
-            "stage_number": clue.discovery_stage.stage_number if clue.discovery_stage else 0,
-            "source": "script"
-        })
+    private_clues_flat = [build_clue_entry(clue) for clue in private_clues]
     
     # 按阶段分组公开线索
     public_clues_by_stage = {}
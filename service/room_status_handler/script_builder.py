@@ -1,5 +1,5 @@
 from typing import Dict, Any
-from model.entity.Scripts import ScriptStages
+from ..ScriptContentCache import script_content_cache
 
 async def build_script_info(script) -> Dict[str, Any]:
     """构建剧本基础信息"""
@@ -7,7 +7,8 @@ async def build_script_info(script) -> Dict[str, Any]:
         return None
     
     # 获取剧本的总阶段数
-    total_stages = await ScriptStages.filter(script=script).count()
+    content = await script_content_cache.get(script.id)
+    total_stages = len(content.stages)
     
     return {
         "id": script.id,
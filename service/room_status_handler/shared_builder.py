@@ -0,0 +1,82 @@
+from typing import Dict, Any, List
+from model.entity.Scripts import GameRooms, ScriptClues, ScriptTimeline
+
+from .script_builder import build_script_info
+from .players_builder import build_players_info
+from .characters_builder import build_characters_info
+from .voting_builder import build_voting_info
+from ..ScriptContentCache import script_content_cache
+from ..SearchRevealStore import search_reveal_store
+
+# 需要剧情数据（时间线、阶段、线索）的房间状态
+GAME_PHASES = ["进行中", "搜证中", "投票中", "已结束"]
+
+
+def build_clue_entry(clue: ScriptClues) -> Dict[str, Any]:
+    """构建剧本线索的展示信息"""
+    return {
+        "id": clue.id,
+        "name": clue.name,
+        "description": clue.description,
+        "image_url": clue.image_url,
+        "discovery_location": clue.discovery_location,
+        "discovery_stage": clue.discovery_stage.name if clue.discovery_stage else "未知阶段",
+        "stage_number": clue.discovery_stage.stage_number if clue.discovery_stage else 0,
+        "source": "script"
+    }
+
+
+def build_timeline_entry(event: ScriptTimeline) -> Dict[str, Any]:
+    """构建时间线事件的展示信息"""
+    return {
+        "id": event.id,
+        "event_description": event.event_description,
+        "sys_description": event.sys_description,
+        "character_name": event.character.name if event.character else None,
+        "is_public": event.is_public,
+        "created_at": event.created_at.isoformat()
+    }
+
+
+async def build_shared_status_data(room: GameRooms) -> Dict[str, Any]:
+    """一次性加载并构建与观看者无关的房间状态数据
+
+    广播时所有玩家共用这份数据，各构建方法只在其上做按玩家的轻量过滤，
+    每次广播的查询次数不再随房间人数增长。
+    """
+    shared: Dict[str, Any] = {
+        "script": await build_script_info(room.script) if room.script else None,
+        "players": await build_players_info(room)
+    }
+
+    if room.status == "选择角色":
+        shared["characters"] = await build_characters_info(room)
+
+    if room.status == "投票中":
+        shared["voting_info"] = await build_voting_info(room)
+
+    if room.status not in GAME_PHASES or not room.script:
+        return shared
+
+    # 剧本内容（时间线、阶段、角色任务、线索）从剧本内容缓存读取
+    content = await script_content_cache.get(room.script_id)
+    shared["timeline"] = content.timeline
+    shared["public_timeline"] = [build_timeline_entry(event) for event in content.public_timeline]
+
+    if not room.current_stage:
+        return shared
+
+    current_stage_number = room.current_stage.stage_number
+
+    # 阶段及所有角色在这些阶段的任务
+    shared["stages"] = content.stages_up_to(current_stage_number)
+    shared["stage_goals"] = content.goals
+
+    # 当前阶段及之前的公开线索；私有线索由各构建方法按玩家用剧本内容的可见性掩码过滤
+    shared["script_content"] = content
+    shared["public_clues"] = [build_clue_entry(clue) for clue in content.public_clues_up_to(current_stage_number)]
+
+    # 房间内所有玩家的搜查记录（搜查记录缓存，搜查时增量更新）
+    shared["search_reveals"] = await search_reveal_store.get(room)
+
+    return shared
@@ -1,8 +1,9 @@
 from typing import Optional, Dict, Any
-from model.entity.Scripts import GameRooms, CharacterStageGoals
+from model.entity.Scripts import GameRooms
+from ..ScriptContentCache import script_content_cache
 
-async def build_stage_info(room: GameRooms, user_id: int = None) -> Optional[Dict[str, Any]]:
-    """构建当前阶段信息和历史阶段信息"""
+async def build_stage_info(room: GameRooms, user_id: int = None, shared: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    """构建当前阶段信息和历史阶段信息（传入广播共享数据时不再查询数据库）"""
     if not room.current_stage or not room.script:
         return None
     
@@ -15,9 +16,24 @@ async def build_stage_info(room: GameRooms, user_id: int = None) -> Optional[Dic
                 break
     
     # 获取当前阶段及之前的所有阶段
-    stages = await room.script.stages.filter(
-        stage_number__lte=room.current_stage.stage_number
-    ).order_by('stage_number').all()
+    if shared is not None and "stages" in shared:
+        stages = shared["stages"]
+        stage_goals = shared["stage_goals"]
+    else:
+        content = await script_content_cache.get(room.script_id)
+        stages = content.stages_up_to(room.current_stage.stage_number)
+        stage_goals = content.goals
+
+    def get_character_goal(stage_id: int) -> Optional[Dict[str, Any]]:
+        """获取当前角色在指定阶段的任务"""
+        stage_goal = stage_goals.get((current_character.id, stage_id))
+        if not stage_goal:
+            return None
+        return {
+            "goal_description": stage_goal.goal_description,
+            "is_mandatory": stage_goal.is_mandatory,
+            "search_attempts": stage_goal.search_attempts
+        }
     
     # 构建阶段信息列表
     stages_info = []
@@ -33,19 +49,7 @@ async def build_stage_info(room: GameRooms, user_id: int = None) -> Optional[Dic
         
         # 如果有当前角色，添加该角色在此阶段的任务
         if current_character:
-            stage_goal = await CharacterStageGoals.filter(
-                character=current_character,
-                stage=stage
-            ).first()
-            
-            if stage_goal:
-                stage_info["character_goal"] = {
-                    "goal_description": stage_goal.goal_description,
-                    "is_mandatory": stage_goal.is_mandatory,
-                    "search_attempts": stage_goal.search_attempts
-                }
-            else:
-                stage_info["character_goal"] = None
+            stage_info["character_goal"] = get_character_goal(stage.id)
         
         stages_info.append(stage_info)
     
@@ -60,19 +64,7 @@ async def build_stage_info(room: GameRooms, user_id: int = None) -> Optional[Dic
     
     # 为当前阶段添加角色任务
     if current_character:
-        current_stage_goal = await CharacterStageGoals.filter(
-            character=current_character,
-            stage=room.current_stage
-        ).first()
-        
-        if current_stage_goal:
-            current_stage_info["character_goal"] = {
-                "goal_description": current_stage_goal.goal_description,
-                "is_mandatory": current_stage_goal.is_mandatory,
-                "search_attempts": current_stage_goal.search_attempts
-            }
-        else:
-            current_stage_info["character_goal"] = None
+        current_stage_info["character_goal"] = get_character_goal(room.current_stage.id)
     
     return {
         "current_stage": current_stage_info,
@@ -1,8 +1,10 @@
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from model.entity.Scripts import GameRooms
+from .shared_builder import build_timeline_entry
+from ..ScriptContentCache import script_content_cache
 
-async def build_story_timeline_info(script, user_id: int, room: GameRooms) -> Dict[str, Any]:
-    """构建剧本时间线信息"""
+async def build_story_timeline_info(script, user_id: int, room: GameRooms, shared: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """构建剧本时间线信息（传入广播共享数据时不再查询数据库）"""
     if not script:
         return {"public": [], "private": []}
     
@@ -13,46 +15,34 @@ async def build_story_timeline_info(script, user_id: int, room: GameRooms) -> Di
             current_character = player.character
             break
     
-    from model.entity.Scripts import ScriptTimeline
+    if shared is not None and "timeline" in shared:
+        # 公开时间线已在共享数据中构建，私有时间线从已加载的事件中过滤
+        public_events = shared["public_timeline"]
+        private_events = []
+        if current_character:
+            private_events = [
+                build_timeline_entry(event) for event in shared["timeline"]
+                if not event.is_public and event.character_id == current_character.id
+            ]
+        return {
+            "public": public_events,
+            "private": private_events
+        }
     
-    # 获取公开时间线，预加载 character 关系
-    public_timeline = await ScriptTimeline.filter(
-        script=script,
-        is_public=True
-    ).prefetch_related('character').order_by('created_at').all()
+    content = await script_content_cache.get(script.id)
+    # 公开时间线
+    public_timeline = content.public_timeline
     
-    # 获取当前角色的私有时间线，预加载 character 关系
+    # 当前角色的私有时间线
     private_timeline = []
     if current_character:
-        private_timeline = await ScriptTimeline.filter(
-            script=script,
-            character=current_character,
-            is_public=False
-        ).prefetch_related('character').order_by('created_at').all()
+        private_timeline = content.private_timeline(current_character.id)
     
     # 构建公开时间线信息
-    public_events = []
-    for event in public_timeline:
-        public_events.append({
-            "id": event.id,
-            "event_description": event.event_description,
-            "sys_description": event.sys_description,
-            "character_name": event.character.name if event.character else None,
-            "is_public": event.is_public,
-            "created_at": event.created_at.isoformat()
-        })
+    public_events = [build_timeline_entry(event) for event in public_timeline]
     
     # 构建私有时间线信息
-    private_events = []
-    for event in private_timeline:
-        private_events.append({
-            "id": event.id,
-            "event_description": event.event_description,
-            "sys_description": event.sys_description,
-            "character_name": event.character.name if event.character else None,
-            "is_public": event.is_public,
-            "created_at": event.created_at.isoformat()
-        })
+    private_events = [build_timeline_entry(event) for event in private_timeline]
     
     return {
         "public": public_events,
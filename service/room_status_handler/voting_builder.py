@@ -1,44 +1,47 @@
 from typing import Dict, Any
 from model.entity.Scripts import GameRooms
+from ..VoteTallyStore import vote_tally_store
+
+async def _get_tally(room: GameRooms):
+    """房间的投票计数，需要重新加载时先等房间处理器已登记的写入落库"""
+    from ..RoomActor import room_actor_registry
+
+    state = room_actor_registry.get_state(room.room_code)
+    return await vote_tally_store.get(room.id, state.flush if state else None)
 
 async def build_voting_info(room: GameRooms) -> Dict[str, Any]:
-    """构建投票信息"""
-    from model.entity.Scripts import GameVotes
+    """构建投票信息（得票数由投票时增量维护，不再加载全部投票记录）"""
+    tally = await _get_tally(room)
+    players_by_id = {player.id: player for player in room.players}
     
-    votes = await GameVotes.filter(room=room).prefetch_related(
-        'voter_game_player__user', 'voted_game_player__user'
-    ).all()
+    vote_counts = []
+    for voted_player_id, vote_count in tally.counts.items():
+        voted_player = players_by_id.get(voted_player_id)
+        if voted_player:
+            vote_counts.append({
+                "user_id": voted_player.user.id,
+                "nickname": voted_player.user.nickname,
+                "vote_count": vote_count
+            })
     
-    vote_counts = {}
     vote_details = []
-    
-    for vote in votes:
-        voter_user_id = vote.voter_game_player.user.id
-        voter_nickname = vote.voter_game_player.user.nickname
-        
-        voted_user_id = vote.voted_game_player.user.id
-        voted_nickname = vote.voted_game_player.user.nickname
-        
-        if voted_user_id not in vote_counts:
-            vote_counts[voted_user_id] = {
-                "user_id": voted_user_id,
-                "nickname": voted_nickname,
-                "vote_count": 0
-            }
-        
-        vote_counts[voted_user_id]["vote_count"] += 1
+    for voter_player_id, voted_player_id, timestamp in tally.items():
+        voter_player = players_by_id.get(voter_player_id)
+        voted_player = players_by_id.get(voted_player_id)
+        if not voter_player or not voted_player:
+            continue
         vote_details.append({
-            "voter_user_id": voter_user_id,
-            "voter_nickname": voter_nickname,
-            "voted_user_id": voted_user_id,
-            "voted_nickname": voted_nickname,
-            "timestamp": vote.timestamp.isoformat()
+            "voter_user_id": voter_player.user.id,
+            "voter_nickname": voter_player.user.nickname,
+            "voted_user_id": voted_player.user.id,
+            "voted_nickname": voted_player.user.nickname,
+            "timestamp": timestamp.isoformat()
         })
     
     return {
-        "vote_counts": list(vote_counts.values()),
+        "vote_counts": vote_counts,
         "vote_details": vote_details,
-        "total_votes": len(votes)
+        "total_votes": len(vote_details)
     }
 
 async def build_game_result(room: GameRooms) -> Dict[str, Any]:
@@ -58,10 +61,12 @@ async def build_game_result(room: GameRooms) -> Dict[str, Any]:
     
     # 判断游戏结果
     game_result = "未知"
-    if voting_info["vote_counts"]:
-        # 找到得票最多的玩家
-        max_votes = max(voting_info["vote_counts"], key=lambda x: x["vote_count"])
-        if murderer_info and max_votes["nickname"] == murderer_info["player_nickname"]:
+    leader = (await _get_tally(room)).leader()
+    if leader:
+        # 得票最多的玩家（票数相同时按 VoteTally.leader 的规则）
+        leader_player = next((player for player in room.players if player.id == leader[0]), None)
+        leader_nickname = leader_player.user.nickname if leader_player else None
+        if murderer_info and leader_nickname == murderer_info["player_nickname"]:
             game_result = "凶手失败"
         else:
             game_result = "凶手胜利"
@@ -0,0 +1,54 @@
+"""NPC 提示词只包含 NPC 可见的最近日志
+
+运行方式：python -m pytest tests/test_npc_prompt.py
+"""
+import asyncio
+
+from tortoise import Tortoise
+
+from benchmarks.fixtures import init_memory_db, seed_room
+from model.entity.Scripts import ScriptClues
+from service.RoomActor import RoomState
+from service.ai_npc_handler.AIPromptBuilder import AIPromptBuilder
+from utils.game_log_util import game_log_util
+from utils.game_log_writer import game_log_writer
+
+
+class _Actor:
+    def defer_write(self, write):
+        pass
+
+
+def test_prompt_excludes_other_players_private_logs():
+    async def run():
+        await init_memory_db()
+        try:
+            await seed_room(players=3, stages=2, status="进行中", searches_per_player=0, room_code="NPP1")
+            state = await RoomState.load(_Actor(), "NPP1")
+            room = state.room
+            alice, npc, bob = room.players[0], room.players[1], room.players[2]
+            npc.is_npc = True
+            clue = await ScriptClues.filter(script_id=room.script_id).first()
+
+            await game_log_util.create_chat_log(room, alice, "大家昨晚都在哪里？")
+            await game_log_util.create_private_chat_log(room, alice, bob, "我怀疑管家，别告诉别人")
+            await game_log_util.create_clue_log(room=room, player=bob, clue=clue, content="搜查到线索：带血的手帕")
+            await game_log_util.create_private_chat_log(room, bob, npc, "你看到管家了吗？")
+            await game_log_util.create_clue_log(room=room, player=npc, clue=clue, content="搜查到线索：破碎的怀表")
+
+            builder = AIPromptBuilder()
+            context = await builder.build_autonomous_context(npc, room)
+            messages = builder.build_chat_messages(npc, context, "请发言。")
+            await game_log_writer.flush()
+            return messages[1]["content"]
+        finally:
+            await Tortoise.close_connections()
+
+    prompt = asyncio.run(run())
+
+    assert "大家昨晚都在哪里？" in prompt
+    assert "你看到管家了吗？" in prompt
+    assert "破碎的怀表" in prompt
+    # 其他玩家之间的私聊和其他玩家的搜查记录
+    assert "我怀疑管家" not in prompt
+    assert "带血的手帕" not in prompt
@@ -0,0 +1,161 @@
+"""NPC 流式回复对接本地模型桩服务（benchmarks.stub_model_server）的测试
+
+运行方式：python -m pytest tests/test_npc_streaming.py
+"""
+import asyncio
+import socket
+import subprocess
+import sys
+import time
+from functools import partial
+from typing import Any, Dict, List
+
+import httpx
+import pytest
+from tortoise import Tortoise
+
+from benchmarks.fixtures import init_memory_db, seed_room
+from conf.config import settings
+from model.entity.Scripts import AIInteractions, GameLogs
+from model.ws.notification_types import MessageType
+from service.AIHandler import ai_handler
+from service.AIResponsePipeline import ai_response_pipeline
+from service.RoomActor import RoomState
+from utils.game_log_writer import game_log_writer
+from utils.http_client import http_client
+from websocket.connection_manager import manager
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture(scope="module")
+def stub_url():
+    """启动模型桩服务（每秒 20 个令牌，回复约半秒生成完）"""
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.stub_model_server", "--port", str(port), "--tps", "20", "--ttft-ms", "0"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 15
+        while True:
+            try:
+                httpx.get(f"{base_url}/stats", timeout=1)
+                break
+            except httpx.TransportError:
+                if time.monotonic() > deadline or process.poll() is not None:
+                    raise RuntimeError("模型桩服务启动失败")
+                time.sleep(0.1)
+        yield f"{base_url}/v1/chat/completions"
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+@pytest.fixture
+def private_frames(monkeypatch, stub_url):
+    """把 NPC 对话指向桩服务，并收集发给玩家的私聊帧"""
+    monkeypatch.setattr(settings, "API_URL", stub_url)
+    monkeypatch.setattr(settings, "API_KEY", "stub")
+    monkeypatch.setattr(settings, "AI_STREAM_CHUNK_INTERVAL_MS", 0)
+    monkeypatch.setattr(settings, "MODEL_CACHE_MODE", "off")
+
+    frames: List[Dict[str, Any]] = []
+
+    async def send_personal_message(message: dict, user_id: int):
+        if message.get("type") == MessageType.PRIVATE_MESSAGE.value:
+            frames.append(message["data"])
+
+    monkeypatch.setattr(manager, "send_personal_message", send_personal_message)
+    return frames
+
+
+class _Actor:
+    def defer_write(self, write):
+        pass
+
+
+async def _seed_npc_room(room_code: str):
+    """创建进行中的房间，第二位玩家作为 NPC，返回 (房间状态, NPC, 发起私聊的玩家)"""
+    await seed_room(players=3, stages=2, status="进行中", searches_per_player=0, room_code=room_code)
+    state = await RoomState.load(_Actor(), room_code)
+    player, npc = state.room.players[0], state.room.players[1]
+    npc.is_npc = True
+    await npc.save(update_fields=["is_npc"])
+    return state, npc, player
+
+
+def _private_message(npc, text: str) -> Dict[str, Any]:
+    return {"type": MessageType.PRIVATE_MESSAGE.value, "data": {"message": text, "recipient_id": npc.user_id}}
+
+
+def test_private_reply_streams_and_persists(private_frames):
+    async def run():
+        await init_memory_db()
+        try:
+            state, npc, player = await _seed_npc_room("NPC1")
+            await ai_handler._generate_ai_response(
+                npc, player.user_id, _private_message(npc, "你昨晚在哪里？"), state.room
+            )
+            await game_log_writer.flush()
+
+            logs = await GameLogs.filter(room_id=state.room.id, sender_game_player_id=npc.id)
+            interactions = await AIInteractions.filter(room_id=state.room.id, ai_player_id=npc.id)
+            return logs, interactions
+        finally:
+            await http_client.close()
+            await Tortoise.close_connections()
+
+    logs, interactions = asyncio.run(run())
+
+    assert len(private_frames) >= 2
+    assert len({frame["stream_id"] for frame in private_frames}) == 1
+    *chunks, final = private_frames
+    assert all(frame["done"] is False for frame in chunks)
+    assert final["done"] is True and "cancelled" not in final
+    assert "".join(frame["message"] for frame in chunks).strip() == final["message"]
+    assert final["message"]
+
+    # 回复以完整内容落库（聊天日志和 AI 交互记录）
+    assert [log.content for log in logs] == [final["message"]]
+    assert len(interactions) == 1
+    assert interactions[0].ai_response["content"] == final["message"]
+
+
+def test_cancelled_reply_closes_stream(private_frames):
+    async def run():
+        await init_memory_db()
+        try:
+            state, npc, player = await _seed_npc_room("NPC2")
+            ai_response_pipeline.submit(state.room_code, state.room.current_stage_id, partial(
+                ai_handler._generate_ai_response, npc, player.user_id, _private_message(npc, "你认识死者吗？"), state.room
+            ))
+
+            # 收到第一段后取消房间的全部响应任务（与房间无人在线时相同）
+            deadline = time.monotonic() + 10
+            while not private_frames and time.monotonic() < deadline:
+                await asyncio.sleep(0.01)
+            ai_response_pipeline.cancel_room(state.room_code)
+            await asyncio.sleep(0.2)
+            await game_log_writer.flush()
+
+            logs = await GameLogs.filter(room_id=state.room.id, sender_game_player_id=npc.id)
+            interactions = await AIInteractions.filter(room_id=state.room.id, ai_player_id=npc.id)
+            return logs, interactions
+        finally:
+            await http_client.close()
+            await Tortoise.close_connections()
+
+    logs, interactions = asyncio.run(run())
+
+    *chunks, final = private_frames
+    assert chunks and all(frame["done"] is False for frame in chunks)
+    assert len({frame["stream_id"] for frame in private_frames}) == 1
+    # 客户端的流以 done=True 的取消帧结束，未完成的回复不落库
+    assert final["done"] is True and final["cancelled"] is True
+    assert logs == [] and interactions == []
@@ -0,0 +1,59 @@
+"""剧本生成任务队列（service.ScriptGenerationQueue）的测试
+
+运行方式：python -m pytest tests/test_script_generation_queue.py
+"""
+import asyncio
+
+from tortoise import Tortoise
+
+from benchmarks.fixtures import init_memory_db, seed_room
+from conf.config import settings
+from model.entity.Scripts import ScriptGenerationJobs
+from service.ScriptGenerationQueue import ScriptGenerationQueue
+from service.game_handler.ScriptGeneratorHandler import script_generator_handler
+
+
+def test_close_does_not_start_queued_jobs(monkeypatch):
+    monkeypatch.setattr(settings, "SCRIPT_GENERATION_WORKERS", 1)
+    started = []
+
+    async def generate_script(job):
+        started.append(job.id)
+        await asyncio.sleep(3600)
+
+    monkeypatch.setattr(script_generator_handler, "generate_script", generate_script)
+
+    async def run():
+        await init_memory_db()
+        queue = ScriptGenerationQueue()
+        try:
+            # 两个房主各有一个排队中的任务，只有一个工作协程
+            jobs = []
+            for room_code in ("SGQ1", "SGQ2"):
+                room = await seed_room(players=2, stages=1, status="生成剧本中", room_code=room_code)
+                jobs.append(await ScriptGenerationJobs.create(
+                    room=room, host_user_id=room.host_user_id, game_setting={}
+                ))
+            await queue.start()
+            while not started:
+                await asyncio.sleep(0.01)
+
+            await queue.close()
+            pending = [
+                task for task in asyncio.all_tasks()
+                if task.get_coro().__qualname__ == "ScriptGenerationQueue._execute"
+            ]
+            statuses = [
+                (job.status, job.attempts)
+                for job in await ScriptGenerationJobs.filter(id__in=[job.id for job in jobs]).order_by("id")
+            ]
+            return pending, statuses
+        finally:
+            await Tortoise.close_connections()
+
+    pending, statuses = asyncio.run(run())
+
+    # 关闭时只中断了第一个任务，两个任务都回到排队中，不计执行次数，下次启动时继续
+    assert len(started) == 1
+    assert pending == []
+    assert statuses == [("排队中", 0), ("排队中", 0)]
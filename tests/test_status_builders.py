@@ -0,0 +1,34 @@
+"""房间状态构建方法的语句数不超过基线（benchmarks/baselines/status_builders.json）
+
+运行方式：python -m pytest tests/test_status_builders.py
+基线需要更新时运行 python -m benchmarks.bench_status_builders --save-baseline
+"""
+import asyncio
+
+from benchmarks.bench_status_builders import WARM, find_regressions, load_baseline, parse_case, run
+
+CASES = ["4x3x1x1", "6x3x2x2", "10x5x2x3"]
+
+
+def test_builder_queries_within_baseline():
+    results = asyncio.run(run([parse_case(case) for case in CASES], rounds=1))
+    baseline = load_baseline()
+
+    # 基线覆盖全部参数、构建方法和缓存状态，检查不会因为缺少基线而跳过
+    for case, builders in results.items():
+        for name, result in builders.items():
+            assert set(result["queries"]) <= set(baseline.get(case, {}).get(name, {})), (case, name)
+            assert WARM in result["queries"]
+
+    assert find_regressions(results, baseline) == []
+
+
+def test_cold_cache_loads_are_counted():
+    results = asyncio.run(run([parse_case(CASES[0])], rounds=1))
+    queries = results[CASES[0]]["build_clues_info"]["queries"]
+
+    # 冷缓存时需要加载剧本内容和搜查记录，缓存已加载后不再查询
+    assert queries["cold"] > 0
+    assert queries["cold_script_content"] > 0
+    assert queries["cold_search_reveals"] > 0
+    assert queries[WARM] == 0
@@ -0,0 +1,69 @@
+"""已有的表补建唯一索引（conf.database.ensure_unique_indexes）的测试
+
+运行方式：python -m pytest tests/test_unique_indexes.py
+"""
+import asyncio
+
+import pytest
+from tortoise import Tortoise
+from tortoise.exceptions import IntegrityError
+
+from benchmarks.fixtures import init_memory_db
+from conf.database import UNIQUE_INDEXES, ensure_unique_indexes
+
+
+async def _recreate_without_constraints(conn, table: str):
+    """模拟加唯一约束之前建的表：CREATE TABLE AS 不复制约束"""
+    await conn.execute_script(
+        f"ALTER TABLE {table} RENAME TO {table}_old; "
+        f"CREATE TABLE {table} AS SELECT * FROM {table}_old; "
+        f"DROP TABLE {table}_old;"
+    )
+
+
+def test_existing_table_is_deduplicated_and_indexed():
+    async def run():
+        await init_memory_db()
+        try:
+            conn = Tortoise.get_connection("default")
+            await _recreate_without_constraints(conn, "game_script_search")
+            insert = (
+                "INSERT INTO game_script_search (id, created_at, updated_at, is_public, clues_found_id, "
+                "game_player_id, searchable_player_id) VALUES (?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP, 0, ?, ?, 2)"
+            )
+            # 玩家 1 重复搜到线索 10（并发搜查留下的重复记录）
+            for row in [(1, 10, 1), (2, 10, 1), (3, 11, 1), (4, 10, 3), (5, 10, 1)]:
+                await conn.execute_query(insert, list(row))
+
+            await ensure_unique_indexes()
+            # 再次启动时索引已存在，不做任何修改
+            await ensure_unique_indexes()
+
+            ids = [row["id"] for row in await conn.execute_query_dict("SELECT id FROM game_script_search ORDER BY id")]
+            indexes = [row["name"] for row in await conn.execute_query_dict("PRAGMA index_list(game_script_search)")]
+            with pytest.raises(IntegrityError):
+                await conn.execute_query(insert, [6, 10, 1])
+            return ids, indexes
+        finally:
+            await Tortoise.close_connections()
+
+    ids, indexes = asyncio.run(run())
+
+    # 每组重复记录保留ID最小的一条
+    assert ids == [1, 3, 4]
+    assert indexes == [UNIQUE_INDEXES[0][0]]
+
+
+def test_fresh_schema_needs_no_extra_index():
+    async def run():
+        await init_memory_db()
+        try:
+            await ensure_unique_indexes()
+            conn = Tortoise.get_connection("default")
+            return await conn.execute_query_dict("PRAGMA index_list(game_script_search)")
+        finally:
+            await Tortoise.close_connections()
+
+    # generate_schemas 建表时已带唯一约束，不重复建索引
+    indexes = asyncio.run(run())
+    assert [index["origin"] for index in indexes] == ["u"]
@@ -0,0 +1,70 @@
+"""投票计数（service.VoteTallyStore）的测试
+
+运行方式：python -m pytest tests/test_vote_tally.py
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+from tortoise import Tortoise
+
+from benchmarks.fixtures import init_memory_db, seed_room
+from model.entity.Scripts import GameVotes
+from service.RoomActor import RoomActor
+from service.VoteTallyStore import VoteTally, vote_tally_store
+
+
+def test_leader_tie_goes_to_first_to_reach_top_count():
+    start = datetime(2026, 1, 1, 20, 0)
+    tally = VoteTally(room_id=1)
+    # 玩家 12 先得到一票，玩家 11 后得到一票；插入顺序与结果无关
+    tally.cast(3, 11, start + timedelta(seconds=5))
+    tally.cast(4, 12, start + timedelta(seconds=1))
+    assert tally.leader() == (12, 1)
+
+    # 玩家 11 先达到两票
+    tally.cast(5, 11, start + timedelta(seconds=6))
+    tally.cast(6, 12, start + timedelta(seconds=7))
+    assert tally.leader() == (11, 2)
+
+    # 时间也相同时 GamePlayer ID 小的领先
+    same = VoteTally(room_id=2)
+    same.cast(3, 12, start)
+    same.cast(4, 11, start)
+    assert same.leader() == (11, 1)
+
+
+def test_reload_waits_for_deferred_vote_writes():
+    async def run():
+        await init_memory_db()
+        actor = RoomActor("VT1")
+        actor.start()
+        gate = asyncio.Event()
+        try:
+            room = await seed_room(players=4, stages=2, status="投票中", searches_per_player=0, room_code="VT1")
+            players = await room.players.all().order_by("id")
+
+            async def slow_create(voter, voted):
+                await gate.wait()
+                await GameVotes.create(room_id=room.id, stage_id=room.current_stage_id,
+                                       voter_game_player_id=voter.id, voted_game_player_id=voted.id)
+
+            # 投票已登记但尚未落库，计数缓存中没有该房间（如被淘汰）
+            vote_tally_store.invalidate(room.id)
+            for voter in players[:3]:
+                actor.defer_write(lambda voter=voter: slow_create(voter, players[3]))
+            loading = asyncio.create_task(vote_tally_store.get(room.id, actor.flush))
+            await asyncio.sleep(0.05)
+            assert not loading.done()
+
+            gate.set()
+            tally = await loading
+            return tally.counts, players[3].id
+        finally:
+            # 断言失败时也放行写入，否则关闭处理器会一直等待
+            gate.set()
+            await actor.close()
+            vote_tally_store.invalidate(room.id)
+            await Tortoise.close_connections()
+
+    counts, voted_id = asyncio.run(run())
+    assert counts == {voted_id: 3}
@@ -1,8 +1,20 @@
 from typing import Optional, Dict, Any
+from tortoise import timezone
 from model.entity.Scripts import GameLogs, GameRooms, GamePlayers, ScriptClues
+from .game_log_writer import game_log_writer
 
 class GameLogUtil:
-    """游戏日志工具类"""
+    """游戏日志工具类
+
+    日志交给 game_log_writer 批量写入，方法立即返回尚未落库的 GameLogs 对象。
+    """
+    
+    @staticmethod
+    def _enqueue(**kwargs) -> GameLogs:
+        """创建日志对象并登记到批量写入器"""
+        log = GameLogs(timestamp=timezone.now(), **kwargs)
+        game_log_writer.enqueue(log)
+        return log
     
     @staticmethod
     async def create_system_log(
@@ -11,7 +23,7 @@ class GameLogUtil:
         player: Optional[GamePlayers] = None
     ) -> GameLogs:
         """创建系统消息日志"""
-        return await GameLogs.create(
+        return GameLogUtil._enqueue(
             room=room,
             sender_game_player=player,
             is_ai_sender=False,
@@ -28,7 +40,7 @@ class GameLogUtil:
         content: str
     ) -> GameLogs:
         """创建公共聊天日志"""
-        return await GameLogs.create(
+        return GameLogUtil._enqueue(
             room=room,
             sender_game_player=sender_player,
             is_ai_sender=False,
@@ -46,7 +58,7 @@ class GameLogUtil:
         content: str
     ) -> GameLogs:
         """创建私聊日志"""
-        return await GameLogs.create(
+        return GameLogUtil._enqueue(
             room=room,
             sender_game_player=sender_player,
             recipient_game_player=recipient_player,
@@ -66,7 +78,7 @@ class GameLogUtil:
         action_content: str
     ) -> GameLogs:
         """创建行动宣告日志"""
-        return await GameLogs.create(
+        return GameLogUtil._enqueue(
             room=room,
             sender_game_player=player,
             is_ai_sender=False,
@@ -84,7 +96,7 @@ class GameLogUtil:
         content: str
     ) -> GameLogs:
         """创建线索发布日志"""
-        return await GameLogs.create(
+        return GameLogUtil._enqueue(
             room=room,
             sender_game_player=player,
             is_ai_sender=False,
@@ -101,7 +113,7 @@ class GameLogUtil:
         content: str
     ) -> GameLogs:
         """创建AI旁白日志"""
-        return await GameLogs.create(
+        return GameLogUtil._enqueue(
             room=room,
             sender_game_player=None,
             is_ai_sender=True,
@@ -113,9 +125,7 @@ class GameLogUtil:
     
     async def create_clue_log(self, room, player, clue, content: str):
         """创建线索相关日志"""
-        from model.entity.Scripts import GameLogs
-        
-        return await GameLogs.create(
+        return GameLogUtil._enqueue(
             room=room,
             sender_game_player=player,
             is_ai_sender=False,
@@ -0,0 +1,128 @@
+import asyncio
+import time
+from typing import Any, Dict, List, Optional
+
+from conf.config import settings
+from model.entity.Scripts import GameLogs
+from .recent_message_buffer import recent_message_buffer
+
+
+class GameLogWriter:
+    """游戏日志批量写入器
+
+    日志先进入内存缓冲区，由后台协程在条数达到 GAME_LOG_BATCH_SIZE
+    或距上次写入超过 GAME_LOG_FLUSH_INTERVAL_MS 时用 bulk_create 批量写入。
+    日志登记时同时写入 recent_message_buffer，读取方无需等待日志落库。
+    """
+
+    def __init__(self):
+        # 等待写入的日志
+        self._buffer: List[GameLogs] = []
+        # 正在写入的批次
+        self._flushing: List[GameLogs] = []
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+        # 统计
+        self.enqueued_count = 0
+        self.written_count = 0
+        self.dropped_count = 0
+        self.flush_count = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+
+    def start(self):
+        """启动后台写入协程"""
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """停止后台写入协程，并写入缓冲区中剩余的日志"""
+        if self._task:
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+    def enqueue(self, log: GameLogs):
+        """登记一条待写入的日志（立即返回）"""
+        if not self._stopping:
+            self.start()
+        self._buffer.append(log)
+        recent_message_buffer.append(log)
+        self.enqueued_count += 1
+        if len(self._buffer) >= settings.GAME_LOG_BATCH_SIZE:
+            self._wakeup.set()
+
+    @property
+    def depth(self) -> int:
+        return len(self._buffer) + len(self._flushing)
+
+    async def flush(self):
+        """立即写入缓冲区中的全部日志"""
+        async with self._flush_lock:
+            if not self._buffer:
+                return
+            batch, self._buffer = self._buffer, []
+            self._flushing = batch
+
+            started = time.perf_counter()
+            try:
+                await GameLogs.bulk_create(batch)
+                self.written_count += len(batch)
+            except Exception as e:
+                print(f"批量写入游戏日志失败，改为逐条写入: {str(e)}")
+                await self._write_one_by_one(batch)
+            finally:
+                self._flushing = []
+
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.flush_count += 1
+            self.last_flush_ms = elapsed_ms
+            self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+            self.total_flush_ms += elapsed_ms
+
+    async def _write_one_by_one(self, batch: List[GameLogs]):
+        """逐条写入，跳过无法写入的日志（如关联的玩家已被删除）"""
+        for log in batch:
+            try:
+                await log.save()
+                self.written_count += 1
+            except Exception as e:
+                self.dropped_count += 1
+                print(f"写入游戏日志失败: {str(e)}")
+
+    async def _run(self):
+        """按时间或条数阈值批量写入"""
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=settings.GAME_LOG_FLUSH_INTERVAL_MS / 1000)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"写入游戏日志失败: {str(e)}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取日志写入统计信息"""
+        return {
+            "queue_depth": self.depth,
+            "enqueued": self.enqueued_count,
+            "written": self.written_count,
+            "dropped": self.dropped_count,
+            "flushes": self.flush_count,
+            "last_flush_ms": round(self.last_flush_ms, 2),
+            "max_flush_ms": round(self.max_flush_ms, 2),
+            "avg_flush_ms": round(self.total_flush_ms / self.flush_count, 2) if self.flush_count else 0.0
+        }
+
+
+# 全局游戏日志写入器实例
+game_log_writer = GameLogWriter()
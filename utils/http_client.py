@@ -0,0 +1,87 @@
+import importlib.util
+import logging
+from typing import Any, Dict, Optional
+
+import httpx
+
+from conf.config import settings
+
+
+class SharedHttpClient:
+    """应用级共享的异步 HTTP 客户端
+
+    剧本生成和NPC对话的模型调用共用同一个连接池，复用 keep-alive 连接，
+    避免每次调用重新建立 TCP/TLS 连接。在应用生命周期中创建和关闭。
+    """
+
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+
+        # 统计
+        self.request_count = 0
+
+    def start(self):
+        """创建客户端"""
+        if self._client is not None:
+            return
+
+        # 安装了 h2 时启用 HTTP/2
+        http2 = settings.HTTP_CLIENT_HTTP2 and importlib.util.find_spec("h2") is not None
+        self._client = httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=settings.HTTP_CLIENT_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.HTTP_CLIENT_MAX_KEEPALIVE,
+                keepalive_expiry=settings.HTTP_CLIENT_KEEPALIVE_EXPIRY
+            ),
+            timeout=httpx.Timeout(
+                connect=settings.HTTP_CLIENT_CONNECT_TIMEOUT,
+                read=settings.HTTP_CLIENT_READ_TIMEOUT,
+                write=settings.HTTP_CLIENT_WRITE_TIMEOUT,
+                pool=settings.HTTP_CLIENT_POOL_TIMEOUT
+            ),
+            event_hooks={"request": [self._on_request]}
+        )
+        logging.info(f"共享 HTTP 客户端已创建（HTTP/2: {http2}）")
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """获取客户端（未在生命周期中创建时按需创建，如脚本和基准测试）"""
+        if self._client is None:
+            self.start()
+        return self._client
+
+    async def close(self):
+        """关闭客户端及其连接池"""
+        if self._client is not None:
+            client, self._client = self._client, None
+            await client.aclose()
+
+    async def _on_request(self, request: httpx.Request):
+        self.request_count += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取连接池使用情况"""
+        stats = {
+            "started": self._client is not None,
+            "requests": self.request_count,
+            "max_connections": settings.HTTP_CLIENT_MAX_CONNECTIONS,
+            "connections": 0,
+            "active_connections": 0,
+            "idle_connections": 0
+        }
+        # 连接池状态来自 httpcore，取不到时只返回请求统计
+        pool = getattr(getattr(self._client, "_transport", None), "_pool", None)
+        if pool is not None:
+            connections = list(pool.connections)
+            idle = sum(1 for connection in connections if connection.is_idle())
+            stats.update(
+                connections=len(connections),
+                active_connections=len(connections) - idle,
+                idle_connections=idle
+            )
+        return stats
+
+
+# 全局共享 HTTP 客户端实例
+http_client = SharedHttpClient()
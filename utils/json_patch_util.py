@@ -0,0 +1,81 @@
+import copy
+from typing import Any, Dict, List
+
+
+def _escape_token(token: Any) -> str:
+    """按 RFC 6901 转义 JSON Pointer 片段"""
+    return str(token).replace("~", "~0").replace("/", "~1")
+
+
+def _unescape_token(token: str) -> str:
+    return token.replace("~1", "/").replace("~0", "~")
+
+
+def make_json_patch(old: Any, new: Any, path: str = "") -> List[Dict[str, Any]]:
+    """生成把 old 变为 new 的 JSON Patch（RFC 6902 的 add/remove/replace 子集）
+
+    字典逐键比较；列表先逐项比较公共部分，再在末尾追加或删除元素。
+    """
+    if type(old) is not type(new):
+        return [{"op": "replace", "path": path, "value": new}]
+
+    if isinstance(old, dict):
+        ops = []
+        for key in old:
+            if key not in new:
+                ops.append({"op": "remove", "path": f"{path}/{_escape_token(key)}"})
+        for key, value in new.items():
+            child_path = f"{path}/{_escape_token(key)}"
+            if key not in old:
+                ops.append({"op": "add", "path": child_path, "value": value})
+            else:
+                ops.extend(make_json_patch(old[key], value, child_path))
+        return ops
+
+    if isinstance(old, list):
+        ops = []
+        common = min(len(old), len(new))
+        for index in range(common):
+            ops.extend(make_json_patch(old[index], new[index], f"{path}/{index}"))
+        for index in range(common, len(new)):
+            ops.append({"op": "add", "path": f"{path}/{index}", "value": new[index]})
+        # 从后往前删除，保证下标有效
+        for index in range(len(old) - 1, common - 1, -1):
+            ops.append({"op": "remove", "path": f"{path}/{index}"})
+        return ops
+
+    if old != new:
+        return [{"op": "replace", "path": path, "value": new}]
+    return []
+
+
+def apply_json_patch(document: Any, patch: List[Dict[str, Any]]) -> Any:
+    """把 JSON Patch 应用到文档副本上并返回结果"""
+    result = copy.deepcopy(document)
+    for operation in patch:
+        path = operation["path"]
+        if path == "":
+            result = copy.deepcopy(operation.get("value"))
+            continue
+
+        tokens = [_unescape_token(token) for token in path.split("/")[1:]]
+        parent = result
+        for token in tokens[:-1]:
+            parent = parent[int(token)] if isinstance(parent, list) else parent[token]
+
+        last = tokens[-1]
+        op = operation["op"]
+        if isinstance(parent, list):
+            index = len(parent) if last == "-" else int(last)
+            if op == "add":
+                parent.insert(index, operation["value"])
+            elif op == "remove":
+                del parent[index]
+            else:
+                parent[index] = operation["value"]
+        else:
+            if op == "remove":
+                del parent[last]
+            else:
+                parent[last] = operation["value"]
+    return result
@@ -0,0 +1,189 @@
+import json
+import re
+from typing import Any, List, Tuple
+
+# 字符串外需要关注的字符
+_STRUCTURAL = re.compile(r'["{}\[\]]')
+# 字符串内需要关注的字符
+_STRING_SPECIAL = re.compile(r'["\\]')
+# 标量值的结束位置
+_SCALAR_END = re.compile(r'[,}\]\s]')
+
+
+class JsonSectionScanner:
+    """顶层 JSON 对象的增量扫描器
+
+    按块输入模型输出的文本，顶层对象的某个字段的值一结束（对象/数组闭合或标量结束）
+    就立即解析并返回 (字段名, 值)，无需等待整个 JSON 生成完毕。
+    根对象之前的内容（如 ```json 代码块标记）会被忽略。
+    """
+
+    # 扫描状态
+    _BEFORE_ROOT = 0   # 等待根对象的 {
+    _EXPECT_KEY = 1    # 等待字段名（或根对象的 }）
+    _IN_KEY = 2        # 读取字段名
+    _EXPECT_COLON = 3  # 等待冒号
+    _EXPECT_VALUE = 4  # 等待字段值开始
+    _IN_VALUE = 5      # 读取字段值
+    _DONE = 6          # 根对象已结束
+
+    def __init__(self):
+        self._state = self._BEFORE_ROOT
+        self._key_parts: List[str] = []
+        self._key = ""
+        self._value_parts: List[str] = []
+        # 字段值的类型：容器（{ 或 [）、字符串或其他标量
+        self._value_kind = ""
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    @property
+    def done(self) -> bool:
+        return self._state == self._DONE
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """输入一段文本，返回其中已完成的顶层字段"""
+        sections: List[Tuple[str, Any]] = []
+        position = 0
+        length = len(chunk)
+
+        while position < length and self._state != self._DONE:
+            state = self._state
+
+            if state == self._BEFORE_ROOT:
+                start = chunk.find("{", position)
+                if start == -1:
+                    return sections
+                position = start + 1
+                self._state = self._EXPECT_KEY
+
+            elif state == self._EXPECT_KEY:
+                char = chunk[position]
+                position += 1
+                if char == '"':
+                    self._key_parts = []
+                    self._in_string = True
+                    self._escape = False
+                    self._state = self._IN_KEY
+                elif char == "}":
+                    self._state = self._DONE
+
+            elif state == self._IN_KEY:
+                position = self._scan_key(chunk, position)
+                if not self._in_string:
+                    self._key = json.loads('"' + "".join(self._key_parts) + '"')
+                    self._state = self._EXPECT_COLON
+
+            elif state == self._EXPECT_COLON:
+                colon = chunk.find(":", position)
+                if colon == -1:
+                    return sections
+                position = colon + 1
+                self._state = self._EXPECT_VALUE
+
+            elif state == self._EXPECT_VALUE:
+                char = chunk[position]
+                if char.isspace():
+                    position += 1
+                    continue
+                self._value_parts = []
+                self._escape = False
+                if char in "{[":
+                    self._value_kind = "container"
+                    self._depth = 0
+                    self._in_string = False
+                elif char == '"':
+                    self._value_kind = "string"
+                    self._value_parts.append(char)
+                    position += 1
+                    self._in_string = True
+                else:
+                    self._value_kind = "scalar"
+                self._state = self._IN_VALUE
+
+            elif state == self._IN_VALUE:
+                position, completed = self._scan_value(chunk, position)
+                if completed:
+                    text = "".join(self._value_parts)
+                    self._value_parts = []
+                    sections.append((self._key, json.loads(text)))
+                    self._state = self._EXPECT_KEY
+
+        return sections
+
+    def _scan_key(self, chunk: str, position: int) -> int:
+        """读取字段名，直到未转义的引号（引号本身不计入）"""
+        parts = self._key_parts
+        while position < len(chunk):
+            if self._escape:
+                parts.append(chunk[position])
+                self._escape = False
+                position += 1
+                continue
+            match = _STRING_SPECIAL.search(chunk, position)
+            if match is None:
+                parts.append(chunk[position:])
+                return len(chunk)
+            parts.append(chunk[position:match.start()])
+            position = match.end()
+            if match.group() == "\\":
+                parts.append("\\")
+                self._escape = True
+            else:
+                self._in_string = False
+                return position
+        return position
+
+    def _scan_value(self, chunk: str, position: int) -> Tuple[int, bool]:
+        """读取字段值，返回 (新位置, 值是否已结束)"""
+        parts = self._value_parts
+        length = len(chunk)
+
+        if self._value_kind == "scalar":
+            match = _SCALAR_END.search(chunk, position)
+            if match is None:
+                parts.append(chunk[position:])
+                return length, False
+            parts.append(chunk[position:match.start()])
+            # 结束符（逗号或根对象的 }）留给 _EXPECT_KEY 处理
+            return match.start(), True
+
+        while position < length:
+            if self._in_string:
+                if self._escape:
+                    parts.append(chunk[position])
+                    self._escape = False
+                    position += 1
+                    continue
+                match = _STRING_SPECIAL.search(chunk, position)
+                if match is None:
+                    parts.append(chunk[position:])
+                    return length, False
+                parts.append(chunk[position:match.end()])
+                position = match.end()
+                if match.group() == "\\":
+                    self._escape = True
+                else:
+                    self._in_string = False
+                    if self._value_kind == "string":
+                        return position, True
+                continue
+
+            match = _STRUCTURAL.search(chunk, position)
+            if match is None:
+                parts.append(chunk[position:])
+                return length, False
+            parts.append(chunk[position:match.end()])
+            position = match.end()
+            char = match.group()
+            if char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+            else:
+                self._depth -= 1
+                if self._depth == 0:
+                    return position, True
+
+        return position, False
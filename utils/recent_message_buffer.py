@@ -0,0 +1,140 @@
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from conf.config import settings
+from model.entity.Scripts import GameLogs
+
+# 重连时回放给客户端的日志类型及对应的消息类型
+REPLAY_MESSAGE_TYPES = {
+    "公共聊天": "chat",
+    "私聊": "private_message",
+    "AI旁白": "ai_message",
+}
+
+# 只有发送者（和接收者）可见的日志类型
+PRIVATE_LOG_TYPES = ("私聊",)
+PERSONAL_LOG_TYPES = ("线索搜索",)
+
+
+def _visible_to(entry: Dict[str, Any], user_id: int) -> bool:
+    """日志是否对指定用户可见：私聊只对双方可见，搜查记录只对搜查者可见"""
+    if entry["message_type"] in PRIVATE_LOG_TYPES:
+        return user_id in (entry["send_id"], entry["recipient_id"])
+    if entry["message_type"] in PERSONAL_LOG_TYPES:
+        return entry["send_id"] == user_id
+    return True
+
+
+class _RoomMessages:
+    """单个房间的最近日志"""
+
+    def __init__(self):
+        self.entries: Deque[Dict[str, Any]] = deque(maxlen=settings.RECENT_MESSAGE_BUFFER_SIZE)
+        # 是否已从数据库补齐历史日志
+        self.loaded = False
+
+
+def _entry_key(entry: Dict[str, Any]):
+    return entry["timestamp"], entry["send_id"], entry["content"]
+
+
+class RecentMessageBuffer:
+    """房间最近日志的环形缓冲区
+
+    由 game_log_writer 在日志登记时写入，AI上下文构建和重连回放直接从这里读取，
+    不再查询 GameLogs。服务重启或房间首次读取时，从数据库补齐最近的日志。
+    """
+
+    def __init__(self):
+        self._rooms: Dict[str, _RoomMessages] = {}
+
+        # 统计
+        self.hit_count = 0
+        self.miss_count = 0
+
+    def append(self, log: GameLogs):
+        """登记一条新日志"""
+        room_code = log.room.room_code
+        messages = self._rooms.get(room_code)
+        if messages is None:
+            messages = self._rooms[room_code] = _RoomMessages()
+        messages.entries.append({
+            "message_type": log.message_type,
+            "content": log.content,
+            "timestamp": log.timestamp,
+            "send_id": log.send_id,
+            "send_nickname": log.send_nickname,
+            "recipient_id": log.recipient_id,
+            "recipient_nickname": log.recipient_nickname
+        })
+
+    async def get_recent(self, room_code: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """获取房间最近的日志（按时间顺序）"""
+        messages = self._rooms.get(room_code)
+        if messages is None or not messages.loaded:
+            self.miss_count += 1
+            messages = await self._load(room_code)
+        else:
+            self.hit_count += 1
+
+        entries = list(messages.entries)
+        return entries[-limit:] if limit else entries
+
+    async def get_visible(self, room_code: str, user_id: int, limit: int) -> List[Dict[str, Any]]:
+        """获取指定用户可见的最近日志（按时间顺序，如 NPC 的对话上下文）"""
+        visible = [entry for entry in await self.get_recent(room_code) if _visible_to(entry, user_id)]
+        return visible[-limit:]
+
+    async def get_replay(self, room_code: str, user_id: int, limit: int) -> List[Dict[str, Any]]:
+        """获取重连时回放给指定用户的消息（只包含用户可见的聊天记录）"""
+        replay = []
+        for entry in await self.get_recent(room_code):
+            message_type = REPLAY_MESSAGE_TYPES.get(entry["message_type"])
+            if not message_type or not _visible_to(entry, user_id):
+                continue
+            replay.append({
+                "type": message_type,
+                "message": entry["content"],
+                "datetime": entry["timestamp"].isoformat(),
+                "send_id": entry["send_id"],
+                "send_nickname": entry["send_nickname"] or "",
+                "recipient_id": entry["recipient_id"],
+                "recipient_nickname": entry["recipient_nickname"] or ""
+            })
+        return replay[-limit:]
+
+    def drop(self, room_code: str):
+        """清除房间的缓冲区"""
+        self._rooms.pop(room_code, None)
+
+    async def _load(self, room_code: str) -> _RoomMessages:
+        """从数据库补齐最近的日志，并与缓冲区中尚未落库的日志合并"""
+        logs = await GameLogs.filter(room__room_code=room_code).order_by('-timestamp').limit(
+            settings.RECENT_MESSAGE_BUFFER_SIZE
+        ).values(
+            'message_type', 'content', 'timestamp', 'send_id', 'send_nickname', 'recipient_id', 'recipient_nickname'
+        )
+
+        messages = self._rooms.get(room_code) or _RoomMessages()
+        merged = {_entry_key(entry): entry for entry in reversed(logs)}
+        for entry in messages.entries:
+            merged.setdefault(_entry_key(entry), entry)
+
+        loaded = _RoomMessages()
+        loaded.entries.extend(sorted(merged.values(), key=lambda entry: entry["timestamp"]))
+        loaded.loaded = True
+        self._rooms[room_code] = loaded
+        return loaded
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓冲区统计信息"""
+        return {
+            "rooms": len(self._rooms),
+            "entries": sum(len(messages.entries) for messages in self._rooms.values()),
+            "hits": self.hit_count,
+            "misses": self.miss_count
+        }
+
+
+# 全局最近消息缓冲区实例
+recent_message_buffer = RecentMessageBuffer()
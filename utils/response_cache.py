@@ -0,0 +1,178 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from conf.config import settings
+
+# 缓存模式
+MODE_OFF = "off"                    # 不使用缓存
+MODE_READ_THROUGH = "read_through"  # 命中且未过期时直接返回，未命中时调用模型并写入缓存
+MODE_RECORD = "record"              # 总是调用模型，并把响应写入缓存（录制）
+MODE_REPLAY = "replay"              # 只从缓存读取，未命中时报错，不调用模型
+CACHE_MODES = (MODE_OFF, MODE_READ_THROUGH, MODE_RECORD, MODE_REPLAY)
+
+
+def cache_key(model: str, temperature: float, system_prompt: str, user_prompt: str) -> str:
+    """模型、温度、系统提示词和用户提示词的 SHA-256"""
+    payload = json.dumps([model, temperature, system_prompt, user_prompt], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """模型响应的磁盘缓存
+
+    以请求内容的哈希为键，每条响应保存为缓存目录下的一个 JSON 文件。
+    缓存总大小超过 MODEL_CACHE_MAX_BYTES 时淘汰最久未使用的条目；
+    超过 MODEL_CACHE_TTL 秒的条目视为过期（回放模式不检查过期，保证结果可重复）。
+    """
+
+    def __init__(self):
+        # 缓存条目 {key: 文件大小}，按最近使用顺序排列
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._total_bytes = 0
+        self._loaded = False
+
+        # 统计
+        self.hit_count = 0
+        self.miss_count = 0
+        self.expired_count = 0
+        self.write_count = 0
+        self.eviction_count = 0
+
+    @property
+    def mode(self) -> str:
+        mode = settings.MODEL_CACHE_MODE
+        if mode not in CACHE_MODES:
+            logging.warning(f"未知的模型响应缓存模式 {mode}，按 off 处理")
+            return MODE_OFF
+        return mode
+
+    @property
+    def directory(self) -> str:
+        return settings.MODEL_CACHE_DIR
+
+    async def get(self, key: str) -> Optional[str]:
+        """读取缓存的响应，未命中或已过期时返回 None"""
+        self._load_index()
+        if key not in self._entries:
+            self.miss_count += 1
+            return None
+
+        try:
+            data = await asyncio.to_thread(self._read_file, key)
+        except (OSError, ValueError) as e:
+            logging.warning(f"读取模型响应缓存失败: {str(e)}")
+            self._drop(key)
+            self.miss_count += 1
+            return None
+
+        if self.mode != MODE_REPLAY and time.time() - data.get("created_at", 0) > settings.MODEL_CACHE_TTL:
+            self.expired_count += 1
+            self.miss_count += 1
+            await asyncio.to_thread(self._remove_file, key)
+            self._drop(key)
+            return None
+
+        self._entries.move_to_end(key)
+        # 更新修改时间，重启后按文件修改时间恢复最近使用顺序
+        await asyncio.to_thread(self._touch_file, key)
+        self.hit_count += 1
+        return data["response"]
+
+    async def put(self, key: str, response: str, meta: Optional[Dict[str, Any]] = None):
+        """写入一条响应，并按需要淘汰最久未使用的条目"""
+        self._load_index()
+        created_at = time.time()
+        data = dict(meta or {}, created_at=created_at, response=response)
+        try:
+            size = await asyncio.to_thread(self._write_file, key, data)
+        except OSError as e:
+            logging.warning(f"写入模型响应缓存失败: {str(e)}")
+            return
+
+        self._drop(key)
+        self._entries[key] = size
+        self._total_bytes += size
+        self.write_count += 1
+
+        while self._total_bytes > settings.MODEL_CACHE_MAX_BYTES and len(self._entries) > 1:
+            oldest = next(iter(self._entries))
+            await asyncio.to_thread(self._remove_file, oldest)
+            self._drop(oldest)
+            self.eviction_count += 1
+
+    def _load_index(self):
+        """首次使用时扫描缓存目录，按文件修改时间恢复使用顺序"""
+        if self._loaded:
+            return
+        self._loaded = True
+        if not os.path.isdir(self.directory):
+            return
+        files = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            stat = os.stat(os.path.join(self.directory, name))
+            files.append((stat.st_mtime, name[:-5], stat.st_size))
+        for _, key, size in sorted(files):
+            self._entries[key] = size
+            self._total_bytes += size
+
+    def _drop(self, key: str):
+        size = self._entries.pop(key, None)
+        if size is not None:
+            self._total_bytes -= size
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _read_file(self, key: str) -> Dict[str, Any]:
+        with open(self._path(key), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write_file(self, key: str, data: Dict[str, Any]) -> int:
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        # 先写临时文件再替换，避免并发读取到写了一半的文件
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(temp_path, path)
+        return os.path.getsize(path)
+
+    def _touch_file(self, key: str):
+        try:
+            os.utime(self._path(key))
+        except OSError:
+            pass
+
+    def _remove_file(self, key: str):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        lookups = self.hit_count + self.miss_count
+        return {
+            "mode": self.mode,
+            "entries": len(self._entries),
+            "bytes": self._total_bytes,
+            "hits": self.hit_count,
+            "misses": self.miss_count,
+            "hit_rate": round(self.hit_count / lookups, 4) if lookups else 0.0,
+            "expired": self.expired_count,
+            "writes": self.write_count,
+            "evictions": self.eviction_count
+        }
+
+
+# 全局模型响应缓存实例
+response_cache = ResponseCache()
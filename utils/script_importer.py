@@ -0,0 +1,255 @@
+import logging
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, List, Optional, Tuple
+
+from model.entity.Scripts import (
+    Scripts, ScriptStages, ScriptCharacters, CharacterStageGoals, ScriptClues, Users, ScriptTimeline
+)
+
+# AI 输出的顶层字段及其显示名称
+SCRIPT_SECTIONS = {
+    "script": "剧本信息",
+    "story": "故事背景",
+    "characters": "角色",
+    "stages": "故事阶段",
+    "clues": "线索",
+    "solution": "真相",
+}
+
+
+class ScriptImporter:
+    """按顶层字段逐段保存 AI 生成的剧本
+
+    每收到一个完整的顶层字段就写入数据库；依赖其他字段的数据（如线索依赖阶段和角色，
+    时间线依赖角色）在所依赖的字段写入后再保存，因此字段可以按任意顺序到达。
+    每张表的数据用一条批量 INSERT 写入，阶段和角色的 ID 在写入后一次查询得到。
+    """
+
+    def __init__(self, author_id: int, player_count: int, duration_mins: int):
+        self.author_id = author_id
+        self.player_count = player_count
+        self.duration_mins = duration_mins
+
+        self.script: Optional[Scripts] = None
+        # 阶段序号 -> 阶段ID，角色名 -> 角色ID
+        self.stages_map: Dict[Any, int] = {}
+        self.characters_map: Dict[str, int] = {}
+        # 已收到的字段
+        self.received: List[str] = []
+        # 已写入的数据（script、stages、characters），用于判断依赖是否满足
+        self._saved: set = set()
+        # 剧本主体上尚未写入的字段（概览、真相），剧本创建前收到时随剧本一起写入
+        self._script_fields: Dict[str, Any] = {}
+        # 等待依赖的写入 [(依赖, 写入函数)]
+        self._pending: List[Tuple[FrozenSet[str], Callable[[], Awaitable[None]]]] = []
+
+    @property
+    def script_id(self) -> Optional[int]:
+        return self.script.id if self.script else None
+
+    def has_saved(self, name: str) -> bool:
+        """指定数据是否已写入数据库"""
+        return name in self._saved
+
+    async def add_section(self, name: str, data: Any) -> bool:
+        """保存一个顶层字段，返回是否为剧本字段"""
+        if not self._register(name, data):
+            return False
+        await self._run_ready()
+        return True
+
+    async def add_sections(self, sections: Dict[str, Any]):
+        """一次保存多个顶层字段（完整的剧本），概览和真相随剧本主体一起写入"""
+        for name, data in sections.items():
+            self._register(name, data)
+        await self._run_ready()
+
+    async def finish(self) -> int:
+        """确认全部字段已保存，返回剧本ID"""
+        missing = [name for name in SCRIPT_SECTIONS if name not in self.received]
+        if missing:
+            raise KeyError(", ".join(missing))
+        if self._pending:
+            raise KeyError("剧本数据不完整")
+        return self.script.id
+
+    async def discard(self):
+        """删除已保存的部分剧本（级联删除阶段、角色、线索等）"""
+        if self.script:
+            from service.ScriptContentCache import script_content_cache
+            await Scripts.filter(id=self.script.id).delete()
+            script_content_cache.invalidate(self.script.id)
+            self.script = None
+
+    def _register(self, name: str, data: Any) -> bool:
+        """登记一个顶层字段的写入，返回是否为剧本字段"""
+        if name not in SCRIPT_SECTIONS:
+            logging.warning(f"忽略未知的剧本字段: {name}")
+            return False
+        if name in self.received:
+            logging.warning(f"忽略重复的剧本字段: {name}")
+            return False
+        self.received.append(name)
+
+        if name == "script":
+            self._defer(set(), lambda: self._save_script(data))
+        elif name == "story":
+            self._script_fields["overview"] = data["overview"]
+            self._defer({"script"}, self._save_script_fields)
+            self._defer({"script", "characters"}, lambda: self._save_timeline(data.get("timeline", [])))
+        elif name == "characters":
+            self._defer({"script"}, lambda: self._save_characters(data))
+            self._defer({"characters", "stages"}, lambda: self._save_character_goals(data))
+        elif name == "stages":
+            self._defer({"script"}, lambda: self._save_stages(data))
+        elif name == "clues":
+            self._defer({"script", "stages", "characters"}, lambda: self._save_clues(data))
+        elif name == "solution":
+            self._script_fields["solution"] = data
+            self._defer({"script"}, self._save_script_fields)
+        return True
+
+    def _defer(self, requires: set, save: Callable[[], Awaitable[None]]):
+        self._pending.append((frozenset(requires), save))
+
+    async def _run_ready(self):
+        """执行依赖已满足的写入，直到没有可执行的写入"""
+        saved = False
+        progressed = True
+        while progressed:
+            progressed = False
+            for item in list(self._pending):
+                requires, save = item
+                if requires <= self._saved:
+                    self._pending.remove(item)
+                    await save()
+                    progressed = saved = True
+        if saved and self.script:
+            # 剧本内容有变化，丢弃生成过程中可能被缓存的部分内容
+            from service.ScriptContentCache import script_content_cache
+            script_content_cache.invalidate(self.script.id)
+
+    async def _save_script(self, data: Dict[str, Any]):
+        """创建剧本主体"""
+        # 验证作者存在
+        author = await Users.get(id=self.author_id)
+        self.script = await Scripts.create(
+            title=data["title"],
+            description=data["description"],
+            player_count_min=self.player_count,
+            player_count_max=self.player_count,
+            duration_mins=self.duration_mins,  # 使用传入的时长参数
+            difficulty=data["difficulty"],
+            tags=data["tags"],
+            author=author,
+            status="草稿",
+            **self._script_fields
+        )
+        self._script_fields = {}
+        self._saved.add("script")
+
+    async def _save_script_fields(self):
+        """写入剧本创建后才收到的概览或真相"""
+        if not self._script_fields:
+            return
+        for field, value in self._script_fields.items():
+            setattr(self.script, field, value)
+        await self.script.save(update_fields=list(self._script_fields))
+        self._script_fields = {}
+
+    async def _save_stages(self, stages: List[Dict[str, Any]]):
+        """批量创建故事阶段"""
+        await self._bulk_create(ScriptStages, [
+            ScriptStages(
+                script=self.script,
+                stage_number=stage_data["stage_number"],
+                name=stage_data["name"],
+                opening_narrative=stage_data["opening_narrative"],
+                stage_goal=stage_data["stage_goal"]
+            )
+            for stage_data in stages
+        ])
+        # 批量插入不回填主键，按插入顺序取回 ID
+        stage_ids = await self._inserted_ids(ScriptStages)
+        for stage_data, stage_id in zip(stages, stage_ids):
+            self.stages_map[stage_data["stage_number"]] = stage_id
+        self._saved.add("stages")
+
+    async def _save_characters(self, characters: List[Dict[str, Any]]):
+        """批量创建角色"""
+        await self._bulk_create(ScriptCharacters, [
+            ScriptCharacters(
+                script=self.script,
+                name=char_data["name"],
+                gender=char_data["gender"],
+                is_murderer=char_data["is_murderer"],
+                backstory=char_data["backstory"],
+                public_info=char_data["public_info"]
+            )
+            for char_data in characters
+        ])
+        character_ids = await self._inserted_ids(ScriptCharacters)
+        for char_data, character_id in zip(characters, character_ids):
+            self.characters_map[char_data["name"]] = character_id
+        self._saved.add("characters")
+
+    async def _save_clues(self, clues: List[Dict[str, Any]]):
+        """批量创建线索"""
+        await self._bulk_create(ScriptClues, [
+            ScriptClues(
+                script=self.script,
+                name=clue_data["name"],
+                description=clue_data["description"],
+                discovery_stage_id=self.stages_map.get(clue_data["discovery_stage_id"]),
+                discovery_location=clue_data["discovery_location"],
+                is_public=clue_data["is_public"],
+                character_id=self.characters_map.get(clue_data["owner_character_name"])
+            )
+            for clue_data in clues
+        ])
+
+    async def _save_timeline(self, timeline: List[Dict[str, Any]]):
+        """批量创建剧本时间线"""
+        entries = []
+        for timeline_data in timeline:
+            character_id = self.characters_map.get(timeline_data["character"])
+            if character_id:
+                entries.append(ScriptTimeline(
+                    script=self.script,
+                    character_id=character_id,
+                    event_description=timeline_data.get("statement", ""),
+                    sys_description=timeline_data.get("statement", ""),
+                    is_public=timeline_data.get("is_public", True)
+                ))
+            else:
+                # 如果没有找到对应角色，记录日志但不影响流程
+                logging.warning(f"未找到角色 '{timeline_data.get('character')}' 对应的时间线数据")
+        await self._bulk_create(ScriptTimeline, entries)
+
+    async def _save_character_goals(self, characters: List[Dict[str, Any]]):
+        """批量创建角色阶段目标"""
+        goals = []
+        for char_data in characters:
+            character_id = self.characters_map.get(char_data["name"])
+            if character_id and "character_goals" in char_data:
+                for goal_data in char_data["character_goals"]:
+                    stage_id = self.stages_map.get(goal_data["stage_number"])
+                    if stage_id:
+                        goals.append(CharacterStageGoals(
+                            character_id=character_id,
+                            stage_id=stage_id,
+                            goal_description=goal_data["goal"],
+                            is_mandatory=True,
+                            search_attempts=1  # 默认每阶段1次搜查机会
+                        ))
+                    else:
+                        logging.warning(f"未找到阶段 {goal_data['stage_number']} 对应的角色任务数据")
+        await self._bulk_create(CharacterStageGoals, goals)
+
+    async def _bulk_create(self, model, objects: list):
+        """批量插入（没有数据时不执行语句）"""
+        if objects:
+            await model.bulk_create(objects)
+
+    async def _inserted_ids(self, model) -> List[int]:
+        """按插入顺序返回本剧本在指定表中的 ID"""
+        return await model.filter(script_id=self.script.id).order_by("id").values_list("id", flat=True)
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
-from typing import Optional, List, Dict, Any, Annotated
+from typing import Optional, List, Dict, Any, Annotated, AsyncIterator
 import json
 import httpx
 import asyncio
@@ -14,13 +14,62 @@ from model.entity.Scripts import (
 )
 from conf.config import settings
 from api.auth_api import get_current_user
+from utils.http_client import http_client
+from utils.sse_decoder import iter_completion_deltas
+from utils.script_importer import ScriptImporter, SCRIPT_SECTIONS
+from utils.response_cache import response_cache, cache_key, MODE_OFF, MODE_READ_THROUGH, MODE_REPLAY
 
 router = APIRouter(prefix="/api/scripts", tags=["剧本管理"])
 
 
 
-async def call_ai_api(prompt: str, max_retries: int = 1) -> str:
+async def call_ai_api(prompt: str, max_retries: int = 1, use_cache: bool = True) -> str:
     """调用 AI 接口生成剧本内容，使用流式调用并带重试机制"""
+    # 按段收集，最后一次性拼接
+    parts = [content async for content in stream_ai_api(prompt, max_retries, use_cache)]
+    full_content = "".join(parts)
+    logging.info(f"AI API 流式调用成功，返回内容长度: {len(full_content)}")
+    return full_content
+
+
+async def stream_ai_api(prompt: str, max_retries: int = 1, use_cache: bool = True) -> AsyncIterator[str]:
+    """流式调用 AI 接口生成剧本内容，逐段返回生成的文本
+
+    按 MODEL_CACHE_MODE 使用模型响应缓存：命中时按段回放缓存的响应，不调用模型；
+    回放模式下未命中直接报错；完整生成的响应写入缓存（读穿透和录制模式）。
+    use_cache 为 False 时总是调用模型且不写入缓存（如预生成剧本池需要不同的剧本）。
+    """
+    mode = response_cache.mode if use_cache else MODE_OFF
+    if mode == MODE_OFF:
+        async for content in _stream_model_api(prompt, max_retries):
+            yield content
+        return
+    
+    system_prompt = get_system_prompt()
+    key = cache_key(settings.API_MODEL, settings.API_TEMPERATURE, system_prompt, prompt)
+    if mode in (MODE_READ_THROUGH, MODE_REPLAY):
+        cached = await response_cache.get(key)
+        if cached is not None:
+            logging.info(f"模型响应缓存命中: {key[:12]}")
+            chunk_size = settings.MODEL_CACHE_REPLAY_CHUNK_SIZE
+            for start in range(0, len(cached), chunk_size):
+                yield cached[start:start + chunk_size]
+            return
+        if mode == MODE_REPLAY:
+            raise HTTPException(status_code=500, detail="模型响应缓存未命中（回放模式不调用 AI 接口）")
+    
+    parts: List[str] = []
+    async for content in _stream_model_api(prompt, max_retries):
+        parts.append(content)
+        yield content
+    # 只缓存完整的响应（中途失败或调用方提前结束时不会执行到这里）
+    await response_cache.put(key, "".join(parts), {"model": settings.API_MODEL, "temperature": settings.API_TEMPERATURE})
+
+async def _stream_model_api(prompt: str, max_retries: int = 1) -> AsyncIterator[str]:
+    """流式调用 AI 接口，逐段返回生成的文本
+
+    在收到第一段内容之前失败时重试；已返回部分内容后失败则直接报错，避免重复输出。
+    """
     if not settings.API_URL or not settings.API_KEY:
         raise HTTPException(status_code=500, detail="AI 配置未设置")
     
@@ -43,53 +92,38 @@ async def call_ai_api(prompt: str, max_retries: int = 1) -> str:
     
     logging.info(f"调用 AI API: {settings.API_URL}，模型: {settings.API_MODEL}（流式模式）")
     
-    # 优化超时设置
+    # 超时设置：连接、写入和连接池沿用共享客户端的配置，流式生成需要更长的读取超时
     timeout = httpx.Timeout(
-        connect=600.0,    # 连接超时（10分钟）
-        read=1800.0,     # 读取超时（30分钟）- 流式调用需要更长时间
-        write=600.0,      # 写入超时
-        pool=600.0        # 连接池超时
+        connect=settings.HTTP_CLIENT_CONNECT_TIMEOUT,
+        read=settings.SCRIPT_GENERATION_READ_TIMEOUT,
+        write=settings.HTTP_CLIENT_WRITE_TIMEOUT,
+        pool=settings.HTTP_CLIENT_POOL_TIMEOUT
     )
     
     last_error = None
     
     for attempt in range(max_retries):
+        received = False
         try:
-            async with httpx.AsyncClient(timeout=timeout) as client:
-                logging.info(f"AI API 流式调用尝试 {attempt + 1}/{max_retries}")
+            # 使用共享连接池，复用已建立的连接
+            client = http_client.client
+            logging.info(f"AI API 流式调用尝试 {attempt + 1}/{max_retries}")
+            
+            async with client.stream('POST', settings.API_URL, json=payload, headers=headers, timeout=timeout) as response:
+                if response.is_error:
+                    # 读取错误响应内容，便于记录日志
+                    await response.aread()
+                response.raise_for_status()
                 
-                async with client.stream('POST', settings.API_URL, json=payload, headers=headers) as response:
-                    response.raise_for_status()
-                    
-                    # 收集流式响应
-                    full_content = ""
-                    async for chunk in response.aiter_text():
-                        if chunk.strip():
-                            # 处理每个数据块
-                            for line in chunk.strip().split('\n'):
-                                if line.startswith('data: '):
-                                    data_content = line[6:].strip()
-                                    if data_content == '[DONE]':
-                                        continue
-                                    
-                                    try:
-                                        # 解析每个流式响应块
-                                        chunk_data = json.loads(data_content)
-                                        if 'choices' in chunk_data and len(chunk_data['choices']) > 0:
-                                            delta = chunk_data['choices'][0].get('delta', {})
-                                            content = delta.get('content', '')
-                                            if content:
-                                                full_content += content
-                                    except json.JSONDecodeError:
-                                        # 忽略无法解析的块
-                                        continue
-                    
-                    if not full_content.strip():
-                        raise ValueError("流式响应为空")
-                    
-                    logging.info(f"AI API 流式调用成功，返回内容长度: {len(full_content)}")
-                    return full_content
+                async for content in iter_completion_deltas(response):
+                    if content.strip():
+                        received = True
+                    yield content
                 
+                if not received:
+                    raise ValueError("流式响应为空")
+                return
+            
         except httpx.ConnectTimeout:
             last_error = "连接超时"
             logging.warning(f"第 {attempt + 1} 次尝试连接超时")
@@ -115,6 +149,10 @@ async def call_ai_api(prompt: str, max_retries: int = 1) -> str:
             last_error = f"未知错误: {str(e)}"
             logging.error(f"第 {attempt + 1} 次尝试未知错误: {str(e)}")
         
+        # 已返回部分内容，不能重试
+        if received:
+            raise HTTPException(status_code=500, detail=f"AI 接口流式响应中断: {last_error}")
+        
         # 如果不是最后一次尝试，等待后重试
         if attempt < max_retries - 1:
             wait_time = (attempt + 1) * 5  # 递增等待时间：5秒、10秒、15秒
@@ -261,99 +299,10 @@ async def parse_and_save_script(ai_response: str, author_id: int, play_count:int
         # print(f"AI 响应内容: {script_data}")  # 调试输出，查看 AI 返回的内容
         
         async with in_transaction():
-            # 验证作者存在
-            author = await Users.get(id=author_id)
-            
-            # 创建剧本主体
-            script = await Scripts.create(
-                title=script_data["script"]["title"],
-                description=script_data["script"]["description"],
-                player_count_min=play_count,#script_data["script"]["player_count"],
-                player_count_max=play_count,#script_data["script"]["player_count"],
-                duration_mins=duration_mins,  # 使用传入的时长参数
-                difficulty=script_data["script"]["difficulty"],
-                tags=script_data["script"]["tags"],
-                author=author,
-                status="草稿",
-                overview=script_data["story"]["overview"], 
-                solution = script_data["solution"]
-            )
-            
-            
-            # 创建故事阶段
-            stages_map = {}
-            for stage_data in script_data["stages"]:
-                stage = await ScriptStages.create(
-                    script=script,
-                    stage_number=stage_data["stage_number"],
-                    name=stage_data["name"],
-                    opening_narrative=stage_data["opening_narrative"],
-                    stage_goal=stage_data["stage_goal"]
-                )
-                stages_map[stage_data["stage_number"]] = stage
-            
-            # 创建角色
-            characters_map = {}
-            for char_data in script_data["characters"]:
-                character = await ScriptCharacters.create(
-                    script=script,
-                    name=char_data["name"],
-                    gender=char_data["gender"],
-                    is_murderer=char_data["is_murderer"],
-                    backstory=char_data["backstory"],
-                    public_info=char_data["public_info"]
-                )
-                characters_map[char_data["name"]] = character
-            
-            # 创建线索
-            for clue_data in script_data["clues"]:
-                discovery_stage = stages_map.get(clue_data["discovery_stage_id"])
-                character = characters_map.get(clue_data["owner_character_name"])
-                await ScriptClues.create(
-                    script=script,
-                    name=clue_data["name"],
-                    description=clue_data["description"],
-                    discovery_stage=discovery_stage,
-                    discovery_location=clue_data["discovery_location"],
-                    is_public=clue_data["is_public"],
-                    # clue_goal_connection = clue_data["clue_goal_connection"],
-                    character = character if character else None
-                )
-            
-            # 创建剧本时间线
-            if "story" in script_data and "timeline" in script_data["story"]:
-                for timeline_data in script_data["story"]["timeline"]:
-                    character = characters_map.get(timeline_data["character"])
-                    if character:
-                        await ScriptTimeline.create(
-                            script=script,
-                            character=character,
-                            event_description=timeline_data.get("statement", ""),
-                            sys_description=timeline_data.get("statement", ""),
-                            is_public=timeline_data.get("is_public", True)
-                        )
-                    else:
-                        # 如果没有找到对应角色，记录日志但不影响流程
-                        logging.warning(f"未找到角色 '{timeline_data.get('character')}' 对应的时间线数据")
-            
-            # 创建角色阶段目标
-            for char_data in script_data["characters"]:
-                character = characters_map.get(char_data["name"])
-                if character and "character_goals" in char_data:
-                    for goal_data in char_data["character_goals"]:
-                        stage = stages_map.get(goal_data["stage_number"])
-                        if stage:
-                            await CharacterStageGoals.create(
-                                character=character,
-                                stage=stage,
-                                goal_description=goal_data["goal"],
-                                is_mandatory=True,
-                                search_attempts=1  # 默认每阶段1次搜查机会
-                            )
-                        else:
-                            logging.warning(f"未找到阶段 {goal_data['stage_number']} 对应的角色任务数据")
-            
-            return script.id
+            # 每张表批量写入，线索、时间线和角色任务在其依赖的阶段和角色之后写入
+            importer = ScriptImporter(author_id, play_count, duration_mins)
+            await importer.add_sections({name: script_data[name] for name in SCRIPT_SECTIONS})
+            return await importer.finish()
             
     except json.JSONDecodeError as e:
         raise HTTPException(status_code=500, detail=f"AI 响应 JSON 解析失败: {str(e)}")
@@ -0,0 +1,147 @@
+import json
+import logging
+import re
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional
+
+import httpx
+
+# SSE 的行结束符只有 CRLF、LF 和 CR
+_LINE_END = re.compile(r"\r\n|\r|\n")
+
+
+@dataclass
+class SSEEvent:
+    """一条 Server-Sent Events 事件"""
+    data: str
+    event: str = "message"
+    id: Optional[str] = None
+
+
+class SSEDecoder:
+    """增量 SSE 解码器
+
+    按块输入文本，跨块缓存不完整的行；多行 data 按规范用换行拼接，
+    空行分派事件，以冒号开头的注释行（keep-alive）被忽略。
+    """
+
+    def __init__(self):
+        # 尚未遇到行结束符的文本块
+        self._pending: List[str] = []
+        self._data: List[str] = []
+        self._event: Optional[str] = None
+        self._id: Optional[str] = None
+
+    def feed(self, chunk: str) -> List[SSEEvent]:
+        """输入一段文本，返回其中已完整的事件"""
+        self._pending.append(chunk)
+        if "\n" not in chunk and "\r" not in chunk:
+            return []
+
+        text = "".join(self._pending)
+        self._pending = []
+
+        held = ""
+        if "\r" in text:
+            # 末尾的 \r 可能是被拆到两块的 \r\n，连同最后一行留到下一块再处理
+            if text.endswith("\r"):
+                text, held = text[:-1], "\r"
+            lines = _LINE_END.split(text)
+        else:
+            lines = text.split("\n")
+        # 最后一段没有行结束符，留到下一块
+        rest = lines.pop() + held
+        if rest:
+            self._pending.append(rest)
+
+        events = []
+        for line in lines:
+            # data 行是最常见的情况，直接处理
+            if line.startswith("data:"):
+                self._data.append(line[6:] if line.startswith(" ", 5) else line[5:])
+                continue
+            event = self._process_line(line)
+            if event is not None:
+                events.append(event)
+        return events
+
+    def flush(self) -> List[SSEEvent]:
+        """输入结束，处理缓存的最后一行和未以空行结束的事件"""
+        events = []
+        if self._pending:
+            line = "".join(self._pending).rstrip("\r")
+            self._pending = []
+            event = self._process_line(line)
+            if event is not None:
+                events.append(event)
+        event = self._dispatch()
+        if event is not None:
+            events.append(event)
+        return events
+
+    def _process_line(self, line: str) -> Optional[SSEEvent]:
+        if not line:
+            return self._dispatch()
+        if line.startswith(":"):
+            return None
+
+        field, _, value = line.partition(":")
+        if value.startswith(" "):
+            value = value[1:]
+        if field == "data":
+            self._data.append(value)
+        elif field == "event":
+            self._event = value
+        elif field == "id":
+            self._id = value
+        return None
+
+    def _dispatch(self) -> Optional[SSEEvent]:
+        if not self._data:
+            self._event = None
+            return None
+        event = SSEEvent(data="\n".join(self._data), event=self._event or "message", id=self._id)
+        self._data = []
+        self._event = None
+        return event
+
+
+def iter_decoded_events(chunks: Iterable[str]) -> Iterable[SSEEvent]:
+    """解码一组文本块（同步版本，用于回放已记录的流）"""
+    decoder = SSEDecoder()
+    for chunk in chunks:
+        yield from decoder.feed(chunk)
+    yield from decoder.flush()
+
+
+async def iter_sse_events(response: httpx.Response) -> AsyncIterator[SSEEvent]:
+    """从流式响应中逐条读取 SSE 事件"""
+    decoder = SSEDecoder()
+    async for chunk in response.aiter_text():
+        for event in decoder.feed(chunk):
+            yield event
+    for event in decoder.flush():
+        yield event
+
+
+def extract_completion_delta(event: SSEEvent) -> Optional[str]:
+    """从 chat/completions 流式事件中取出新增文本，无法解析时返回 None"""
+    try:
+        chunk_data: Dict[str, Any] = json.loads(event.data)
+    except json.JSONDecodeError:
+        logging.warning(f"无法解析的流式响应块: {event.data[:100]}")
+        return None
+    choices = chunk_data.get("choices") or []
+    if not choices:
+        return None
+    return (choices[0].get("delta") or {}).get("content") or None
+
+
+async def iter_completion_deltas(response: httpx.Response) -> AsyncIterator[str]:
+    """逐段读取 chat/completions 流式响应生成的文本，遇到 [DONE] 结束"""
+    async for event in iter_sse_events(response):
+        if event.data == "[DONE]":
+            return
+        content = extract_completion_delta(event)
+        if content:
+            yield content
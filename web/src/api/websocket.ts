@@ -203,6 +203,53 @@ export interface RoomStatus {
     }
 }
 
+// JSON Patch 操作（RFC 6902 子集）
+export interface JsonPatchOperation {
+    op: 'add' | 'remove' | 'replace';
+    path: string;
+    value?: any;
+}
+
+// 房间状态增量
+export interface RoomStatusDelta {
+    base_version: number;
+    version: number;
+    patch: JsonPatchOperation[];
+}
+
+// 将JSON Patch应用到文档上（会修改传入的文档）
+export function applyJsonPatch(document: any, patch: JsonPatchOperation[]): any {
+    let result = document;
+    for (const operation of patch) {
+        if (operation.path === '') {
+            result = operation.value;
+            continue;
+        }
+        const tokens = operation.path.split('/').slice(1)
+            .map(token => token.replace(/~1/g, '/').replace(/~0/g, '~'));
+        let parent = result;
+        for (const token of tokens.slice(0, -1)) {
+            parent = Array.isArray(parent) ? parent[Number(token)] : parent[token];
+        }
+        const last = tokens[tokens.length - 1];
+        if (Array.isArray(parent)) {
+            const index = last === '-' ? parent.length : Number(last);
+            if (operation.op === 'add') {
+                parent.splice(index, 0, operation.value);
+            } else if (operation.op === 'remove') {
+                parent.splice(index, 1);
+            } else {
+                parent[index] = operation.value;
+            }
+        } else if (operation.op === 'remove') {
+            delete parent[last];
+        } else {
+            parent[last] = operation.value;
+        }
+    }
+    return result;
+}
+
 export type EventListener = (data: any) => void;
 
 export class GameWebSocket {
@@ -217,6 +264,8 @@ export class GameWebSocket {
     private reconnectDelay = 1000; // 减少重连延迟
     private isManualClose = false;
     private connectionPromise: Promise<void> | null = null;
+    // 已应用的房间状态版本 {version: status}，作为服务端增量的基准
+    private statusVersions: Map<number, RoomStatus> = new Map();
 
     constructor(roomCode: string) {
         this.roomCode = roomCode;
@@ -242,6 +291,7 @@ export class GameWebSocket {
             this.ws.onopen = () => {
                 console.log('WebSocket连接成功');
                 this.reconnectAttempts = 0;
+                this.statusVersions.clear();
                 this.startHeartbeat();
                 this.emit('connected', null);
                 this.connectionPromise = null;
@@ -433,10 +483,55 @@ export class GameWebSocket {
     // 处理接收到的消息
     private handleMessage(message: WebSocketMessage): void {
         const { type, data } = message;
+        if (type === 'room_status') {
+            this.handleRoomStatus(data, (message as WebSocketMessage & { version?: number }).version);
+            return;
+        }
+        if (type === 'room_status_delta') {
+            this.handleRoomStatusDelta(data);
+            return;
+        }
         this.emit(type, data);
 
     }
 
+    // 处理全量房间状态快照
+    private handleRoomStatus(status: RoomStatus, version?: number): void {
+        if (version !== undefined && this.statusVersions.size > 0
+            && version < Math.max(...this.statusVersions.keys())) {
+            // 迟到的旧快照，已应用过更新的版本
+            return;
+        }
+        this.statusVersions.clear();
+        if (version !== undefined) {
+            this.statusVersions.set(version, status);
+            this.send('room_status_ack', { version });
+        }
+        this.emit('room_status', status);
+    }
+
+    // 处理房间状态增量：在确认过的基准版本上应用补丁
+    private handleRoomStatusDelta(delta: RoomStatusDelta): void {
+        const base = this.statusVersions.get(delta.base_version);
+        if (!base) {
+            // 缺少基准版本，请求全量快照
+            this.statusVersions.clear();
+            this.send('room_status_ack', { resync: true });
+            return;
+        }
+
+        const status = applyJsonPatch(structuredClone(base), delta.patch) as RoomStatus;
+        // 服务端之后只会以不早于本次基准的版本计算增量
+        for (const version of Array.from(this.statusVersions.keys())) {
+            if (version < delta.base_version) {
+                this.statusVersions.delete(version);
+            }
+        }
+        this.statusVersions.set(delta.version, status);
+        this.send('room_status_ack', { version: delta.version });
+        this.emit('room_status', status);
+    }
+
     // 安排重连
     private scheduleReconnect(): void {
         if (this.reconnectTimer || this.isManualClose) {
@@ -52,8 +52,27 @@ export interface MessageContent {
 
 export interface DisplayedMessage extends MessageContent {
     messageType: string;
+    stream_id?: string;
+    done?: boolean;
 }
 
+const mergeStreamedMessage = (
+    messages: Array<DisplayedMessage>,
+    chunk: DisplayedMessage
+): Array<DisplayedMessage> => {
+    const index = messages.findIndex(m => m.stream_id === chunk.stream_id);
+    if (index === -1) {
+        return chunk.done && !chunk.message ? messages : [...messages, chunk];
+    }
+    if (chunk.done && !chunk.message) {
+        return messages.filter((_, i) => i !== index);
+    }
+    const merged: DisplayedMessage = chunk.done
+        ? { ...messages[index], ...chunk }
+        : { ...messages[index], message: (messages[index].message || '') + (chunk.message || '') };
+    return messages.map((m, i) => (i === index ? merged : m));
+};
+
 export const useWebSocket = (roomCode: string): UseWebSocketReturn => {
     const [isConnected, setIsConnected] = useState(false);
     const [roomStatus, setRoomStatus] = useState<RoomStatus | null>(null);
@@ -112,6 +131,11 @@ export const useWebSocket = (roomCode: string): UseWebSocketReturn => {
         if (!displayedMessage.datetime) {
             displayedMessage.datetime = new Date().toISOString();
         }
+        if (displayedMessage.stream_id) {
+            // NPC流式回复：同一 stream_id 的分段追加到同一条消息，done 帧携带完整内容
+            setMessages(prev => mergeStreamedMessage(prev, displayedMessage));
+            return;
+        }
         setMessages(prev => [...prev, displayedMessage]);
     }, []);
 
@@ -144,10 +168,19 @@ export const useWebSocket = (roomCode: string): UseWebSocketReturn => {
             setRoomStatus(data);
         };
 
+        // 重连时服务端回放最近的聊天记录，替换本地消息列表
+        const handleMessageHistory = (data: { messages: Array<MessageContent & { type: string }> }) => {
+            setMessages(data.messages.map(({ type, ...message }) => ({
+                ...message,
+                messageType: type
+            })));
+        };
+
         // 事件监听器
         ws.on('connected', handleConnected);
         ws.on('disconnected', handleDisconnected);
         ws.on('room_status', handleRoomStatus);
+        ws.on('message_history', handleMessageHistory);
 
         const messageEventNames = [
             // 连接相关
@@ -174,7 +207,7 @@ export const useWebSocket = (roomCode: string): UseWebSocketReturn => {
             // 游戏状态相关
             'game_status',
             // 剧本生成相关
-            'script_generation_started', 'script_generation_completed', 'script_generation_failed',
+            'script_generation_started', 'script_generation_progress', 'script_generation_completed', 'script_generation_failed',
             // 下一幕相关
             'next_stage', 'stage_updated',
             // NPC相关
@@ -192,6 +225,7 @@ export const useWebSocket = (roomCode: string): UseWebSocketReturn => {
             ws.off('connected', handleConnected);
             ws.off('disconnected', handleDisconnected);
             ws.off('room_status', handleRoomStatus);
+            ws.off('message_history', handleMessageHistory);
             messageEventNames.forEach(eventName => {
                 if (eventHandlers[eventName]) {
                     ws.off(eventName, eventHandlers[eventName]);
@@ -5,6 +5,11 @@ import asyncio
 from datetime import datetime
 from model.ws.notification_types import MessageType, create_message, create_formatted_data
 from model.entity.Scripts import Users as UserModel
+from conf.config import settings
+from service.RoomStatusVersionStore import room_status_version_store
+from utils.recent_message_buffer import recent_message_buffer
+from service.AIResponsePipeline import ai_response_pipeline
+from .connection_sender import ConnectionSender
 
 class ConnectionManager:
     def __init__(self):
@@ -12,6 +17,10 @@ class ConnectionManager:
         self.room_connections: Dict[str, Dict[int, WebSocket]] = {}
         # 用户房间映射 {user_id: room_code}
         self.user_rooms: Dict[int, str] = {}
+        # 连接发送队列 {user_id: ConnectionSender}
+        self.senders: Dict[int, ConnectionSender] = {}
+        # 被驱逐的慢客户端数量
+        self.evicted_count = 0
 
     async def register_connection(self, websocket: WebSocket, room_code: str, user_id: int):
         """注册用户连接到房间（不调用accept）"""
@@ -21,6 +30,14 @@ class ConnectionManager:
         
         self.room_connections[room_code][user_id] = websocket
         self.user_rooms[user_id] = room_code
+
+        # 为连接创建独立的发送队列（重连时替换旧队列）
+        old_sender = self.senders.pop(user_id, None)
+        if old_sender:
+            old_sender.stop()
+        sender = ConnectionSender(websocket, user_id, self._drop_connection, self._resync_status)
+        sender.start()
+        self.senders[user_id] = sender
         
         # 通知房间内其他用户有新用户加入
         await self.broadcast_to_room(room_code, create_message(MessageType.PLAYER_JOINED, 
@@ -32,7 +49,7 @@ class ConnectionManager:
         ), exclude_user=user_id)
         
         # 广播房间状态更新
-        await self._broadcast_room_status_after_delay(room_code)
+        self._request_room_status_broadcast(room_code)
 
     async def connect(self, websocket: WebSocket, room_code: str, user_id: int):
         """用户连接到房间（兼容旧接口，包含accept调用）"""
@@ -44,12 +61,21 @@ class ConnectionManager:
         if user_id in self.user_rooms:
             room_code = self.user_rooms[user_id]
             
+            sender = self.senders.pop(user_id, None)
+            if sender:
+                sender.stop()
+            room_status_version_store.reset_viewer(room_code, user_id)
+
             if room_code in self.room_connections and user_id in self.room_connections[room_code]:
                 del self.room_connections[room_code][user_id]
                 
                 # 如果房间没有连接了，删除房间
                 if not self.room_connections[room_code]:
                     del self.room_connections[room_code]
+                    room_status_version_store.drop_room(room_code)
+                    recent_message_buffer.drop(room_code)
+                    ai_response_pipeline.cancel_room(room_code)
+                    self._close_room_actor(room_code)
                 else:
                     user = await UserModel.filter(id=user_id, is_active=True).first()
                     # 通知房间内其他用户有用户离开
@@ -62,54 +88,91 @@ class ConnectionManager:
                     ))
                     
                     # 广播房间状态更新
-                    await self._broadcast_room_status_after_delay(room_code)
+                    self._request_room_status_broadcast(room_code)
             
             del self.user_rooms[user_id]
 
-    async def _broadcast_room_status_after_delay(self, room_code: str):
-        """延迟广播房间状态（避免循环导入）"""
-        async def delayed_broadcast():
-            await asyncio.sleep(0.1)  # 短暂延迟确保数据库操作完成
-            try:
-                from service.RoomStatusHandler import room_status_handler
-                await room_status_handler.broadcast_room_status(room_code)
-            except Exception as e:
-                print(f"延迟广播房间状态失败: {str(e)}")
-        
-        # 创建异步任务
-        asyncio.create_task(delayed_broadcast())
+    def _close_room_actor(self, room_code: str):
+        """房间无人在线时关闭其内存状态处理器（延迟导入避免循环导入）"""
+        from service.RoomActor import room_actor_registry
+        room_actor_registry.close(room_code)
+
+    def _request_room_status_broadcast(self, room_code: str):
+        """请求广播房间状态（由调度器合并执行，延迟导入避免循环导入）"""
+        from service.RoomStatusBroadcaster import room_status_broadcaster
+        room_status_broadcaster.request_broadcast(room_code)
+
+    def _resync_status(self, user_id: int):
+        """积压的状态增量被丢弃后，清除该用户的版本记录并重新发送全量快照（延迟导入避免循环导入）"""
+        room_code = self.user_rooms.get(user_id)
+        if not room_code:
+            return
+        room_status_version_store.reset_viewer(room_code, user_id)
+        from service.RoomStatusHandler import room_status_handler
+        asyncio.create_task(room_status_handler.send_room_status(room_code, user_id, force_full=True))
 
     async def send_personal_message(self, message: dict, user_id: int):
-        """发送个人消息"""
-        if user_id in self.user_rooms:
-            room_code = self.user_rooms[user_id]
-            if room_code in self.room_connections and user_id in self.room_connections[room_code]:
-                websocket = self.room_connections[room_code][user_id]
-                try:
-                    await websocket.send_text(json.dumps(message, ensure_ascii=False))
-                except:
-                    # 连接已断开，清理
-                    await self.disconnect(user_id)
-
-    async def broadcast_to_room(self, room_code: str, message: dict, exclude_user: Optional[int] = None):
-        """向房间内所有用户广播消息"""
-        if room_code in self.room_connections:
-            disconnected_users = []
-            
-            for user_id, websocket in self.room_connections[room_code].items():
-                if exclude_user and user_id == exclude_user:
-                    continue
-                    
-                try:
-                    await websocket.send_text(json.dumps(message, ensure_ascii=False))
-                except:
-                    # 连接已断开，记录待清理的用户
-                    disconnected_users.append(user_id)
-            
-            # 清理断开的连接
-            for user_id in disconnected_users:
-                await self.disconnect(user_id)
+        """发送个人消息（仅入队，不等待网络发送）"""
+        self._enqueue(user_id, message.get("type"), json.dumps(message, ensure_ascii=False))
+
+    async def broadcast_to_room(self, room_code: str, message: dict, exclude_user: Optional[int] = None) -> Dict[str, List[int]]:
+        """向房间内所有用户广播消息
+
+        消息只序列化一次，共享的帧被放入每个连接的发送队列后立即返回，
+        由各连接的写协程并发发送，慢客户端不会拖慢整个房间。
+        返回入队结果：{"queued": [...], "evicted": [...]}
+        """
+        result = {"queued": [], "evicted": []}
+        if room_code not in self.room_connections:
+            return result
+
+        # 整个房间共享同一份序列化后的帧
+        frame = json.dumps(message, ensure_ascii=False)
+        message_type = message.get("type")
+
+        for user_id in list(self.room_connections[room_code].keys()):
+            if exclude_user and user_id == exclude_user:
+                continue
+            if self._enqueue(user_id, message_type, frame):
+                result["queued"].append(user_id)
+            else:
+                result["evicted"].append(user_id)
+
+        return result
+
+    def _enqueue(self, user_id: int, message_type: Optional[str], frame: str) -> bool:
+        """将帧放入用户的发送队列"""
+        sender = self.senders.get(user_id)
+        if not sender:
+            return False
+        return sender.enqueue(message_type, frame)
+
+    async def _drop_connection(self, user_id: int, websocket: WebSocket, reason: str):
+        """清理被驱逐的连接（仅当该连接仍是用户当前连接时）"""
+        room_code = self.user_rooms.get(user_id)
+        if not room_code or self.room_connections.get(room_code, {}).get(user_id) is not websocket:
+            return
+        self.evicted_count += 1
+        if reason != "failed":
+            # 超时或积压的连接可能仍处于打开状态，主动关闭
+            try:
+                await websocket.close(code=1011, reason="发送超时" if reason == "timeout" else "消息积压过多")
+            except Exception:
+                pass
+        await self.disconnect(user_id)
 
+    def get_stats(self) -> Dict[str, int]:
+        """获取发送队列统计信息"""
+        depths = [sender.depth for sender in self.senders.values()]
+        return {
+            "connections": len(self.senders),
+            "queued_frames": sum(depths),
+            "max_queue_depth": max(depths) if depths else 0,
+            "sent_frames": sum(sender.sent_count for sender in self.senders.values()),
+            "coalesced_frames": sum(sender.coalesced_count for sender in self.senders.values()),
+            "status_resyncs": sum(sender.resync_count for sender in self.senders.values()),
+            "evicted_connections": self.evicted_count
+        }
 
     def get_room_users(self, room_code: str) -> List[int]:
         """获取房间内的用户列表"""
@@ -0,0 +1,144 @@
+from collections import deque
+from typing import Awaitable, Callable, Deque, Optional, Tuple
+from fastapi import WebSocket
+import asyncio
+
+from conf.config import settings
+from model.ws.notification_types import MessageType
+
+
+class ConnectionSender:
+    """单个WebSocket连接的发送队列
+
+    处理器只负责把已序列化的帧放入队列，由每个连接独立的写协程负责真正发送，
+    网络慢的客户端只会堆积自己的队列，不会阻塞发送方。
+    队列长度超过 WS_QUEUE_HIGH_WATER 时丢弃积压的房间状态帧：全量快照只保留最新的一份，
+    增量（room_status_delta）全部丢弃，并通过 on_status_dropped 请求为该连接重新发送全量快照；
+    超过 WS_QUEUE_MAX_SIZE 时判定为慢客户端并断开。
+    """
+
+    # 全量快照：可以被更新的快照取代
+    SNAPSHOT_TYPE = MessageType.ROOM_STATUS.value
+    # 增量：积压时全部丢弃，改为重新发送全量快照
+    DELTA_TYPE = MessageType.ROOM_STATUS_DELTA.value
+
+    def __init__(self, websocket: WebSocket, user_id: int,
+                 on_evict: Callable[[int, WebSocket, str], Awaitable[None]],
+                 on_status_dropped: Optional[Callable[[int], None]] = None):
+        self.websocket = websocket
+        self.user_id = user_id
+        self._on_evict = on_evict
+        self._on_status_dropped = on_status_dropped
+        # 队列元素：(消息类型, 已序列化的帧)
+        self._queue: Deque[Tuple[Optional[str], str]] = deque()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.closed = False
+        # 已请求重新发送全量快照，收到新的全量快照前不再重复请求
+        self._resync_requested = False
+
+        # 统计
+        self.sent_count = 0
+        self.coalesced_count = 0
+        self.resync_count = 0
+
+    def start(self):
+        """启动写协程"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._writer_loop())
+
+    def stop(self):
+        """停止写协程并丢弃未发送的帧"""
+        self.closed = True
+        self._queue.clear()
+        if self._task and self._task is not asyncio.current_task():
+            self._task.cancel()
+        self._task = None
+
+    @property
+    def depth(self) -> int:
+        return len(self._queue)
+
+    def enqueue(self, message_type: Optional[str], frame: str) -> bool:
+        """将帧加入发送队列，不会阻塞；返回False表示连接已关闭或因队列溢出被驱逐"""
+        if self.closed:
+            return False
+
+        if len(self._queue) >= settings.WS_QUEUE_HIGH_WATER:
+            dropped_delta = self._coalesce(message_type)
+            if message_type != self.SNAPSHOT_TYPE and (dropped_delta or message_type == self.DELTA_TYPE):
+                # 客户端缺少被丢弃的增量，改为重新发送全量快照（新帧本身是全量快照时不需要）
+                self._request_resync()
+            if message_type == self.DELTA_TYPE:
+                self.coalesced_count += 1
+                return True
+
+        if len(self._queue) >= settings.WS_QUEUE_MAX_SIZE:
+            self._evict("overflow")
+            return False
+
+        if message_type == self.SNAPSHOT_TYPE:
+            self._resync_requested = False
+        self._queue.append((message_type, frame))
+        self._wakeup.set()
+        return True
+
+    def _coalesce(self, incoming_type: Optional[str]) -> bool:
+        """丢弃积压的状态帧：增量全部丢弃，全量快照只保留最新的一份
+        （若新帧本身就是全量快照则全部丢弃）；返回是否丢弃了增量"""
+        keep_snapshot = incoming_type != self.SNAPSHOT_TYPE
+        kept: Deque[Tuple[Optional[str], str]] = deque()
+        dropped_delta = False
+
+        # 从新到旧遍历，全量快照最多保留最新的一份
+        for message_type, frame in reversed(self._queue):
+            if message_type == self.DELTA_TYPE:
+                dropped_delta = True
+                self.coalesced_count += 1
+                continue
+            if message_type == self.SNAPSHOT_TYPE:
+                if not keep_snapshot:
+                    self.coalesced_count += 1
+                    continue
+                keep_snapshot = False
+            kept.appendleft((message_type, frame))
+
+        self._queue = kept
+        return dropped_delta
+
+    def _request_resync(self):
+        """请求为该连接重新发送全量快照（每次积压只请求一次）"""
+        if self._resync_requested or self._on_status_dropped is None:
+            return
+        self._resync_requested = True
+        self.resync_count += 1
+        self._on_status_dropped(self.user_id)
+
+    def _evict(self, reason: str):
+        """驱逐连接：停止发送并交由连接管理器清理"""
+        if self.closed:
+            return
+        print(f"用户 {self.user_id} 的连接被断开: {reason}，待发送帧数 {len(self._queue)}")
+        self.stop()
+        asyncio.create_task(self._on_evict(self.user_id, self.websocket, reason))
+
+    async def _writer_loop(self):
+        """逐帧发送队列中的消息"""
+        try:
+            while not self.closed:
+                while not self._queue:
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+
+                _, frame = self._queue.popleft()
+                try:
+                    await asyncio.wait_for(self.websocket.send_text(frame), timeout=settings.WS_SEND_TIMEOUT)
+                    self.sent_count += 1
+                except asyncio.TimeoutError:
+                    self._evict("timeout")
+                    return
+                except Exception:
+                    self._evict("failed")
+                    return
+        except asyncio.CancelledError:
+            pass
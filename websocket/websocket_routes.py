@@ -5,10 +5,13 @@ import json
 from .connection_manager import manager
 from service.GameHandler import game_handler
 from service.RoomStatusHandler import room_status_handler
+from service.RoomStatusBroadcaster import room_status_broadcaster
 from api.auth_api import get_current_user
 from model.entity.Scripts import GameRooms, GamePlayers
 from utils.auth_util import decode_token
-from model.ws.notification_types import MessageType, create_message, create_error_message, validate_incoming_message, parse_incoming_message, create_formatted_data
+from utils.recent_message_buffer import recent_message_buffer
+from conf.config import settings
+from model.ws.notification_types import MessageType, create_message, create_error_message, validate_incoming_message, parse_incoming_message, create_formatted_data, RoomStatusAckData
 
 router = APIRouter()
 
@@ -58,8 +61,12 @@ async def websocket_endpoint(websocket: WebSocket, room_code: str, token: str):
             )
         ), user.id)
         
-        # 发送当前房间状态
-        await room_status_handler.send_room_status(room_code, user.id)
+        # 发送当前房间状态（新连接总是从全量快照开始）
+        await room_status_handler.send_room_status(room_code, user.id, force_full=True)
+        
+        # 回放最近的聊天记录
+        history = await recent_message_buffer.get_replay(room_code, user.id, settings.MESSAGE_HISTORY_REPLAY_SIZE)
+        await manager.send_personal_message(create_message(MessageType.MESSAGE_HISTORY, {"messages": history}), user.id)
         
         # 监听消息
         while True:
@@ -73,6 +80,15 @@ async def websocket_endpoint(websocket: WebSocket, room_code: str, token: str):
                     continue
                 message_data = message.get("data", {})
                 
+                # 房间状态确认只更新版本记录，不进入游戏消息处理
+                if message_type == MessageType.ROOM_STATUS_ACK.value:
+                    try:
+                        ack = RoomStatusAckData.parse_obj(message_data or {})
+                    except Exception:
+                        continue
+                    await room_status_handler.handle_status_ack(room_code, user.id, ack.version, ack.resync)
+                    continue
+                
                 print(f"接收到消息: {message_type} - {message_data}")
                 
                 is_valid, error_msg = validate_incoming_message(message_type, message_data)
@@ -121,6 +137,6 @@ async def send_room_status(room_code: str, user_id: int):
     await room_status_handler.send_room_status(room_code, user_id)
 
 async def broadcast_room_status(room_code: str):
-    """向房间内所有用户广播房间状态"""
-    await room_status_handler.broadcast_room_status(room_code)
+    """向房间内所有用户广播房间状态（由调度器合并执行）"""
+    room_status_broadcaster.request_broadcast(room_code)
 